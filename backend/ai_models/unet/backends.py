@@ -0,0 +1,55 @@
+import os
+
+import torch
+import torch.nn as nn
+
+# --------- Inference backends ---------
+# torch:       eager PyTorch from the .pth checkpoint (see precision.py for fp32/bf16/int8)
+# torchscript: traced graph written by ai_models.unet.export
+# onnxruntime: ONNX graph written by ai_models.unet.export, run by onnxruntime
+#
+# Every backend yields an nn.Module-like callable mapping a float32
+# (N, 3, H, W) batch to (N, C, H, W) logits, so predict_masks works unchanged.
+
+BACKENDS = ('torch', 'torchscript', 'onnxruntime')
+EXPORT_SUFFIXES = {'torchscript': '.torchscript.pt', 'onnxruntime': '.onnx'}
+
+
+def exported_path(export_dir, name, backend):
+    """Where ai_models.unet.export writes the artifact of ``name`` for ``backend``"""
+    return os.path.join(export_dir, name + EXPORT_SUFFIXES[backend])
+
+
+class OnnxRuntimeModel(nn.Module):
+    """Runs an exported U-Net with onnxruntime; sessions are safe to share across threads"""
+
+    def __init__(self, path, device='cpu', intra_op_threads=0, inter_op_threads=0):
+        super().__init__()
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # 0 lets onnxruntime pick (one thread per physical core)
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        providers = ['CPUExecutionProvider']
+        if device.startswith('cuda') and 'CUDAExecutionProvider' in ort.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def forward(self, x):
+        batch = x.detach().to('cpu', torch.float32).contiguous().numpy()
+        return torch.from_numpy(self.session.run(None, {self.input_name: batch})[0])
+
+
+def load_exported(backend, path, device='cpu', intra_op_threads=0, inter_op_threads=0):
+    """Load an exported artifact; raises if the file or the runtime is missing"""
+    if backend not in EXPORT_SUFFIXES:
+        raise ValueError(f"Unknown export backend '{backend}'. Available: {list(EXPORT_SUFFIXES)}")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found (run python -m ai_models.unet.export)")
+    if backend == 'torchscript':
+        return torch.jit.load(path, map_location=device).eval()
+    return OnnxRuntimeModel(path, device, intra_op_threads, inter_op_threads)
@@ -0,0 +1,302 @@
+"""Offline batch segmentation for directories of images.
+
+Decodes images in DataLoader worker processes, runs batched U-Net inference
+and writes one palettized PNG mask per image plus a JSONL manifest with the
+per-region colors. Interrupted runs resume from the manifest.
+
+    python -m ai_models.unet.batch_inference --model celeba_unet \\
+        --input data/catalog --output out/catalog --batch-size 16 --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+
+from ai_models.unet.region_stats import region_statistics
+from ai_models.unet.mask_codecs import indexed_png, rle_encode
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+UNET_REGIONS = ["background", "skin", "lips", "eyes", "eyebrows", "cheeks", "other"]
+
+
+# --------- Model adapters ---------
+
+def _unet_module():
+    from ai_models.unet import inference_unet
+    return inference_unet
+
+
+def _celeba_module():
+    from ai_models.unet import inference_celeba_unet
+    return inference_celeba_unet
+
+
+MODELS = {
+    # name: (inference module, input size)
+    'unet': (_unet_module, 256),
+    'celeba_unet': (_celeba_module, 512),
+}
+
+
+def load_model(name, checkpoint_path, device):
+    module = MODELS[name][0]()
+    checkpoint_path = checkpoint_path or module.MODEL_PATH
+    if name == 'unet':
+        return module.load_model(device, checkpoint_path)
+    return module.load_model(checkpoint_path, device)
+
+
+def preprocess(name, image):
+    """(3, S, S) model input for an RGB PIL image, matching the API preprocessing"""
+    module = MODELS[name][0]()
+    if name == 'unet':
+        return module.preprocess_image(image)[0]
+    return module.preprocess_image(np.asarray(image))[0]
+
+
+def region_colors(name, image, mask):
+    """Per-region color summary for the manifest (image: RGB array at mask size)"""
+    if name == 'celeba_unet':
+        return _celeba_module().extract_region_colors(image, mask)
+    stats = region_statistics(image, mask, len(UNET_REGIONS), median=False)
+    return {
+        region: {'rgb': stats['mean'][i].astype(int).tolist(), 'pixel_count': int(stats['counts'][i])}
+        for i, region in enumerate(UNET_REGIONS)
+    }
+
+
+def palette(name):
+    return MODELS[name][0]().PALETTE_LUT
+
+
+# --------- Input ---------
+
+def list_images(input_dir=None, file_list=None):
+    """Sorted image paths from a directory tree and/or a file with one path per line"""
+    paths = []
+    if input_dir:
+        for root, _, files in os.walk(input_dir):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+    if file_list:
+        with open(file_list) as f:
+            paths.extend(line.strip() for line in f if line.strip())
+    return sorted(set(paths))
+
+
+class ImageDataset(Dataset):
+    """Decodes and preprocesses images inside DataLoader workers.
+
+    Each item carries the model input plus the RGB image resized to the mask
+    size (for region colors), so full-resolution pixels never cross process
+    boundaries. Unreadable files become items with an ``error``.
+    """
+
+    def __init__(self, paths, model_name):
+        self.paths = paths
+        self.model_name = model_name
+        self.size = MODELS[model_name][1]
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        path = self.paths[index]
+        try:
+            with Image.open(path) as img:
+                original_size = img.size
+                if img.format == 'JPEG':
+                    img.draft('RGB', (self.size, self.size))
+                img = img.convert('RGB')
+            tensor = preprocess(self.model_name, img)
+            image = np.asarray(img.resize((self.size, self.size), Image.BILINEAR))
+            return {'index': index, 'tensor': tensor, 'image': image, 'size': original_size, 'error': None}
+        except Exception as e:
+            return {'index': index, 'tensor': None, 'image': None, 'size': None, 'error': str(e)}
+
+
+def collate(items):
+    ok = [item for item in items if item['error'] is None]
+    return {
+        'tensor': torch.stack([item['tensor'] for item in ok]) if ok else None,
+        'items': ok,
+        'failed': [item for item in items if item['error'] is not None],
+    }
+
+
+# --------- Output ---------
+
+def mask_path(masks_dir, path, input_dir):
+    """Where the mask of ``path`` goes under ``masks_dir``, mirroring its place in ``input_dir``.
+
+    Raises ValueError for paths that would land outside ``masks_dir`` (e.g. a
+    ``--file-list`` entry with ``..`` that is not under ``--input``).
+    """
+    rel = os.path.relpath(path, input_dir) if input_dir else path.lstrip(os.sep)
+    target = os.path.join(masks_dir, os.path.splitext(rel)[0] + '.png')
+    root = os.path.realpath(masks_dir)
+    if os.path.commonpath([root, os.path.realpath(target)]) != root:
+        raise ValueError(f'mask for {path} would be written outside {masks_dir}')
+    return os.path.normpath(target)
+
+
+def save_indexed_png(mask, lut, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(indexed_png(mask, lut))
+
+
+def read_manifest(path, retry_errors=False):
+    """Paths already recorded in a manifest (a truncated last line is ignored)"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if retry_errors and record.get('error'):
+                continue
+            done.add(record['path'])
+    return done
+
+
+def write_parquet(manifest_path, parquet_path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print('pyarrow is not installed; skipping Parquet export')
+        return
+    records = []
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # Nested region dicts are stored as JSON strings to keep one flat schema
+            record['region_colors'] = json.dumps(record.get('region_colors'))
+            record.pop('mask_rle', None)
+            records.append(record)
+    pq.write_table(pa.Table.from_pylist(records), parquet_path)
+    print(f'Wrote {parquet_path} ({len(records)} rows)')
+
+
+# --------- Main loop ---------
+
+def run(args):
+    device = args.device
+    if device == 'auto':
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest_path = os.path.join(args.output, 'manifest.jsonl')
+    paths = list_images(args.input, args.file_list)
+    done = read_manifest(manifest_path, args.retry_errors)
+    todo = [p for p in paths if p not in done]
+    if args.limit:
+        todo = todo[:args.limit]
+    rejected = []
+    if args.mask_format == 'indexed_png':
+        mask_paths = {}
+        for path in todo:
+            try:
+                mask_paths[path] = mask_path(os.path.join(args.output, 'masks'), path, args.input)
+            except ValueError as e:
+                rejected.append({'path': path, 'error': str(e)})
+        todo = [p for p in todo if p in mask_paths]
+        if rejected:
+            print(f'{len(rejected)} images skipped, their masks would be written outside {args.output}')
+            with open(manifest_path, 'a') as manifest:
+                for record in rejected:
+                    manifest.write(json.dumps(record, separators=(',', ':')) + '\n')
+    print(f'{len(paths)} images found, {len(done)} already in manifest, {len(todo)} to process')
+    if not todo:
+        return
+
+    model = load_model(args.model, args.checkpoint, device)
+    lut = palette(args.model)
+    loader = DataLoader(
+        ImageDataset(todo, args.model),
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        collate_fn=collate,
+        prefetch_factor=args.prefetch if args.workers > 0 else None,
+        pin_memory=device.startswith('cuda'),
+    )
+    predict_masks = MODELS[args.model][0]().predict_masks
+
+    processed = failed = 0
+    start = last_report = time.perf_counter()
+    with open(manifest_path, 'a') as manifest:
+        for batch in loader:
+            records = [{'path': todo[item['index']], 'error': item['error']} for item in batch['failed']]
+            if batch['tensor'] is not None:
+                masks = predict_masks(model, batch['tensor'], device)
+                for item, mask in zip(batch['items'], masks):
+                    path = todo[item['index']]
+                    record = {
+                        'path': path,
+                        'width': item['size'][0],
+                        'height': item['size'][1],
+                        'mask_shape': list(mask.shape),
+                        'region_colors': region_colors(args.model, item['image'], mask),
+                        'error': None,
+                    }
+                    if args.mask_format == 'indexed_png':
+                        save_indexed_png(mask, lut, mask_paths[path])
+                        record['mask'] = os.path.relpath(mask_paths[path], args.output)
+                    elif args.mask_format == 'rle':
+                        record['mask_rle'] = rle_encode(mask)
+                    records.append(record)
+            for record in records:
+                manifest.write(json.dumps(record, separators=(',', ':')) + '\n')
+            # Flushed per batch so an interrupted run resumes after the last full batch
+            manifest.flush()
+            processed += len(batch['items'])
+            failed += len(batch['failed'])
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                done_count = processed + failed
+                print(f'{done_count}/{len(todo)} images, {processed / (now - start):.1f} img/s, {failed} failed')
+                last_report = now
+
+    elapsed = time.perf_counter() - start
+    print(f'Done: {processed} images in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):.1f} img/s), {failed} failed')
+    if args.parquet:
+        write_parquet(manifest_path, os.path.join(args.output, 'manifest.parquet'))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Batch U-Net segmentation for directories of images')
+    parser.add_argument('--model', choices=sorted(MODELS), default='celeba_unet')
+    parser.add_argument('--checkpoint', help='defaults to the inference module MODEL_PATH')
+    parser.add_argument('--input', help='directory to scan recursively for images')
+    parser.add_argument('--file-list', help='text file with one image path per line')
+    parser.add_argument('--output', required=True, help='directory for masks/ and manifest.jsonl')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4, help='DataLoader decode processes (0 = main process)')
+    parser.add_argument('--prefetch', type=int, default=2, help='batches prefetched per worker')
+    parser.add_argument('--device', default='auto')
+    parser.add_argument('--mask-format', choices=['indexed_png', 'rle', 'none'], default='indexed_png')
+    parser.add_argument('--parquet', action='store_true', help='also export the manifest as Parquet (needs pyarrow)')
+    parser.add_argument('--retry-errors', action='store_true', help='reprocess images that failed in a previous run')
+    parser.add_argument('--limit', type=int, default=0, help='process at most this many new images')
+    parser.add_argument('--report-every', type=float, default=10.0, help='seconds between throughput reports')
+    args = parser.parse_args(argv)
+    if not args.input and not args.file_list:
+        parser.error('one of --input or --file-list is required')
+    return args
+
+
+if __name__ == '__main__':
+    run(parse_args(sys.argv[1:]))
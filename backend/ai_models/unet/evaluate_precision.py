@@ -0,0 +1,109 @@
+"""Compare reduced-precision U-Net variants against the fp32 model.
+
+Runs every variant over a held-out image set and reports the mean IoU of
+its masks against the fp32 masks, the pixel agreement and the latency per
+batch, so a precision mode can be checked before enabling MODEL_PRECISION.
+
+    python -m ai_models.unet.evaluate_precision --model celeba_unet \\
+        --input data/holdout --calibration data/calibration --precisions fp32 bf16 int8
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from ai_models.unet.batch_inference import MODELS, list_images, load_model, preprocess
+from ai_models.unet.precision import PRECISIONS, optimize_for_inference
+
+
+def load_batches(model_name, paths, batch_size):
+    tensors = []
+    for path in paths:
+        with Image.open(path) as img:
+            tensors.append(preprocess(model_name, img.convert('RGB')))
+    return [torch.stack(tensors[i:i + batch_size]) for i in range(0, len(tensors), batch_size)]
+
+
+def mean_iou(pred, ref, num_classes):
+    """Mean IoU over the model's ``num_classes`` classes, skipping those absent from both masks"""
+    ious = []
+    for c in range(num_classes):
+        p, r = pred == c, ref == c
+        union = np.logical_or(p, r).sum()
+        if union:
+            ious.append(np.logical_and(p, r).sum() / union)
+    return float(np.mean(ious)) if ious else 1.0
+
+
+def predict(model, batches, predict_masks):
+    masks, times = [], []
+    for batch in batches:
+        start = time.perf_counter()
+        masks.append(predict_masks(model, batch, 'cpu'))
+        times.append(time.perf_counter() - start)
+    return np.concatenate(masks), times
+
+
+def run(args):
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    paths = list_images(args.input)[:args.limit or None]
+    if not paths:
+        print('No images found')
+        return
+    calibration_paths = list_images(args.calibration)[:args.calibration_images] if args.calibration else []
+    # Calibrating on the evaluation images would flatter int8
+    if set(calibration_paths) & set(paths):
+        print('Warning: calibration and evaluation images overlap')
+
+    batches = load_batches(args.model, paths, args.batch_size)
+    calibration = load_batches(args.model, calibration_paths, args.batch_size) if calibration_paths else None
+    base = load_model(args.model, args.checkpoint, 'cpu')
+    module = MODELS[args.model][0]()
+    # The palette LUT has 256 entries; only the model's own classes count
+    num_classes = module.NUM_CLASSES
+
+    # Warm-up batch excluded from timing
+    predict(base, batches[:1], module.predict_masks)
+    reference, ref_times = predict(base, batches, module.predict_masks)
+    print(f'{len(paths)} images, batch size {args.batch_size}')
+    print(f'{"variant":<24}{"mIoU":>8}{"agree":>9}{"ms/img":>9}{"speedup":>9}')
+    ref_ms = 1000 * sum(ref_times) / len(paths)
+    print(f'{"fp32 (reference)":<24}{1.0:>8.4f}{1.0:>9.4f}{ref_ms:>9.1f}{1.0:>8.2f}x')
+
+    for precision in args.precisions:
+        for channels_last in ([False, True] if args.channels_last else [False]):
+            model, used = optimize_for_inference(
+                base, precision, channels_last=channels_last, fold_bn=not args.no_fold_bn,
+                calibration_batches=calibration,
+            )
+            label = used + (' +channels_last' if channels_last else '') + ('' if used == precision else ' (fallback)')
+            predict(model, batches[:1], module.predict_masks)
+            masks, times = predict(model, batches, module.predict_masks)
+            miou = np.mean([mean_iou(m, r, num_classes) for m, r in zip(masks, reference)])
+            agree = float((masks == reference).mean())
+            ms = 1000 * sum(times) / len(paths)
+            print(f'{label:<24}{miou:>8.4f}{agree:>9.4f}{ms:>9.1f}{ref_ms / ms:>8.2f}x')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Validate reduced-precision U-Net variants against fp32')
+    parser.add_argument('--model', choices=sorted(MODELS), default='celeba_unet')
+    parser.add_argument('--checkpoint', help='defaults to the inference module MODEL_PATH')
+    parser.add_argument('--input', required=True, help='held-out images to evaluate on')
+    parser.add_argument('--calibration', help='images for int8 calibration (keep separate from --input)')
+    parser.add_argument('--calibration-images', type=int, default=32)
+    parser.add_argument('--precisions', nargs='+', choices=PRECISIONS, default=list(PRECISIONS))
+    parser.add_argument('--channels-last', action='store_true', help='also measure each variant in channels_last')
+    parser.add_argument('--no-fold-bn', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=0, help='torch intra-op threads (0 = default)')
+    parser.add_argument('--limit', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    run(parse_args(sys.argv[1:]))
@@ -0,0 +1,100 @@
+"""Export the U-Nets as TorchScript and ONNX for the non-eager inference backends.
+
+Both artifacts take a float32 (N, 3, S, S) batch with a dynamic batch axis
+and return (N, C, S, S) logits; BatchNorm is folded into the convolutions
+first. Each export is checked against the eager model on a batch of two.
+
+    python -m ai_models.unet.export --model celeba_unet --output exports
+"""
+import argparse
+import inspect
+import os
+import sys
+import time
+
+import torch
+
+from ai_models.unet.backends import exported_path, load_exported
+from ai_models.unet.batch_inference import MODELS, load_model
+from ai_models.unet.precision import fold_batchnorm
+
+FORMATS = {'torchscript': 'torchscript', 'onnx': 'onnxruntime'}
+
+
+def export_torchscript(model, example, path):
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+    traced.save(path)
+
+
+def export_onnx(model, example, path, opset):
+    kwargs = {}
+    # The TorchScript-based exporter handles dynamic_axes and writes a single file
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        kwargs['dynamo'] = False
+    torch.onnx.export(
+        model,
+        (example,),
+        path,
+        input_names=['image'],
+        output_names=['logits'],
+        dynamic_axes={'image': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=opset,
+        **kwargs,
+    )
+
+
+def verify(model, backend, path, size):
+    """Max abs logit difference and mask agreement against eager on a batch of two"""
+    batch = torch.rand(2, 3, size, size)
+    exported = load_exported(backend, path)
+    with torch.no_grad():
+        expected = model(batch)
+        actual = exported(batch)
+    diff = (expected - actual).abs().max().item()
+    agree = (expected.argmax(1) == actual.argmax(1)).float().mean().item()
+    return diff, agree
+
+
+def run(args):
+    os.makedirs(args.output, exist_ok=True)
+    for name in args.models:
+        size = MODELS[name][1]
+        model = load_model(name, args.checkpoint if len(args.models) == 1 else None, 'cpu')
+        if not args.no_fold_bn:
+            model = fold_batchnorm(model)
+        example = torch.zeros(1, 3, size, size)
+        for fmt in args.formats:
+            backend = FORMATS[fmt]
+            path = exported_path(args.output, name, backend)
+            start = time.perf_counter()
+            if fmt == 'torchscript':
+                export_torchscript(model, example, path)
+            else:
+                export_onnx(model, example, path, args.opset)
+            print(f'{name}: wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB) '
+                  f'in {time.perf_counter() - start:.1f}s')
+            if not args.no_verify:
+                diff, agree = verify(model, backend, path, size)
+                print(f'{name}: {fmt} max |logit diff| {diff:.2e}, mask agreement {agree:.4f}')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Export U-Net checkpoints to TorchScript / ONNX')
+    parser.add_argument('--model', dest='models', action='append', choices=sorted(MODELS),
+                        help='model to export (repeatable; default: all)')
+    parser.add_argument('--checkpoint', help='checkpoint path when exporting a single model')
+    parser.add_argument('--output', default='exports', help='directory for <model>.torchscript.pt and <model>.onnx')
+    parser.add_argument('--formats', nargs='+', choices=sorted(FORMATS), default=sorted(FORMATS))
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--no-fold-bn', action='store_true')
+    parser.add_argument('--no-verify', action='store_true')
+    args = parser.parse_args(argv)
+    args.models = args.models or sorted(MODELS)
+    if args.checkpoint and len(args.models) != 1:
+        parser.error('--checkpoint needs exactly one --model')
+    return args
+
+
+if __name__ == '__main__':
+    run(parse_args(sys.argv[1:]))
@@ -7,8 +7,13 @@ import os
 import base64
 import io
 
-# Import the UNet model and attributes from training script
-from train_celeba_unet import UNet, CELEBA_ATTRIBUTES
+# Model definition only; the training script pulls in matplotlib, sklearn and tqdm
+from ai_models.unet.celeba_unet_model import UNet, CELEBA_ATTRIBUTES
+from ai_models.unet.region_stats import palette_lut, colorize, region_statistics
+
+MODEL_PATH = 'best_celeba_unet.pth'
+IMG_SIZE = 512
+NUM_CLASSES = len(CELEBA_ATTRIBUTES) + 1  # + background
 
 # Color palette for visualization (20 colors for 19 attributes + background)
 PALETTE = [
@@ -33,21 +38,22 @@ PALETTE = [
     [0, 128, 255],    # 18: cloth - sky blue
 ]
 
-def load_model(checkpoint_path):
+def load_model(checkpoint_path, device='cpu'):
     """Load the trained U-Net model"""
-    model = UNet(in_channels=3, out_channels=len(CELEBA_ATTRIBUTES) + 1)
+    model = UNet(in_channels=3, out_channels=NUM_CLASSES)
     
     if os.path.exists(checkpoint_path):
-        model.load_state_dict(torch.load(checkpoint_path, map_location='cpu'))
+        model.load_state_dict(torch.load(checkpoint_path, map_location=device))
         print(f"Loaded model from {checkpoint_path}")
     else:
         print(f"Warning: Checkpoint {checkpoint_path} not found. Using untrained model.")
     
     model.eval()
+    model.to(device)
     return model
 
 def preprocess_image(image, target_size=(512, 512)):
-    """Preprocess image for model input"""
+    """Preprocess image for model input (image: PIL image or RGB array, like the training data)"""
     # Convert PIL to numpy if needed
     if isinstance(image, Image.Image):
         image = np.array(image)
@@ -55,16 +61,12 @@ def preprocess_image(image, target_size=(512, 512)):
     # Resize image
     image = cv2.resize(image, target_size)
     
-    # Convert BGR to RGB if needed
-    if len(image.shape) == 3 and image.shape[2] == 3:
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    
     # Normalize to [0, 1]
     image = image.astype(np.float32) / 255.0
     
-    # Apply ImageNet normalization
-    mean = np.array([0.485, 0.456, 0.406])
-    std = np.array([0.229, 0.224, 0.225])
+    # Apply ImageNet normalization (keep float32 to match the model weights)
+    mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
     image = (image - mean) / std
     
     # Convert to tensor and add batch dimension
@@ -72,75 +74,73 @@ def preprocess_image(image, target_size=(512, 512)):
     
     return image
 
-def predict_mask(model, image, device='cpu'):
-    """Predict segmentation mask for the input image"""
+def predict_masks(model, batch, device='cpu'):
+    """Predict segmentation masks for a (N, 3, H, W) batch of preprocessed images"""
     model = model.to(device)
-    image = image.to(device)
+    # Quantized models have no float parameters and take float32 input
+    param = next(model.parameters(), None)
+    batch = batch.to(device=device, dtype=param.dtype if param is not None else torch.float32)
     
     with torch.no_grad():
-        output = model(image)
-        mask = torch.argmax(output, dim=1)
+        output = model(batch)
+        masks = torch.argmax(output, dim=1).to(torch.uint8)  # class ids fit in a byte
     
-    return mask.cpu().numpy()[0]  # Remove batch dimension
+    return masks.cpu().numpy()
+
+def predict_mask(model, image, device='cpu'):
+    """Predict segmentation mask for the input image"""
+    return predict_masks(model, image, device)[0]  # Remove batch dimension
+
+PALETTE_LUT = palette_lut(PALETTE)
 
 def colorize_mask(mask):
     """Convert segmentation mask to colored image"""
-    colored_mask = np.zeros((mask.shape[0], mask.shape[1], 3), dtype=np.uint8)
-    
-    for class_id in range(len(PALETTE)):
-        colored_mask[mask == class_id] = PALETTE[class_id]
-    
-    return colored_mask
+    return colorize(mask, PALETTE_LUT)
 
 def extract_region_colors(image, mask):
-    """Extract average colors for each facial region"""
+    """Extract average colors for each facial region (image: PIL image or RGB array)"""
     region_colors = {}
     
-    # Convert image to RGB if needed
-    if isinstance(image, np.ndarray):
-        if len(image.shape) == 3 and image.shape[2] == 3:
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        else:
-            image_rgb = image
-    else:
-        image_rgb = np.array(image)
+    # Images are PIL images or RGB arrays (as decoded by the API)
+    image_rgb = np.asarray(image)
     
     # Resize image to match mask size
     image_rgb = cv2.resize(image_rgb, (mask.shape[1], mask.shape[0]))
     
+    # Per-class statistics for all attributes in one pass
+    stats = region_statistics(image_rgb, mask, len(CELEBA_ATTRIBUTES) + 1)
+    
     for i, attr_name in enumerate(CELEBA_ATTRIBUTES):
         class_id = i + 1  # +1 because 0 is background
-        region_mask = (mask == class_id)
         
-        if np.any(region_mask):
-            # Get pixels for this region
-            region_pixels = image_rgb[region_mask]
-            
-            # Calculate average color
-            avg_color = np.mean(region_pixels, axis=0).astype(int)
+        if stats['counts'][class_id] > 0:
+            # Average color of this region
+            avg_color = stats['mean'][class_id].astype(int)
             region_colors[attr_name] = {
                 'rgb': avg_color.tolist(),
-                'hex': '#{:02x}{:02x}{:02x}'.format(avg_color[0], avg_color[1], avg_color[2])
+                'hex': '#{:02x}{:02x}{:02x}'.format(avg_color[0], avg_color[1], avg_color[2]),
+                'median_rgb': stats['median'][class_id].tolist(),
+                'std_rgb': np.round(stats['std'][class_id], 2).tolist(),
+                'pixel_count': int(stats['counts'][class_id]),
+                'bbox': stats['bbox'][class_id].tolist()
             }
         else:
             # Region not found in mask
             region_colors[attr_name] = {
                 'rgb': [0, 0, 0],
-                'hex': '#000000'
+                'hex': '#000000',
+                'median_rgb': [0, 0, 0],
+                'std_rgb': [0, 0, 0],
+                'pixel_count': 0,
+                'bbox': None
             }
     
     return region_colors
 
 def create_annotated_image(image, mask):
-    """Create an annotated image showing the segmentation overlay"""
-    # Convert image to RGB if needed
-    if isinstance(image, np.ndarray):
-        if len(image.shape) == 3 and image.shape[2] == 3:
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        else:
-            image_rgb = image
-    else:
-        image_rgb = np.array(image)
+    """Create an annotated image showing the segmentation overlay (image: PIL image or RGB array)"""
+    # Images are PIL images or RGB arrays (as decoded by the API)
+    image_rgb = np.asarray(image)
     
     # Resize image to match mask size
     image_rgb = cv2.resize(image_rgb, (mask.shape[1], mask.shape[0]))
@@ -168,11 +168,16 @@ def image_to_base64(image_array):
     
     return img_str
 
-def process_image_with_celeba_unet(image_path, checkpoint_path='best_celeba_unet.pth', device='cpu'):
-    """Main function to process an image with CelebAMask-HQ U-Net"""
+def process_image_with_celeba_unet(image_path, checkpoint_path=MODEL_PATH, device='cpu', model=None):
+    """Main function to process an image with CelebAMask-HQ U-Net
+
+    Pass an already-loaded ``model`` (e.g. from the API model registry) to
+    skip loading the checkpoint from disk.
+    """
     
     # Load model
-    model = load_model(checkpoint_path)
+    if model is None:
+        model = load_model(checkpoint_path, device)
     
     # Load and preprocess image
     if isinstance(image_path, str):
@@ -186,21 +191,24 @@ def process_image_with_celeba_unet(image_path, checkpoint_path='best_celeba_unet
     # Predict mask
     mask = predict_mask(model, input_tensor, device)
     
+    return summarize_prediction(image, mask)
+
+def summarize_prediction(image, mask, include_mask=True, include_overlay=True, include_colors=True):
+    """Build the API result (colorized mask, overlay, region colors) for a predicted mask
+
+    Outputs that are switched off are returned as ``None`` and not computed.
+    """
     # Colorize mask
-    colorized_mask = colorize_mask(mask)
+    colorized_mask_b64 = image_to_base64(colorize_mask(mask)) if include_mask else None
     
     # Extract region colors
-    region_colors = extract_region_colors(image, mask)
+    region_colors = extract_region_colors(image, mask) if include_colors else None
     
     # Create annotated image
-    annotated_image = create_annotated_image(image, mask)
-    
-    # Convert to base64
-    colorized_mask_b64 = image_to_base64(colorized_mask)
-    annotated_image_b64 = image_to_base64(annotated_image)
+    annotated_image_b64 = image_to_base64(create_annotated_image(image, mask)) if include_overlay else None
     
     return {
-        'mask': mask.tolist(),
+        'mask': mask,
         'colorized_mask': colorized_mask_b64,
         'annotated_image': annotated_image_b64,
         'region_colors': region_colors,
@@ -2,9 +2,9 @@ import torch
 import torch.nn as nn
 import numpy as np
 from PIL import Image
-import torchvision.transforms as T
 import os
-from ai_models.unet.train_unet import UNet
+from ai_models.unet.unet_model import UNet
+from ai_models.unet.region_stats import palette_lut, colorize
 
 # --------- Inference Utilities ---------
 NUM_CLASSES = 7  # Should match training
@@ -22,32 +22,34 @@ PALETTE = [
     (128, 128, 128),  # other
 ]
 
-def load_model(device='cpu'):
+def load_model(device='cpu', checkpoint_path=MODEL_PATH):
     model = UNet(n_classes=NUM_CLASSES)
-    model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
+    model.load_state_dict(torch.load(checkpoint_path, map_location=device))
     model.eval()
     model.to(device)
     return model
 
 def preprocess_image(pil_img):
-    tf = T.Compose([
-        T.Resize((IMG_SIZE, IMG_SIZE)),
-        T.ToTensor(),
-    ])
-    return tf(pil_img).unsqueeze(0)  # (1, 3, H, W)
+    # Same as T.Resize + T.ToTensor, without importing torchvision at serve time
+    img = np.asarray(pil_img.resize((IMG_SIZE, IMG_SIZE), Image.BILINEAR), dtype=np.float32) / 255.0
+    return torch.from_numpy(img).permute(2, 0, 1).contiguous().unsqueeze(0)  # (1, 3, H, W)
 
-def predict_mask(model, pil_img, device='cpu'):
-    img_tensor = preprocess_image(pil_img).to(device)
+def predict_masks(model, batch, device='cpu'):
+    # Quantized models have no float parameters and take float32 input
+    param = next(model.parameters(), None)
+    batch = batch.to(device=device, dtype=param.dtype if param is not None else torch.float32)
     with torch.no_grad():
-        output = model(img_tensor)
-        mask = torch.argmax(output, dim=1).squeeze(0).cpu().numpy()  # (H, W)
-    return mask
+        output = model(batch)
+        masks = torch.argmax(output, dim=1).to(torch.uint8).cpu().numpy()  # (N, H, W)
+    return masks
+
+def predict_mask(model, pil_img, device='cpu'):
+    return predict_masks(model, preprocess_image(pil_img), device)[0]  # (H, W)
+
+PALETTE_LUT = palette_lut(PALETTE)
 
 def colorize_mask(mask):
-    color_mask = np.zeros((mask.shape[0], mask.shape[1], 3), dtype=np.uint8)
-    for i, color in enumerate(PALETTE):
-        color_mask[mask == i] = color
-    return Image.fromarray(color_mask)
+    return Image.fromarray(colorize(mask, PALETTE_LUT))
 
 # Example usage:
 if __name__ == '__main__':
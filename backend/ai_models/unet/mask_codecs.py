@@ -0,0 +1,32 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# --------- Compact class-mask encodings ---------
+# Shared by the API responses (app/services/mask_encoding.py) and the offline
+# batch CLI, so both write byte-identical masks.
+
+
+def indexed_png(mask, palette_lut):
+    """Palettized PNG bytes: pixel values are class ids, the palette holds display colors"""
+    img = Image.fromarray(mask.astype(np.uint8, copy=False), mode='P')
+    img.putpalette(palette_lut.reshape(-1).tolist())
+    buffer = BytesIO()
+    img.save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
+
+
+def rle_encode(mask):
+    """Row-major run-length encoding: parallel lists of class values and run lengths"""
+    flat = mask.reshape(-1)
+    if flat.size == 0:
+        return {'shape': list(mask.shape), 'values': [], 'lengths': []}
+    starts = np.flatnonzero(np.diff(flat)) + 1
+    starts = np.concatenate(([0], starts))
+    lengths = np.diff(np.concatenate((starts, [flat.size])))
+    return {'shape': list(mask.shape), 'values': flat[starts].tolist(), 'lengths': lengths.tolist()}
+
+
+def rle_decode(rle):
+    return np.repeat(np.asarray(rle['values'], dtype=np.uint8), rle['lengths']).reshape(rle['shape'])
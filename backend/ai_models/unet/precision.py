@@ -0,0 +1,105 @@
+import copy
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+# --------- Reduced-precision inference for the U-Nets ---------
+# fp32: BatchNorm folded into the preceding convs
+# bf16: fp32 weights, convs run under CPU bfloat16 autocast
+# int8: static post-training quantization (FX graph mode), calibrated on sample images
+#
+# Dynamic int8 quantization is not offered: PyTorch only quantizes
+# Linear/RNN layers dynamically, and both U-Nets are pure conv nets.
+
+PRECISIONS = ('fp32', 'bf16', 'int8')
+
+
+def fold_batchnorm(model):
+    """Fold every Conv2d -> BatchNorm2d pair into a single conv (eval mode only)"""
+    model = copy.deepcopy(model).eval()
+    for module in model.modules():
+        if not isinstance(module, nn.Sequential):
+            continue
+        layers = list(module.children())
+        for i in range(len(layers) - 1):
+            conv, bn = layers[i], layers[i + 1]
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                module[i] = fuse_conv_bn_eval(conv, bn)
+                module[i + 1] = nn.Identity()
+    return model
+
+
+def bf16_supported():
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+class InferenceWrapper(nn.Module):
+    """Applies memory format and autocast around a model; always returns fp32 logits"""
+
+    def __init__(self, model, autocast_dtype=None, channels_last=False):
+        super().__init__()
+        self.model = model
+        self.autocast_dtype = autocast_dtype
+        self.channels_last = channels_last
+
+    def forward(self, x):
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        if self.autocast_dtype is not None:
+            with torch.autocast(device_type=x.device.type, dtype=self.autocast_dtype):
+                return self.model(x).float()
+        return self.model(x)
+
+
+def quantize_static(model, calibration_batches, backend='x86'):
+    """Post-training static int8 quantization; ``calibration_batches`` yields (N, 3, H, W) tensors"""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    torch.backends.quantized.engine = backend
+    batches = iter(calibration_batches)
+    first = next(batches)
+    prepared = prepare_fx(copy.deepcopy(model).eval(), get_default_qconfig_mapping(backend), (first,))
+    with torch.no_grad():
+        prepared(first)
+        for batch in batches:
+            prepared(batch)
+    return convert_fx(prepared)
+
+
+def optimize_for_inference(model, precision='fp32', channels_last=False, fold_bn=True,
+                           calibration_batches=None, device='cpu'):
+    """Return ``(model, precision)``: an eval-mode model prepared for the
+    requested precision, and the precision actually used.
+
+    Falls back to fp32 (with a message) when the precision is not usable
+    here: bf16 on CPUs without native support, int8 without calibration
+    data or on a non-CPU device.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}'. Available: {list(PRECISIONS)}")
+    model = model.eval()
+    if precision == 'int8':
+        if device != 'cpu':
+            print(f"Precision int8 needs the CPU, not {device}; using fp32")
+            precision = 'fp32'
+        elif calibration_batches is None:
+            print("Precision int8 needs calibration images; using fp32")
+            precision = 'fp32'
+        else:
+            # Quantization fuses conv+bn+relu itself
+            return quantize_static(model, calibration_batches), precision
+    if precision == 'bf16' and device == 'cpu' and not bf16_supported():
+        print("This CPU has no native bfloat16 support; using fp32")
+        precision = 'fp32'
+    if fold_bn:
+        model = fold_batchnorm(model)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    if precision == 'bf16' or channels_last:
+        model = InferenceWrapper(model, torch.bfloat16 if precision == 'bf16' else None, channels_last)
+    return model.eval(), precision
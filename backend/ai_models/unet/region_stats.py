@@ -0,0 +1,76 @@
+import numpy as np
+
+# --------- Vectorized per-class region statistics ---------
+# Every statistic is computed for all classes at once with np.bincount over
+# the flattened label map, instead of building one boolean mask per class.
+
+
+def palette_lut(palette):
+    """Build a (256, 3) uint8 lookup table from a list of RGB colors"""
+    lut = np.zeros((256, 3), dtype=np.uint8)
+    lut[:len(palette)] = np.asarray(palette, dtype=np.uint8)
+    return lut
+
+
+def colorize(mask, palette):
+    """Map a (H, W) class mask to an (H, W, 3) RGB image with one table lookup"""
+    lut = palette if isinstance(palette, np.ndarray) and palette.shape == (256, 3) else palette_lut(palette)
+    return lut[mask.astype(np.uint8, copy=False)]
+
+
+def _kth_value(cdf, k):
+    """Value at 0-based rank ``k`` per class, given per-class cumulative histograms"""
+    return (cdf <= k[:, None]).sum(axis=1)
+
+
+def region_statistics(image, mask, num_classes, median=True):
+    """Per-class pixel counts, mean/median/std RGB and bounding boxes in one pass.
+
+    ``image`` is an (H, W, 3) uint8 RGB array with the same height/width as
+    ``mask``. Returns a dict of arrays indexed by class id; classes with no
+    pixels have zero colors and a bounding box of -1s.
+    """
+    h, w = mask.shape
+    labels = mask.reshape(-1).astype(np.intp, copy=False)
+    pixels = image.reshape(-1, 3)
+
+    counts = np.bincount(labels, minlength=num_classes)[:num_classes]
+    safe_counts = np.maximum(counts, 1)[:, None]
+
+    sums = np.empty((num_classes, 3))
+    sq_sums = np.empty((num_classes, 3))
+    for c in range(3):
+        channel = pixels[:, c].astype(np.float64)
+        sums[:, c] = np.bincount(labels, weights=channel, minlength=num_classes)[:num_classes]
+        sq_sums[:, c] = np.bincount(labels, weights=channel * channel, minlength=num_classes)[:num_classes]
+    mean = sums / safe_counts
+    std = np.sqrt(np.maximum(sq_sums / safe_counts - mean * mean, 0.0))
+
+    result = {"counts": counts, "mean": mean, "std": std}
+
+    if median:
+        # 256-bin histogram per (class, channel); the median is read off the CDF
+        med = np.zeros((num_classes, 3))
+        lower_rank = np.maximum(counts - 1, 0) // 2
+        upper_rank = counts // 2
+        for c in range(3):
+            hist = np.bincount(labels * 256 + pixels[:, c], minlength=num_classes * 256)
+            cdf = np.cumsum(hist[:num_classes * 256].reshape(num_classes, 256), axis=1)
+            med[:, c] = (_kth_value(cdf, lower_rank) + _kth_value(cdf, upper_rank)) / 2.0
+        med[counts == 0] = 0
+        result["median"] = med
+
+    # Bounding boxes from per-row / per-column class presence
+    rows = np.repeat(np.arange(h), w)
+    cols = np.tile(np.arange(w), h)
+    row_presence = np.bincount(labels * h + rows, minlength=num_classes * h)[:num_classes * h].reshape(num_classes, h) > 0
+    col_presence = np.bincount(labels * w + cols, minlength=num_classes * w)[:num_classes * w].reshape(num_classes, w) > 0
+    bbox = np.full((num_classes, 4), -1, dtype=np.int64)
+    present = counts > 0
+    bbox[present, 0] = col_presence[present].argmax(axis=1)
+    bbox[present, 1] = row_presence[present].argmax(axis=1)
+    bbox[present, 2] = w - 1 - col_presence[present, ::-1].argmax(axis=1)
+    bbox[present, 3] = h - 1 - row_presence[present, ::-1].argmax(axis=1)
+    result["bbox"] = bbox
+
+    return result
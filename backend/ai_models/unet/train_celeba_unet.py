@@ -11,12 +11,7 @@ from tqdm import tqdm
 import matplotlib.pyplot as plt
 from sklearn.model_selection import train_test_split
 
-# Define the 19 CelebAMask-HQ attributes
-CELEBA_ATTRIBUTES = [
-    'skin', 'nose', 'eye_g', 'l_eye', 'r_eye', 'l_brow', 'r_brow', 
-    'l_ear', 'r_ear', 'mouth', 'u_lip', 'l_lip', 'hair', 'hat', 
-    'ear_r', 'neck', 'neck_l', 'cloth'
-]
+from ai_models.unet.celeba_unet_model import UNet, CELEBA_ATTRIBUTES
 
 class CelebAMaskHQDataset(Dataset):
     def __init__(self, img_dir, mask_dir, transform=None, target_size=(512, 512)):
@@ -110,74 +105,6 @@ class CelebAMaskHQDataset(Dataset):
         
         return image, mask
 
-class UNet(nn.Module):
-    def __init__(self, in_channels=3, out_channels=len(CELEBA_ATTRIBUTES) + 1):  # +1 for background
-        super(UNet, self).__init__()
-        
-        # Encoder
-        self.enc1 = self._make_layer(in_channels, 64)
-        self.enc2 = self._make_layer(64, 128)
-        self.enc3 = self._make_layer(128, 256)
-        self.enc4 = self._make_layer(256, 512)
-        
-        # Bottleneck
-        self.bottleneck = self._make_layer(512, 1024)
-        
-        # Decoder
-        self.up4 = nn.ConvTranspose2d(1024, 512, kernel_size=2, stride=2)
-        self.dec4 = self._make_layer(1024, 512)  # 1024 = 512 + 512 (skip connection)
-        
-        self.up3 = nn.ConvTranspose2d(512, 256, kernel_size=2, stride=2)
-        self.dec3 = self._make_layer(512, 256)
-        
-        self.up2 = nn.ConvTranspose2d(256, 128, kernel_size=2, stride=2)
-        self.dec2 = self._make_layer(256, 128)
-        
-        self.up1 = nn.ConvTranspose2d(128, 64, kernel_size=2, stride=2)
-        self.dec1 = self._make_layer(128, 64)
-        
-        # Final output layer
-        self.final = nn.Conv2d(64, out_channels, kernel_size=1)
-        
-    def _make_layer(self, in_channels, out_channels):
-        return nn.Sequential(
-            nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1),
-            nn.BatchNorm2d(out_channels),
-            nn.ReLU(inplace=True),
-            nn.Conv2d(out_channels, out_channels, kernel_size=3, padding=1),
-            nn.BatchNorm2d(out_channels),
-            nn.ReLU(inplace=True)
-        )
-    
-    def forward(self, x):
-        # Encoder
-        enc1 = self.enc1(x)
-        enc2 = self.enc2(nn.MaxPool2d(2)(enc1))
-        enc3 = self.enc3(nn.MaxPool2d(2)(enc2))
-        enc4 = self.enc4(nn.MaxPool2d(2)(enc3))
-        
-        # Bottleneck
-        bottleneck = self.bottleneck(nn.MaxPool2d(2)(enc4))
-        
-        # Decoder with skip connections
-        dec4 = self.up4(bottleneck)
-        dec4 = torch.cat([dec4, enc4], dim=1)
-        dec4 = self.dec4(dec4)
-        
-        dec3 = self.up3(dec4)
-        dec3 = torch.cat([dec3, enc3], dim=1)
-        dec3 = self.dec3(dec3)
-        
-        dec2 = self.up2(dec3)
-        dec2 = torch.cat([dec2, enc2], dim=1)
-        dec2 = self.dec2(dec2)
-        
-        dec1 = self.up1(dec2)
-        dec1 = torch.cat([dec1, enc1], dim=1)
-        dec1 = self.dec1(dec1)
-        
-        return self.final(dec1)
-
 def train_model(model, train_loader, val_loader, num_epochs=50, device='cuda'):
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=1e-4)
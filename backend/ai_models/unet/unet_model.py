@@ -0,0 +1,40 @@
+import torch
+import torch.nn as nn
+
+# --------- U-Net Model ---------
+class UNet(nn.Module):
+    def __init__(self, n_classes):
+        super().__init__()
+        def CBR(in_ch, out_ch):
+            return nn.Sequential(
+                nn.Conv2d(in_ch, out_ch, 3, padding=1),
+                nn.BatchNorm2d(out_ch),
+                nn.ReLU(inplace=True),
+            )
+        self.enc1 = CBR(3, 64)
+        self.enc2 = CBR(64, 128)
+        self.enc3 = CBR(128, 256)
+        self.enc4 = CBR(256, 512)
+        self.pool = nn.MaxPool2d(2)
+        self.center = CBR(512, 1024)
+        self.up4 = nn.ConvTranspose2d(1024, 512, 2, stride=2)
+        self.dec4 = CBR(1024, 512)
+        self.up3 = nn.ConvTranspose2d(512, 256, 2, stride=2)
+        self.dec3 = CBR(512, 256)
+        self.up2 = nn.ConvTranspose2d(256, 128, 2, stride=2)
+        self.dec2 = CBR(256, 128)
+        self.up1 = nn.ConvTranspose2d(128, 64, 2, stride=2)
+        self.dec1 = CBR(128, 64)
+        self.final = nn.Conv2d(64, n_classes, 1)
+    def forward(self, x):
+        e1 = self.enc1(x)
+        e2 = self.enc2(self.pool(e1))
+        e3 = self.enc3(self.pool(e2))
+        e4 = self.enc4(self.pool(e3))
+        c = self.center(self.pool(e4))
+        d4 = self.dec4(torch.cat([self.up4(c), e4], 1))
+        d3 = self.dec3(torch.cat([self.up3(d4), e3], 1))
+        d2 = self.dec2(torch.cat([self.up2(d3), e2], 1))
+        d1 = self.dec1(torch.cat([self.up1(d2), e1], 1))
+        out = self.final(d1)
+        return out
@@ -1,65 +1,113 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from typing import List, Dict, Any
-import os
-import uuid
-from retinaface import RetinaFace
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple
 from PIL import Image
+import asyncio
 import base64
-# Add imports for MediaPipe and numpy
+import json
+import os
+import time
 import numpy as np
-import mediapipe as mp
-import cv2  # Add this import for drawing overlays
-from io import BytesIO
-from ai_models.unet.inference_unet import load_model, predict_mask, colorize_mask, PALETTE
-from ai_models.unet.inference_celeba_unet import process_image_with_celeba_unet
-import torch
+from app.core.config import settings
+from app.services import face_pipeline, face_tracking
+from app.services.model_registry import model_registry
+from app.services.batching import batcher_stats
+from app.services.executor import inference_executor
+from app.services.face_detector import face_detectors, get_detector
+from app.services.face_mesh_pool import face_mesh_pool
+from app.services.image_io import read_upload, decode_and_digest, decode_image, encode_image, validate_image_bytes
+from app.services.image_store import decoded_image_cache, load_uploaded_image
+from app.services.result_cache import result_cache
+from app.services.mask_encoding import validate_formats, render_response, to_json_compatible
+from app.services.jobs import job_queue
+from app.services.batch_analysis import BatchItem, open_zip_items, stream_ndjson
+from app.services.video_io import save_video_upload, open_video, iter_video_frames
+from app.services.live_stream import LatestFrame, compact_frame, stream_sessions
 
 router = APIRouter()
 
+@router.get("/models")
+async def get_model_stats():
+    """
+    Report the models held by the registry with their load time and memory
+    """
+    return {
+        "models": model_registry.stats(),
+        "batchers": batcher_stats(),
+        "executor": inference_executor.stats(),
+        "face_detectors": [detector.stats() for detector in face_detectors.values()],
+        "face_mesh_pool": face_mesh_pool.stats(),
+        "jobs": await job_queue.stats(),
+        "streams": stream_sessions.stats(),
+    }
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Report result cache hit/miss/eviction counters
+    """
+    return {**result_cache.stats(), "decoded_images": decoded_image_cache.stats()}
+
+async def _decode_source(content: Optional[bytes], image_id: Optional[str], endpoint: str,
+                         max_side: Optional[int] = None) -> Tuple[np.ndarray, str]:
+    if image_id:
+        return await load_uploaded_image(image_id, endpoint, max_side)
+    return await inference_executor.run(endpoint, decode_and_digest, content, max_side)
+
+async def _read_source(file: Optional[UploadFile], image_id: Optional[str]) -> Optional[bytes]:
+    if image_id:
+        return None
+    if file is None:
+        raise HTTPException(status_code=400, detail="Provide either file or image_id.")
+    return await read_upload(file)
+
+async def _load_image(file: Optional[UploadFile], image_id: Optional[str], endpoint: str,
+                      max_side: Optional[int] = None) -> Tuple[np.ndarray, str]:
+    """
+    Decoded image and pixel digest from either an upload in this request or the
+    `image_id` returned by /api/upload/image (decoded once, then served from memory)
+    """
+    content = await _read_source(file, image_id)
+    return await _decode_source(content, image_id, endpoint, max_side)
+
 @router.post("/detect")
-async def detect_faces(file: UploadFile = File(...)):
+async def detect_faces(
+    file: Optional[UploadFile] = File(None),
+    image_id: Optional[str] = Form(None),
+    threshold: Optional[float] = Form(None),
+    max_faces: Optional[int] = Form(None),
+    detector: Optional[str] = Form(None)
+):
     """
-    Detect faces in uploaded image using RetinaFace
+    Detect faces in uploaded image using RetinaFace, or `detector=mediapipe` for a faster,
+    less thorough pass (default: FACE_DETECTOR).
+    `threshold` (0-1) and `max_faces` override FACE_DETECTION_THRESHOLD / FACE_DETECTION_MAX_FACES
     """
-    # Validate file type
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image.")
-    
-    # Save file tạm thời
-    temp_filename = f"temp_{uuid.uuid4().hex[:8]}.jpg"
-    temp_path = os.path.join("/tmp", temp_filename)
-    with open(temp_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
-    
+    face_detector = get_detector(detector)
+    if threshold is not None and not 0 < threshold <= 1:
+        raise HTTPException(status_code=400, detail="threshold must be in (0, 1].")
+    if max_faces is not None and max_faces < 0:
+        raise HTTPException(status_code=400, detail="max_faces must be >= 0.")
+    img_np, digest = await _load_image(file, image_id, "detect")
     try:
-        # Detect faces
-        results = RetinaFace.detect_faces(temp_path)
-        faces = []
-        for face_id, face in results.items():
-            box = face["facial_area"]
-            faces.append({
-                "face_id": face_id,
-                "bounding_box": [int(x) for x in box],
-                "landmarks": {k: [float(v[0]), float(v[1])] for k, v in face.get("landmarks", {}).items()}
-            })
-        # Đọc kích thước ảnh
-        with Image.open(temp_path) as img:
-            width, height = img.size
-        return {
-            "num_faces": int(len(faces)),
-            "faces": faces,
-            "image_size": {"width": int(width), "height": int(height)}
-        }
+        return await result_cache.get_or_compute(
+            result_cache.key("detect", face_detector.version(threshold, max_faces), digest),
+            lambda: inference_executor.run("detect", face_pipeline.detect_faces, img_np, threshold, max_faces, detector),
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Face detection failed: {str(e)}")
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+
+def _crop_face_sync(img_np: np.ndarray, box) -> str:
+    cropped = np.asarray(Image.fromarray(img_np).crop(box))
+    return base64.b64encode(encode_image(cropped, format="JPEG")).decode()
 
 @router.post("/crop")
 async def crop_face(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    image_id: Optional[str] = Form(None),
     x1: int = Form(...),
     y1: int = Form(...),
     x2: int = Form(...),
@@ -68,226 +116,487 @@ async def crop_face(
     """
     Crop face from image using bounding box, return base64 image
     """
-    temp_filename = f"crop_{uuid.uuid4().hex[:8]}.jpg"
-    temp_path = os.path.join("/tmp", temp_filename)
-    crop_path = temp_path.replace(".jpg", "_face.jpg")
-    with open(temp_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    img_np, _ = await _load_image(file, image_id, "crop")
     try:
-        with Image.open(temp_path) as img:
-            cropped = img.crop((x1, y1, x2, y2))
-            cropped.save(crop_path)
-            with open(crop_path, "rb") as cf:
-                crop_b64 = base64.b64encode(cf.read()).decode()
+        crop_b64 = await inference_executor.run("crop", _crop_face_sync, img_np, (x1, y1, x2, y2))
         return {"cropped_image_base64": crop_b64}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Crop failed: {str(e)}")
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        if os.path.exists(crop_path):
-            os.remove(crop_path) 
-
-# Helper to draw overlays for each region
-
-def draw_regions_on_image(image: np.ndarray, regions: dict) -> np.ndarray:
-    overlay = image.copy()
-    color_map = {
-        "lips": (255, 0, 0),
-        "left_eye": (0, 255, 0),
-        "right_eye": (0, 255, 0),
-        "left_eyebrow": (0, 0, 255),
-        "right_eyebrow": (0, 0, 255),
-        "left_cheek": (255, 255, 0),
-        "right_cheek": (255, 255, 0),
-        "contour": (255, 0, 255),
-    }
-    alpha = 0.4  # Transparency
-    for region_name, points in regions.items():
-        if not points:
-            continue
-        pts = np.array(points, np.int32)
-        pts = pts.reshape((-1, 1, 2))
-        cv2.fillPoly(overlay, [pts], color_map.get(region_name, (255, 255, 255)))
-    # Blend overlay with original image
-    cv2.addWeighted(overlay, alpha, image, 1 - alpha, 0, image)
-    return image
-
-def image_to_base64(image: np.ndarray) -> str:
-    pil_img = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-    buffered = BytesIO()
-    pil_img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    return f"data:image/png;base64,{img_str}"
 
 @router.post("/makeup/extract")
-async def extract_makeup(file: UploadFile = File(...)):
+async def extract_makeup(
+    file: Optional[UploadFile] = File(None),
+    image_id: Optional[str] = Form(None),
+    multi_face: bool = Form(False)
+):
     """
     Extract makeup attributes (lips, eyes, eyebrows, blush, contour) from a cropped face image using MediaPipe Face Mesh
     Returns both the attributes and an annotated image with overlays for each region.
+    With `multi_face`, every face in the image is returned under `faces`.
     """
-    # Validate file type
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image.")
-    temp_filename = f"makeup_{uuid.uuid4().hex[:8]}.jpg"
-    temp_path = os.path.join("/tmp", temp_filename)
-    with open(temp_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    img_np, digest = await _load_image(file, image_id, "makeup_extract")
     try:
-        with Image.open(temp_path) as img:
-            img = img.convert("RGB")
-            img_np = np.array(img)
-        mp_face_mesh = mp.solutions.face_mesh
-        with mp_face_mesh.FaceMesh(static_image_mode=True, max_num_faces=1, refine_landmarks=True) as face_mesh:
-            results = face_mesh.process(img_np)
-            if not results.multi_face_landmarks:
+
+        async def compute_multi():
+            faces, annotated_img_b64 = await inference_executor.run(
+                "makeup_extract", face_pipeline.extract_makeup_faces, img_np, True, settings.MULTI_FACE_MAX_FACES
+            )
+            if not faces:
                 raise HTTPException(status_code=404, detail="No face landmarks detected.")
-            landmarks = results.multi_face_landmarks[0]
-            h, w, _ = img_np.shape
-            # Get landmark points as pixel coordinates
-            points = [(int(lm.x * w), int(lm.y * h)) for lm in landmarks.landmark]
-            # Define indices for each region (MediaPipe Face Mesh indices)
-            LIPS_IDX = list(range(61, 88)) + list(range(291, 318))
-            LEFT_EYE_IDX = list(range(33, 42)) + list(range(133, 144))
-            RIGHT_EYE_IDX = list(range(263, 272)) + list(range(362, 373))
-            LEFT_EYEBROW_IDX = list(range(46, 66))
-            RIGHT_EYEBROW_IDX = list(range(276, 296))
-            LEFT_CHEEK_IDX = list(range(205, 218))
-            RIGHT_CHEEK_IDX = list(range(425, 438))
-            JAWLINE_IDX = list(range(0, 17)) + list(range(267, 285))
-            # Helper to get mask for a region
-            def region_mask(indices):
-                mask = np.zeros((h, w), dtype=np.uint8)
-                region = np.array([points[i] for i in indices], dtype=np.int32)
-                cv2.fillPoly(mask, [region], 1)
-                return mask.astype(bool)
-            # Helper to get average color
-            def avg_color(mask):
-                region_pixels = img_np[mask]
-                if len(region_pixels) == 0:
-                    return [0, 0, 0]
-                return [int(np.mean(region_pixels[:, i])) for i in range(3)]
-            # Masks and colors
-            lips_mask = region_mask(LIPS_IDX)
-            left_eye_mask = region_mask(LEFT_EYE_IDX)
-            right_eye_mask = region_mask(RIGHT_EYE_IDX)
-            left_eyebrow_mask = region_mask(LEFT_EYEBROW_IDX)
-            right_eyebrow_mask = region_mask(RIGHT_EYEBROW_IDX)
-            left_cheek_mask = region_mask(LEFT_CHEEK_IDX)
-            right_cheek_mask = region_mask(RIGHT_CHEEK_IDX)
-            # Colors
-            lips_color = avg_color(lips_mask)
-            left_eye_color = avg_color(left_eye_mask)
-            right_eye_color = avg_color(right_eye_mask)
-            left_eyebrow_color = avg_color(left_eyebrow_mask)
-            right_eyebrow_color = avg_color(right_eyebrow_mask)
-            left_cheek_color = avg_color(left_cheek_mask)
-            right_cheek_color = avg_color(right_cheek_mask)
-            # Contour (jawline) shape: return as list of points
-            contour_points = [points[i] for i in JAWLINE_IDX]
-            # Prepare regions for overlay
-            regions = {
-                "lips": [points[i] for i in LIPS_IDX],
-                "left_eye": [points[i] for i in LEFT_EYE_IDX],
-                "right_eye": [points[i] for i in RIGHT_EYE_IDX],
-                "left_eyebrow": [points[i] for i in LEFT_EYEBROW_IDX],
-                "right_eyebrow": [points[i] for i in RIGHT_EYEBROW_IDX],
-                "left_cheek": [points[i] for i in LEFT_CHEEK_IDX],
-                "right_cheek": [points[i] for i in RIGHT_CHEEK_IDX],
-                "contour": contour_points,
-            }
-            # Draw overlays
-            annotated_img = draw_regions_on_image(img_np.copy(), regions)
-            annotated_img_b64 = image_to_base64(annotated_img)
-            return {
-                "lips_color": lips_color,
-                "left_eye_color": left_eye_color,
-                "right_eye_color": right_eye_color,
-                "left_eyebrow_color": left_eyebrow_color,
-                "right_eyebrow_color": right_eyebrow_color,
-                "left_cheek_color": left_cheek_color,
-                "right_cheek_color": right_cheek_color,
-                "contour_shape": contour_points,
-                "annotated_image": annotated_img_b64
-            }
+            return {"num_faces": len(faces), "faces": faces, "annotated_image": annotated_img_b64}
+
+        if multi_face:
+            return await result_cache.get_or_compute(
+                result_cache.key("makeup_extract_multi", "facemesh", digest), compute_multi
+            )
+
+        async def compute():
+            result = await inference_executor.run("makeup_extract", face_pipeline.extract_makeup, img_np)
+            if result is None:
+                raise HTTPException(status_code=404, detail="No face landmarks detected.")
+            return result
+
+        return await result_cache.get_or_compute(
+            result_cache.key("makeup_extract", "facemesh", digest), compute
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Makeup extraction failed: {str(e)}")
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path) 
+
+async def _model_version(model: str) -> str:
+    # Off the event loop: the default checkpoint path may import the model module (and torch)
+    return await run_in_threadpool(model_registry.version, model)
+
+async def _segment_all_faces(img_np: np.ndarray, digest: str, model: str, outputs, endpoint: str,
+                             mask_format: str):
+    version = await _model_version(model)
+    return await result_cache.get_or_compute(
+        result_cache.key(f"{endpoint}_multi", f"{get_detector().version()}+{version}:{mask_format}", digest),
+        lambda: face_pipeline.segment_faces(img_np, model, outputs, endpoint, mask_format=mask_format),
+    )
+
+# Per-model settings of the two segmentation endpoints (sync and job mode share them)
+SEGMENTATION_ENDPOINTS = {
+    "unet_extract": ("unet", ("mask", "colors")),
+    "celeba_unet_extract": ("celeba_unet", ("mask", "overlay", "colors")),
+}
+
+def _segmentation_max_side(endpoint: str, multi_face: bool) -> Optional[int]:
+    # Full-resolution decode for multi_face (boxes are reported in original image
+    # coordinates); otherwise the U-Nets work at 256/512 px, so large JPEGs can be
+    # decoded at reduced scale and uploads can use their analysis copy
+    model, _ = SEGMENTATION_ENDPOINTS[endpoint]
+    return None if multi_face else max(model_registry.input_size(model))
+
+async def _segment(endpoint: str, img_np: np.ndarray, digest: str, multi_face: bool, mask_format: str):
+    model, outputs = SEGMENTATION_ENDPOINTS[endpoint]
+    if multi_face:
+        return await _segment_all_faces(img_np, digest, model, outputs, endpoint, mask_format)
+
+    async def compute():
+        results = await face_pipeline.segment_images([img_np], model, outputs, endpoint, mask_format)
+        return results[0]
+
+    version = await _model_version(model)
+    return await result_cache.get_or_compute(result_cache.key(endpoint, f"{version}:{mask_format}", digest), compute)
+
+def _segmentation_job_handler(endpoint: str):
+    async def handler(content: Optional[bytes], image_id: Optional[str], options: dict):
+        img_np, digest = await _decode_source(
+            content, image_id, endpoint, _segmentation_max_side(endpoint, options["multi_face"])
+        )
+        return await _segment(endpoint, img_np, digest, options["multi_face"], options["mask_format"])
+    return handler
+
+for _endpoint in SEGMENTATION_ENDPOINTS:
+    job_queue.register(_endpoint, _segmentation_job_handler(_endpoint))
+
+async def _segmentation_request(endpoint: str, file: Optional[UploadFile], image_id: Optional[str],
+                                multi_face: bool, mask_format: str, response_format: str,
+                                async_job: bool, callback_url: Optional[str]):
+    validate_formats(mask_format, response_format)
+    if async_job:
+        content = await _read_source(file, image_id)
+        record = await job_queue.submit(
+            endpoint, {"multi_face": multi_face, "mask_format": mask_format},
+            content=content, image_id=image_id, callback_url=callback_url,
+        )
+        return JSONResponse(status_code=202, content={
+            "job_id": record["job_id"],
+            "status": record["status"],
+            "status_url": f"/api/face/jobs/{record['job_id']}",
+        })
+    img_np, digest = await _load_image(file, image_id, endpoint, _segmentation_max_side(endpoint, multi_face))
+    result = await _segment(endpoint, img_np, digest, multi_face, mask_format)
+    return render_response(result, response_format)
 
 @router.post("/makeup/unet_extract")
-async def unet_extract_makeup(file: UploadFile = File(...)):
+async def unet_extract_makeup(
+    file: Optional[UploadFile] = File(None),
+    image_id: Optional[str] = Form(None),
+    multi_face: bool = Form(False),
+    mask_format: str = Form("png"),
+    response_format: str = Form("json"),
+    async_job: bool = Form(False),
+    callback_url: Optional[str] = Form(None)
+):
     """
     Extract face regions using U-Net, return colorized mask and average color for each region.
+    With `multi_face`, the full image is searched with RetinaFace and every face is
+    aligned and segmented in one batch.
+    `mask_format` is png (colorized), indexed_png, raw or rle; `response_format=binary`
+    returns multipart/mixed with the images and masks as raw parts instead of base64.
+    With `async_job`, returns 202 with a job ID at once; poll /jobs/{job_id} or pass
+    `callback_url` to have the finished job POSTed to it.
     """
-    temp_filename = f"unet_{uuid.uuid4().hex[:8]}.jpg"
-    temp_path = os.path.join("/tmp", temp_filename)
-    with open(temp_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
     try:
-        pil_img = Image.open(temp_path).convert('RGB')
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        model = load_model(device)
-        mask = predict_mask(model, pil_img, device)
-        color_mask_img = colorize_mask(mask)
-        # Encode color mask as base64
-        buffered = BytesIO()
-        color_mask_img.save(buffered, format="PNG")
-        mask_b64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
-        # Compute average color for each region
-        region_colors = {}
-        np_img = np.array(pil_img.resize(mask.shape[::-1]))
-        for idx, name in enumerate([
-            "background", "skin", "lips", "eyes", "eyebrows", "cheeks", "other"
-        ]):
-            region_pixels = np_img[mask == idx]
-            if len(region_pixels) == 0:
-                region_colors[name] = [0, 0, 0]
-            else:
-                region_colors[name] = [int(np.mean(region_pixels[:, i])) for i in range(3)]
-        return {
-            "colorized_mask": f"data:image/png;base64,{mask_b64}",
-            "region_colors": region_colors
-        }
+        return await _segmentation_request(
+            "unet_extract", file, image_id, multi_face, mask_format, response_format, async_job, callback_url
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"U-Net extraction failed: {str(e)}")
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path) 
 
 @router.post("/makeup/celeba_unet_extract")
-async def celeba_unet_extract_makeup(file: UploadFile = File(...)):
+async def celeba_unet_extract_makeup(
+    file: Optional[UploadFile] = File(None),
+    image_id: Optional[str] = Form(None),
+    multi_face: bool = Form(False),
+    mask_format: str = Form("png"),
+    response_format: str = Form("json"),
+    async_job: bool = Form(False),
+    callback_url: Optional[str] = Form(None)
+):
     """
     Extract makeup attributes using CelebAMask-HQ U-Net model
+    With `multi_face`, every detected face is aligned and segmented in one batch.
+    `mask_format`, `response_format`, `async_job` and `callback_url` work as for
+    /makeup/unet_extract.
     """
-    # Validate file type
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image.")
-    
-    # Save file temporarily
-    temp_filename = f"celeba_unet_{uuid.uuid4().hex[:8]}.jpg"
-    temp_path = os.path.join("/tmp", temp_filename)
-    
-    with open(temp_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
-    
     try:
-        # Process with CelebAMask-HQ U-Net
-        result = process_image_with_celeba_unet(temp_path)
-        
-        return {
-            "colorized_mask": f"data:image/png;base64,{result['colorized_mask']}",
-            "annotated_image": f"data:image/png;base64,{result['annotated_image']}",
-            "region_colors": result["region_colors"],
-            "attributes": result["attributes"]
-        }
+        return await _segmentation_request(
+            "celeba_unet_extract", file, image_id, multi_face, mask_format, response_format, async_job, callback_url
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"CelebAMask-HQ U-Net extraction failed: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Status of an async analysis job; includes the result once it has succeeded
+    """
+    record = await job_queue.get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_queue.public_view(record)
+
+def _parse_options(value: str, allowed, name: str) -> List[str]:
+    options = [option.strip() for option in value.split(",") if option.strip()]
+    unknown = [option for option in options if option not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown {name}: {unknown}. Allowed: {list(allowed)}")
+    return options
+
+def _parse_analyze_options(stages: str, outputs: str, model: str, mask_format: str):
+    validate_formats(mask_format, "json")
+    stage_list = _parse_options(stages, face_pipeline.ANALYZE_STAGES, "stages")
+    output_list = _parse_options(outputs, face_pipeline.ANALYZE_OUTPUTS, "outputs")
+    if model not in face_pipeline.SEGMENTATION_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model}. Allowed: {list(face_pipeline.SEGMENTATION_MODELS)}")
+    return stage_list, output_list
+
+async def _analyze(img_np: np.ndarray, digest: str, stage_list: List[str], output_list: List[str],
+                   model: str, mask_format: str, endpoint: str, detector: Optional[str] = None):
+    # Cached under "analyze" whichever endpoint asks, so batch and single requests share results
+    version = await _model_version(model) if "segment" in stage_list else "none"
+    detection = get_detector(detector).version() if "detect" in stage_list else "none"
+    options = f"{'+'.join(sorted(stage_list))}:{'+'.join(sorted(output_list))}:{detection}:{version}:{mask_format}"
+    return await result_cache.get_or_compute(
+        result_cache.key("analyze", options, digest),
+        lambda: face_pipeline.analyze_image(img_np, stage_list, output_list, model, endpoint, mask_format, detector),
+    )
+
+@router.post("/analyze")
+async def analyze_face(
+    file: Optional[UploadFile] = File(None),
+    image_id: Optional[str] = Form(None),
+    stages: str = Form("detect,crop,landmarks,segment"),
+    outputs: str = Form("colors"),
+    model: str = Form("celeba_unet"),
+    mask_format: str = Form("png"),
+    response_format: str = Form("json"),
+    detector: Optional[str] = Form(None)
+):
+    """
+    Run detection, per-face cropping, landmark extraction and segmentation as one
+    pipeline over a single decoded image.
+    `stages` and `outputs` (mask, overlay, colors, crop) are comma-separated;
+    `mask_format` and `response_format` work as for /makeup/unet_extract;
+    `detector` picks the face detector as for /detect.
+    """
+    validate_formats(mask_format, response_format)
+    stage_list, output_list = _parse_analyze_options(stages, outputs, model, mask_format)
+    get_detector(detector)
+    img_np, digest = await _load_image(file, image_id, "analyze")
+    try:
+        result = await _analyze(img_np, digest, stage_list, output_list, model, mask_format, "analyze", detector)
+        return render_response(result, response_format)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Face analysis failed: {str(e)}")
+
+@router.post("/batch")
+async def analyze_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    image_ids: Optional[str] = Form(None),
+    stages: str = Form("detect,segment"),
+    outputs: str = Form("colors"),
+    model: str = Form("unet"),
+    mask_format: str = Form("rle"),
+    detector: Optional[str] = Form(None)
+):
+    """
+    Analyze many images in one request: multipart `files`, a zip `archive` and/or
+    comma-separated upload `image_ids`. Each image goes through the /analyze pipeline;
+    images run concurrently so their U-Net passes share batched forwards.
+    Streams NDJSON, one line per image as it finishes:
+    {"index", "source", "result"} or {"index", "source", "error"}.
+    """
+    stage_list, output_list = _parse_analyze_options(stages, outputs, model, mask_format)
+    items: List[BatchItem] = [BatchItem(i, f.filename or f"file_{i}", file=f) for i, f in enumerate(files or [])]
+    for value in (image_ids or "").split(","):
+        if value.strip():
+            items.append(BatchItem(len(items), value.strip(), image_id=value.strip()))
+    zip_file = None
+    if archive is not None:
+        if archive.size is not None and archive.size > settings.BATCH_MAX_ARCHIVE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Archive too large. Maximum size: {settings.BATCH_MAX_ARCHIVE_SIZE // (1024*1024)}MB"
+            )
+        zip_file, zip_items = await run_in_threadpool(open_zip_items, archive.file, len(items))
+        items.extend(zip_items)
+    if not items:
+        if zip_file is not None:
+            zip_file.close()
+        raise HTTPException(status_code=400, detail="Provide files, archive or image_ids.")
+    if len(items) > settings.BATCH_MAX_IMAGES:
+        if zip_file is not None:
+            zip_file.close()
+        raise HTTPException(status_code=400, detail=f"Too many images. Maximum: {settings.BATCH_MAX_IMAGES}")
+
+    async def process(item: BatchItem):
+        content = await item.read()
+        # Full-resolution decode: boxes are reported in original image coordinates
+        img_np, digest = await _decode_source(content, item.image_id, "batch")
+        return await _analyze(img_np, digest, stage_list, output_list, model, mask_format, "batch", detector)
+
+    async def body():
+        try:
+            async for line in stream_ndjson(items, process):
+                yield line
+        finally:
+            if zip_file is not None:
+                zip_file.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+def _tracking_session(stages: str, outputs: str, model: str, mask_format: str, max_faces: int,
+                      detector: Optional[str], endpoint: str) -> face_tracking.FaceTrackingSession:
+    stage_list = _parse_options(stages, face_tracking.VIDEO_STAGES, "stages")
+    output_list = _parse_options(outputs, face_tracking.VIDEO_OUTPUTS, "outputs")
+    validate_formats(mask_format, "json")
+    if "segment" in stage_list and model not in face_pipeline.SEGMENTATION_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model}. Allowed: {list(face_pipeline.SEGMENTATION_MODELS)}")
+    if not 1 <= max_faces <= settings.VIDEO_MAX_FACES:
+        raise HTTPException(status_code=400, detail=f"max_faces must be between 1 and {settings.VIDEO_MAX_FACES}.")
+    return face_tracking.FaceTrackingSession(
+        stage_list, output_list, model, mask_format, max_faces, detector, endpoint=endpoint
+    )
+
+def _video_frames(file: Optional[UploadFile], frames: Optional[List[UploadFile]], archive: Optional[UploadFile],
+                  frame_stride: int, fps: float):
+    """Async frame source over an uploaded clip, a list of frame images or a zip of frames
+    (in file name order), plus the cleanup to run when the stream ends"""
+    resources = {}
+
+    async def sequence(items: List[BatchItem]):
+        for item in items[:settings.VIDEO_MAX_FRAMES * frame_stride:frame_stride]:
+            content = await item.read()
+            image = await run_in_threadpool(decode_image, content)
+            yield item.index, item.index * 1000 / fps, image
+
+    async def clip():
+        frame_iter = iter_video_frames(resources["capture"], frame_stride, settings.VIDEO_MAX_FRAMES)
+        while True:
+            frame = await run_in_threadpool(next, frame_iter, None)
+            if frame is None:
+                return
+            yield frame
+
+    async def open_source():
+        if file is not None:
+            resources["path"] = await save_video_upload(file)
+            resources["capture"] = await run_in_threadpool(open_video, resources["path"])
+            return clip()
+        items = [BatchItem(i, f.filename or f"frame_{i}", file=f) for i, f in enumerate(frames or [])]
+        if archive is not None:
+            resources["zip"], zip_items = await run_in_threadpool(open_zip_items, archive.file)
+            items = sorted(zip_items, key=lambda item: item.source)
+            for index, item in enumerate(items):
+                item.index = index
+        if not items:
+            raise HTTPException(status_code=400, detail="Provide file, frames or archive.")
+        return sequence(items)
+
+    def cleanup():
+        if "capture" in resources:
+            resources["capture"].release()
+        if "path" in resources and os.path.exists(resources["path"]):
+            os.remove(resources["path"])
+        if "zip" in resources:
+            resources["zip"].close()
+
+    return open_source, cleanup
+
+@router.post("/video")
+async def analyze_video(
+    file: Optional[UploadFile] = File(None),
+    frames: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    stages: str = Form("landmarks"),
+    outputs: str = Form("colors"),
+    model: str = Form("unet"),
+    mask_format: str = Form("rle"),
+    max_faces: int = Form(1),
+    frame_stride: int = Form(1),
+    fps: float = Form(30.0),
+    detector: Optional[str] = Form(None)
+):
+    """
+    Analyze a video clip (`file`) or a frame sequence (`frames`, or a zip `archive`
+    read in file name order; exactly one of the three, 422 otherwise) with FaceMesh
+    landmark tracking. The face detector runs
+    only on keyframes and when tracking is lost, and each face's segmentation is
+    reused until it moves. `stages`: landmarks, segment; `outputs`: regions, colors,
+    mask, overlay. Every `frame_stride`-th frame is processed; `fps` sets the
+    timestamps of frame sequences.
+    Streams NDJSON, one line per frame in order:
+    {"frame", "timestamp_ms", "keyframe", "faces"} or {"frame", "error"},
+    then {"summary"} with frame, keyframe and segmentation counts.
+    """
+    if frame_stride < 1 or fps <= 0:
+        raise HTTPException(status_code=400, detail="frame_stride must be >= 1 and fps > 0.")
+    if (file is not None) + bool(frames) + (archive is not None) > 1:
+        raise HTTPException(status_code=422, detail="Provide only one of file, frames or archive.")
+    session = _tracking_session(stages, outputs, model, mask_format, max_faces, detector, "video")
+    open_source, cleanup = _video_frames(file, frames, archive, frame_stride, fps)
+    try:
+        source = await open_source()
+    except BaseException:
+        cleanup()
+        raise
+
+    async def body():
+        try:
+            async for index, timestamp_ms, frame in source:
+                try:
+                    line = await session.process(frame, index, timestamp_ms)
+                except HTTPException as e:
+                    line = {"frame": index, "error": e.detail}
+                except Exception as e:
+                    line = {"frame": index, "error": str(e)}
+                yield (json.dumps(to_json_compatible(line), separators=(",", ":")) + "\n").encode()
+            summary = {"summary": session.stats()}
+            yield (json.dumps(summary, separators=(",", ":")) + "\n").encode()
+        finally:
+            await run_in_threadpool(session.close)
+            cleanup()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@router.websocket("/stream")
+async def stream_frames(
+    websocket: WebSocket,
+    stages: str = "landmarks",
+    outputs: str = "colors",
+    model: str = "unet",
+    mask_format: str = "rle",
+    max_faces: int = 1,
+    detector: Optional[str] = None
+):
+    """
+    Live camera analysis. Send each frame as one binary message (JPEG or WebP);
+    query parameters work as for /video. Frames are tracked with one FaceMesh
+    per connection, and a frame that arrives while the server is busy replaces
+    the one still waiting, so replies always describe the newest frame.
+    Each reply is a JSON text message {"frame", "keyframe", "faces", "dropped", "ms"}
+    (or {"frame", "error"}): faces carry "id", "box", "score" and landmark
+    "colors", plus "regions" and "segmentation" when requested; a face's
+    segmentation is only sent when it is recomputed. `frame` counts received
+    frames and `dropped` is the running total of skipped ones.
+    At most `STREAM_MAX_SESSIONS` connections are served at once; further ones
+    get an error message and close code 1013 (try again later).
+    """
+    await websocket.accept()
+    if not stream_sessions.try_acquire(settings.STREAM_MAX_SESSIONS):
+        await websocket.send_json({"error": "Too many live sessions, please retry later"})
+        await websocket.close(code=1013)
+        return
+    try:
+        await _stream_session(websocket, stages, outputs, model, mask_format, max_faces, detector)
+    finally:
+        stream_sessions.release()
+
+async def _stream_session(websocket: WebSocket, stages: str, outputs: str, model: str, mask_format: str,
+                          max_faces: int, detector: Optional[str]):
+    try:
+        session = _tracking_session(stages, outputs, model, mask_format, max_faces, detector, "stream")
+    except HTTPException as e:
+        await websocket.send_json({"error": e.detail})
+        await websocket.close(code=1008)
+        return
+    mailbox = LatestFrame()
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    mailbox.put(message["bytes"])
+        finally:
+            mailbox.close()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            item = await mailbox.get()
+            if item is None:
+                break
+            index, data = item
+            start = time.perf_counter()
+            try:
+                validate_image_bytes(data)
+                frame = await run_in_threadpool(decode_image, data)
+                result = await session.process(frame, index)
+                reply = compact_frame(result, mailbox.dropped, (time.perf_counter() - start) * 1000)
+            except HTTPException as e:
+                reply = {"frame": index, "error": e.detail}
+            except Exception as e:
+                reply = {"frame": index, "error": str(e)}
+            await websocket.send_text(json.dumps(to_json_compatible(reply), separators=(",", ":")))
+    except WebSocketDisconnect:
+        pass
     finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path) 
\ No newline at end of file
+        receiver.cancel()
+        await run_in_threadpool(session.close)
@@ -6,7 +6,10 @@ from datetime import datetime
 from typing import Optional
 
 from app.core.config import settings
-from app.services.storage import MinioService
+from app.services.storage import minio_service
+from app.services.image_io import save_upload
+from app.services.derivatives import DERIVATIVE_FORMATS, derivative_path, generate_derivatives, image_hasher
+from app.services.executor import inference_executor
 
 router = APIRouter()
 
@@ -23,37 +26,51 @@ async def upload_image(file: UploadFile = File(...)):
             detail=f"File type not allowed. Allowed types: {settings.ALLOWED_EXTENSIONS}"
         )
     
-    # Validate file size
-    if file.size > settings.MAX_FILE_SIZE:
+    # Reject early when the client declared the size; otherwise it is enforced while streaming
+    if file.size is not None and file.size > settings.MAX_FILE_SIZE:
         raise HTTPException(
             status_code=400,
             detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE // (1024*1024)}MB"
         )
     
     try:
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        filename = f"{timestamp}_{unique_id}{file_extension}"
+        # Stream to a temporary name in chunks, checking size, magic bytes and
+        # pixel dimensions, and hashing the content on the way
+        tmp_path = os.path.join(settings.UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+        hasher = image_hasher()
+        size = await save_upload(file, tmp_path, hasher)
         
-        # Save file locally first
+        # Content-addressed name: identical uploads share one ID and one set of derivatives
+        image_id = hasher.hexdigest()
+        filename = f"{image_id}{file_extension}"
         local_path = os.path.join(settings.UPLOAD_DIR, filename)
-        with open(local_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        os.replace(tmp_path, local_path)
         
-        # TODO: Upload to MinIO
-        # minio_service = MinioService()
-        # minio_path = await minio_service.upload_file(local_path, filename)
+        # Analysis copy + thumbnail, so later requests never decode the full-size original
+        derivatives = await inference_executor.run("upload_derive", generate_derivatives, image_id, local_path)
+        
+        minio_path = None
+        if settings.MINIO_UPLOAD_ENABLED:
+            minio_path = await minio_service.upload_file(local_path, filename, content_type=file.content_type or "application/octet-stream")
+            for kind in DERIVATIVE_FORMATS:
+                await minio_service.upload_file(
+                    derivative_path(image_id, kind), derivatives[kind]["filename"],
+                    content_type=f"image/{DERIVATIVE_FORMATS[kind][0].lower()}"
+                )
         
         return JSONResponse({
             "success": True,
+            "image_id": image_id,
             "filename": filename,
             "local_path": local_path,
-            "size": file.size,
+            "minio_path": minio_path,
+            "size": size,
+            "derivatives": derivatives,
             "message": "Image uploaded successfully"
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
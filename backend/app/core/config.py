@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Any, Dict, List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -11,6 +11,13 @@ class Settings(BaseSettings):
     MINIO_ACCESS_KEY: str = "minioadmin"
     MINIO_SECRET_KEY: str = "minioadmin"
     MINIO_BUCKET: str = "facetory-storage"
+    MINIO_UPLOAD_ENABLED: bool = False  # mirror /api/upload/image files to the bucket
+    MINIO_POOL_SIZE: int = 16  # keep-alive connections shared by all requests
+    MINIO_MAX_WORKERS: int = 8  # I/O threads running the blocking SDK calls
+    MINIO_PART_SIZE: int = 8 * 1024 * 1024  # objects above this use multipart upload
+    MINIO_PARALLEL_UPLOADS: int = 4  # multipart parts in flight per object
+    MINIO_CONNECT_TIMEOUT: float = 5.0
+    MINIO_READ_TIMEOUT: float = 60.0
     
     # Redis
     REDIS_URL: str = "redis://redis:6379"
@@ -26,9 +33,111 @@ class Settings(BaseSettings):
     # File upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: List[str] = [".jpg", ".jpeg", ".png"]
+    UPLOAD_CHUNK_SIZE: int = 256 * 1024  # bytes read per chunk while streaming uploads
+    MAX_IMAGE_PIXELS: int = 40_000_000  # width * height, checked from the header before decoding
     
     # Upload directory
     UPLOAD_DIR: str = "uploads"
+    ANALYSIS_IMAGE_SIZE: int = 512  # short edge of the stored analysis copy (CelebA U-Net input)
+    THUMBNAIL_SIZE: int = 256  # long edge of the gallery thumbnail
+    
+    # Model registry
+    MODEL_DEVICE: str = "auto"  # "auto", "cpu", "cuda", "cuda:1", ...
+    MODEL_DTYPE: str = "float32"
+    MODEL_PRELOAD: List[str] = ["unet", "celeba_unet"]
+    PREWARM_IN_BACKGROUND: bool = False  # serve (and answer /health) while models load
+    UNET_CHECKPOINT: Optional[str] = None  # None -> ai_models/unet/checkpoints/best_unet.pth
+    CELEBA_UNET_CHECKPOINT: Optional[str] = None  # None -> best_celeba_unet.pth
+    MODEL_HOT_RELOAD: bool = True
+    MODEL_RELOAD_CHECK_INTERVAL: float = 5.0  # seconds between checkpoint mtime checks
+    MODEL_PRECISION: str = "fp32"  # "fp32", "bf16" (CPU autocast) or "int8" (static quantization, CPU)
+    MODEL_FOLD_BN: bool = True  # fold BatchNorm into the preceding convs
+    MODEL_CHANNELS_LAST: bool = False
+    MODEL_CALIBRATION_DIR: Optional[str] = None  # sample images for int8 calibration
+    MODEL_CALIBRATION_IMAGES: int = 32
+    INFERENCE_BACKEND: str = "torch"  # "torch", "torchscript" or "onnxruntime" (falls back to torch)
+    MODEL_EXPORT_DIR: str = "exports"  # written by python -m ai_models.unet.export
+    ORT_INTRA_OP_THREADS: int = 0  # 0 -> onnxruntime default (one per physical core)
+    ORT_INTER_OP_THREADS: int = 0
+    
+    # Dynamic micro-batching for the U-Net endpoints
+    BATCHING_ENABLED: bool = True
+    BATCH_MAX_SIZE: int = 8
+    BATCH_MAX_WAIT_MS: float = 10.0
+    BATCH_THREAD_WORKERS: int = 2  # batched forward passes run on their own pool
+    
+    # Inference execution layer (keeps CPU-bound model work off the event loop)
+    EXECUTOR_THREAD_WORKERS: int = 4  # raised to the sum of EXECUTOR_CONCURRENCY if that is larger
+    EXECUTOR_PROCESS_WORKERS: int = 0  # 0 -> os.cpu_count()
+    EXECUTOR_PROCESS_ENDPOINTS: List[str] = []  # endpoints whose jobs run in the process pool
+    EXECUTOR_CONCURRENCY: Dict[str, int] = {
+        "detect": 2,
+        "crop": 4,
+        "makeup_extract": 2,
+        "unet_extract": 4,
+        "celeba_unet_extract": 4,
+        "batch": 4,
+        "stream": 8,  # one frame in flight for each of STREAM_MAX_SESSIONS live sessions
+    }
+    EXECUTOR_DEFAULT_CONCURRENCY: int = 2
+    EXECUTOR_MAX_QUEUE: int = 16  # waiting jobs per endpoint before returning 503
+    EXECUTOR_TIMEOUT: float = 30.0  # seconds
+    EXECUTOR_RETRY_AFTER: int = 1  # seconds, sent in the Retry-After header
+    
+    # Content-addressed result cache for face analysis endpoints
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # in-process LRU tier
+    RESULT_CACHE_REDIS_ENABLED: bool = False  # shared tier at REDIS_URL
+    RESULT_CACHE_TTL: int = 3600  # seconds, Redis tier only
+    DECODED_IMAGE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # decoded uploads referenced by image_id
+    
+    # Async job mode for the segmentation endpoints
+    JOB_WORKERS: int = 2  # background tasks per API process
+    JOB_QUEUE_REDIS_ENABLED: bool = False  # shared queue at REDIS_URL; in-process queue otherwise
+    JOB_MAX_QUEUE: int = 256
+    JOB_MEMORY_MAX_PAYLOAD_BYTES: int = 256 * 1024 * 1024  # uploads held by the in-process queue; 503 beyond
+    JOB_TTL: int = 3600  # seconds job records and results are kept
+    JOB_CALLBACK_TIMEOUT: float = 10.0
+    JOB_CALLBACK_RETRIES: int = 3
+    # Hosts callback_url may point to; empty -> any public http(s) host (private, loopback
+    # and link-local addresses are always refused unless the host is listed here)
+    JOB_CALLBACK_ALLOWED_HOSTS: List[str] = []
+    
+    # Face detection
+    FACE_DETECTOR: str = "retinaface"  # "retinaface" (accurate) or "mediapipe" (fast, for live preview)
+    # None -> detector default (retinaface 0.9, mediapipe 0.5); mediapipe rejects thresholds below 0.2
+    FACE_DETECTION_THRESHOLD: Optional[float] = None
+    FACE_DETECTION_MAX_FACES: int = 0  # 0 -> no cap
+    FACE_DETECTION_MAX_SIDE: int = 1280  # detect on a copy with this long edge; 0 -> full resolution
+    MEDIAPIPE_FACE_MODEL: int = 0  # 0: short-range (selfies), 1: full-range
+    
+    # Multi-face requests
+    MULTI_FACE_MAX_FACES: int = 10
+    FACE_ALIGN_MARGIN: float = 0.25  # per side, fraction of the longer box edge
+    
+    # Pre-initialized MediaPipe FaceMesh instances (one per inference thread by default)
+    FACE_MESH_POOL_SIZE: int = 0  # 0 = EXECUTOR_THREAD_WORKERS
+    FACE_MESH_REFINE_LANDMARKS: bool = True
+    FACE_MESH_PRELOAD: List[Dict[str, Any]] = [
+        {"max_num_faces": 1},
+        {"multi_face": True},  # multi_face requests: max_num_faces = MULTI_FACE_MAX_FACES
+    ]
+    
+    # Bulk analysis endpoint (/api/face/batch)
+    BATCH_CONCURRENCY: int = 4  # images in flight per request
+    BATCH_MAX_IMAGES: int = 1000
+    BATCH_MAX_ARCHIVE_SIZE: int = 512 * 1024 * 1024
+    
+    # Video / frame-sequence analysis (/api/face/video)
+    VIDEO_MAX_FILE_SIZE: int = 200 * 1024 * 1024
+    VIDEO_MAX_FRAMES: int = 1800  # processed frames per request (60 s at 30 fps)
+    VIDEO_MAX_FACES: int = 4
+    VIDEO_FACE_DETECTOR: Optional[str] = None  # None -> FACE_DETECTOR; "mediapipe" keeps keyframes cheap
+    VIDEO_KEYFRAME_INTERVAL: int = 30  # frames between detector runs while tracking holds
+    VIDEO_MIN_TRACKING_CONFIDENCE: float = 0.5  # FaceMesh re-detects below this
+    VIDEO_SEGMENT_MOTION: float = 0.05  # re-segment once the face moves or rescales by this fraction of its box
+    VIDEO_SEGMENT_MAX_AGE: int = 0  # frames a segmentation may be reused; 0 = until the face moves
+    STREAM_MAX_SESSIONS: int = 8  # concurrent /stream WebSockets, each owning a FaceMesh graph
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import zipfile
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.image_io import read_upload, validate_image_bytes
+from app.services.mask_encoding import to_json_compatible
+
+
+def _read_member(archive: zipfile.ZipFile, member: zipfile.ZipInfo) -> bytes:
+    with archive.open(member) as f:
+        return f.read(settings.MAX_FILE_SIZE + 1)
+
+
+@dataclass
+class BatchItem:
+    """One image of a batch request: an uploaded file, a zip member or an upload ID.
+
+    Bytes are only read when the item is processed, so a large batch never
+    holds every image in memory at once.
+    """
+    index: int
+    source: str
+    file: Optional[UploadFile] = None
+    image_id: Optional[str] = None
+    archive: Optional[zipfile.ZipFile] = None
+    member: Optional[zipfile.ZipInfo] = None
+
+    async def read(self) -> Optional[bytes]:
+        if self.file is not None:
+            return await read_upload(self.file)
+        if self.member is not None:
+            # Declared size is checked first so a zip bomb is never inflated
+            if self.member.file_size > settings.MAX_FILE_SIZE:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE // (1024*1024)}MB"
+                )
+            data = await run_in_threadpool(_read_member, self.archive, self.member)
+            validate_image_bytes(data)
+            return data
+        return None
+
+
+def open_zip_items(fileobj, start_index: int = 0):
+    """Open an uploaded zip and list its members as batch items; the caller closes the archive"""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Archive must be a zip file.")
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+    ]
+    items = [
+        BatchItem(start_index + i, info.filename, archive=archive, member=info)
+        for i, info in enumerate(members)
+    ]
+    return archive, items
+
+
+async def stream_ndjson(items: List[BatchItem],
+                        process: Callable[[BatchItem], Awaitable[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """Run ``process`` over the items with bounded concurrency and yield one NDJSON
+    line per item as soon as it finishes (completion order, tagged with ``index``).
+
+    Failures become ``{"index", "source", "error"}`` lines instead of aborting the
+    stream. Concurrent items feed the same micro-batchers, so the U-Net forward
+    passes are batched across images.
+    """
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    async def run(item: BatchItem) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                result = await process(item)
+                return {"index": item.index, "source": item.source, "result": result}
+            except HTTPException as e:
+                return {"index": item.index, "source": item.source, "error": e.detail}
+            except Exception as e:
+                return {"index": item.index, "source": item.source, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            yield (json.dumps(to_json_compatible(line), separators=(",", ":")) + "\n").encode()
+    finally:
+        # Stops the remaining work if the client goes away mid-stream
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,161 @@
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.executor import inference_executor
+from app.services.model_registry import model_registry
+
+if TYPE_CHECKING:
+    import torch
+
+
+@dataclass
+class _PendingItem:
+    tensor: "torch.Tensor"  # (1, 3, H, W)
+    future: asyncio.Future
+
+
+class MicroBatcher:
+    """Collects concurrent single-image requests into one batched forward pass.
+
+    Requests are queued until either ``max_batch_size`` images are waiting or
+    ``max_wait_ms`` has passed since the first one arrived. The batch runs off
+    the event loop on the executor's batch pool and each caller gets back its
+    own (H, W) mask.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[["torch.Tensor"], np.ndarray],
+                 max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches_run = 0
+        self.images_run = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._worker())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Fail anything still waiting so callers do not hang
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if not item.future.done():
+                item.future.set_exception(RuntimeError(f"Batcher {self.name} stopped"))
+
+    async def submit(self, tensor: "torch.Tensor") -> np.ndarray:
+        """Queue a preprocessed (1, 3, H, W) or (3, H, W) tensor and wait for its mask"""
+        if tensor.dim() == 3:
+            tensor = tensor.unsqueeze(0)
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingItem(tensor, future))
+        return await future
+
+    async def submit_many(self, tensors: List["torch.Tensor"]) -> List[np.ndarray]:
+        return list(await asyncio.gather(*(self.submit(t) for t in tensors)))
+
+    async def _collect(self) -> List[_PendingItem]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        import torch
+
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Only images with the same shape can share a forward pass
+            groups: Dict[tuple, List[_PendingItem]] = {}
+            for item in batch:
+                groups.setdefault(tuple(item.tensor.shape[1:]), []).append(item)
+            for items in groups.values():
+                try:
+                    stacked = torch.cat([item.tensor for item in items], dim=0)
+                    masks = await loop.run_in_executor(inference_executor.batch_pool, self.run_batch, stacked)
+                except Exception as e:
+                    for item in items:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    continue
+                self.batches_run += 1
+                self.images_run += len(items)
+                for item, mask in zip(items, masks):
+                    if not item.future.done():
+                        item.future.set_result(mask)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches_run": self.batches_run,
+            "images_run": self.images_run,
+            "avg_batch_size": round(self.images_run / self.batches_run, 2) if self.batches_run else 0.0,
+        }
+
+
+def _run_unet(batch: "torch.Tensor") -> np.ndarray:
+    from ai_models.unet.inference_unet import predict_masks
+    entry = model_registry.get_entry("unet")
+    return predict_masks(entry.model, batch, entry.device)
+
+
+def _run_celeba_unet(batch: "torch.Tensor") -> np.ndarray:
+    from ai_models.unet.inference_celeba_unet import predict_masks
+    entry = model_registry.get_entry("celeba_unet")
+    return predict_masks(entry.model, batch, entry.device)
+
+
+_BATCH_RUNNERS = {
+    "unet": _run_unet,
+    "celeba_unet": _run_celeba_unet,
+}
+
+_batchers: Dict[str, MicroBatcher] = {}
+
+
+def get_batcher(name: str) -> MicroBatcher:
+    if name not in _batchers:
+        _batchers[name] = MicroBatcher(
+            name,
+            _BATCH_RUNNERS[name],
+            max_batch_size=settings.BATCH_MAX_SIZE if settings.BATCHING_ENABLED else 1,
+            max_wait_ms=settings.BATCH_MAX_WAIT_MS if settings.BATCHING_ENABLED else 0.0,
+        )
+    return _batchers[name]
+
+
+async def stop_batchers():
+    for batcher in _batchers.values():
+        await batcher.stop()
+    _batchers.clear()
+
+
+def batcher_stats() -> List[dict]:
+    return [batcher.stats() for batcher in _batchers.values()]
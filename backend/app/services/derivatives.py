@@ -0,0 +1,102 @@
+import hashlib
+import os
+import re
+import tempfile
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+from app.core.config import settings
+
+# Derived copies stored next to each original in UPLOAD_DIR: <image_id>_<kind>.<ext>
+DERIVATIVE_FORMATS = {
+    "analysis": ("PNG", ".png"),  # lossless, what the face endpoints decode; sized by the shorter edge
+    "thumbnail": ("JPEG", ".jpg"),  # gallery views; sized by the longer edge
+}
+
+_IMAGE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def image_hasher():
+    """Hash used for upload image IDs (content-addressed, so re-uploads dedupe)"""
+    return hashlib.blake2b(digest_size=16)
+
+
+def is_image_id(value: str) -> bool:
+    return bool(_IMAGE_ID_RE.match(value))
+
+
+def _derivative_size(kind: str) -> int:
+    return settings.ANALYSIS_IMAGE_SIZE if kind == "analysis" else settings.THUMBNAIL_SIZE
+
+
+def derivative_filename(image_id: str, kind: str) -> str:
+    return f"{image_id}_{kind}{DERIVATIVE_FORMATS[kind][1]}"
+
+
+def derivative_path(image_id: str, kind: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, derivative_filename(image_id, kind))
+
+
+def find_original(image_id: str) -> Optional[str]:
+    """Path of the stored original for ``image_id``, whatever its extension"""
+    for extension in settings.ALLOWED_EXTENSIONS:
+        path = os.path.join(settings.UPLOAD_DIR, f"{image_id}{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _describe(path: str, size) -> Dict[str, Any]:
+    filename = os.path.basename(path)
+    return {"filename": filename, "url": f"/uploads/{filename}", "width": size[0], "height": size[1]}
+
+
+def generate_derivatives(image_id: str, original_path: str) -> Dict[str, Dict[str, Any]]:
+    """Write the analysis copy and thumbnail for an upload from a single decode.
+
+    The original is decoded once (at reduced DCT scale for JPEGs); the
+    thumbnail is derived from the analysis copy. The analysis copy keeps its
+    shorter edge at ``ANALYSIS_IMAGE_SIZE``, like ``decode_image`` with
+    ``max_side``, so it can stand in for the original whatever the aspect
+    ratio. Existing files are reused, so re-uploading the same content costs
+    only the hash.
+    """
+    paths = {kind: derivative_path(image_id, kind) for kind in DERIVATIVE_FORMATS}
+    if all(os.path.exists(path) for path in paths.values()):
+        result = {}
+        for kind, path in [("original", original_path)] + list(paths.items()):
+            with Image.open(path) as img:
+                result[kind] = _describe(path, img.size)
+        return result
+
+    analysis_side = _derivative_size("analysis")
+    with Image.open(original_path) as img:
+        result = {"original": _describe(original_path, img.size)}
+        if img.format == "JPEG":
+            img.draft("RGB", (analysis_side, analysis_side))
+        analysis = img.convert("RGB")
+    scale = analysis_side / min(analysis.size)
+    if scale < 1:
+        size = tuple(max(1, round(edge * scale)) for edge in analysis.size)
+        analysis = analysis.resize(size, Image.BILINEAR)
+    # thumbnail() only ever shrinks, keeping the aspect ratio
+    thumbnail = analysis.copy()
+    thumbnail.thumbnail((_derivative_size("thumbnail"),) * 2, Image.BILINEAR)
+
+    for kind, image in (("analysis", analysis), ("thumbnail", thumbnail)):
+        image_format, _ = DERIVATIVE_FORMATS[kind]
+        # Write then rename so readers never see a partial file. The temp name is
+        # unique: concurrent uploads of the same content share the final path.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(paths[kind]) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, format=image_format, **({"quality": 85} if image_format == "JPEG" else {}))
+            os.chmod(tmp_path, 0o644)  # mkstemp creates files readable by the owner only
+            os.replace(tmp_path, paths[kind])
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        result[kind] = _describe(paths[kind], image.size)
+    return result
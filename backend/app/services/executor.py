@@ -0,0 +1,155 @@
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+class _EndpointLimiter:
+    """Concurrency slots plus a bounded wait queue for one endpoint"""
+
+    def __init__(self, concurrency: int, max_queue: int):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class InferenceExecutor:
+    """Runs CPU-bound model work off the event loop.
+
+    Torch/cv2/TensorFlow release the GIL, so by default everything runs on a
+    shared thread pool; endpoints listed in ``EXECUTOR_PROCESS_ENDPOINTS`` run
+    on a process pool instead (their callables must be picklable). Each
+    endpoint gets its own concurrency limit and wait queue: once the queue is
+    full new jobs are rejected with 503 + Retry-After, and jobs that exceed
+    their timeout return 504.
+
+    The thread pool has at least as many workers as the configured endpoint
+    limits add up to, so a job holding an endpoint slot does not also wait for
+    a thread (and its timeout measures the work). Batched U-Net forward
+    passes, which no endpoint limits, get a pool of their own.
+    """
+
+    def __init__(self):
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._batch_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._limiters: Dict[str, _EndpointLimiter] = {}
+
+    @property
+    def thread_workers(self) -> int:
+        return max(settings.EXECUTOR_THREAD_WORKERS, sum(settings.EXECUTOR_CONCURRENCY.values()))
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers,
+                thread_name_prefix="inference",
+            )
+        return self._thread_pool
+
+    @property
+    def batch_pool(self) -> ThreadPoolExecutor:
+        if self._batch_pool is None:
+            self._batch_pool = ThreadPoolExecutor(
+                max_workers=settings.BATCH_THREAD_WORKERS,
+                thread_name_prefix="batch",
+            )
+        return self._batch_pool
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=settings.EXECUTOR_PROCESS_WORKERS or None
+            )
+        return self._process_pool
+
+    def _pool_for(self, endpoint: str) -> Executor:
+        if endpoint in settings.EXECUTOR_PROCESS_ENDPOINTS:
+            return self.process_pool
+        return self.thread_pool
+
+    def _limiter(self, endpoint: str) -> _EndpointLimiter:
+        if endpoint not in self._limiters:
+            self._limiters[endpoint] = _EndpointLimiter(
+                settings.EXECUTOR_CONCURRENCY.get(endpoint, settings.EXECUTOR_DEFAULT_CONCURRENCY),
+                settings.EXECUTOR_MAX_QUEUE,
+            )
+        return self._limiters[endpoint]
+
+    async def run(self, endpoint: str, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on the pool configured for ``endpoint``"""
+        limiter = self._limiter(endpoint)
+        if limiter.semaphore.locked() and limiter.waiting >= limiter.max_queue:
+            limiter.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server busy ({endpoint}), please retry later",
+                headers={"Retry-After": str(settings.EXECUTOR_RETRY_AFTER)},
+            )
+
+        limiter.waiting += 1
+        try:
+            await limiter.semaphore.acquire()
+        finally:
+            limiter.waiting -= 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._pool_for(endpoint).submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            limiter.semaphore.release()
+            raise
+        limiter.running += 1
+
+        def _release(_):
+            # A timed-out job keeps its slot until the worker actually finishes
+            limiter.running -= 1
+            limiter.semaphore.release()
+
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(_release, f))
+
+        timeout = settings.EXECUTOR_TIMEOUT if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            limiter.timed_out += 1
+            future.cancel()
+            raise HTTPException(status_code=504, detail=f"{endpoint} timed out after {timeout:.0f}s")
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+    def shutdown(self):
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._batch_pool is not None:
+            self._batch_pool.shutdown(wait=False, cancel_futures=True)
+            self._batch_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        self._limiters.clear()
+
+
+inference_executor = InferenceExecutor()
@@ -0,0 +1,254 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.object_pool import BoundedPool
+
+
+def downscale(img_np: np.ndarray, max_side: Optional[int]):
+    """``(image, scale)`` with the long edge at most ``max_side`` (0 / None keeps the original)"""
+    height, width = img_np.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return img_np, 1.0
+    scale = max_side / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(img_np, size, interpolation=cv2.INTER_AREA), scale
+
+
+class FaceDetector(ABC):
+    """Common front end of the detector backends.
+
+    Backends implement ``_load`` and ``_detect`` (faces in the pixel
+    coordinates of the image they are given). ``detect`` runs a backend on a
+    copy downscaled to ``FACE_DETECTION_MAX_SIDE``, maps boxes and landmarks
+    back to the original image, drops faces below the confidence threshold and
+    keeps at most ``max_faces`` of the most confident. Every backend returns the
+    same ``faces`` / ``bounding_box`` / ``landmarks`` / ``score`` schema.
+    Thresholds below ``min_threshold`` are rejected with a 422.
+    """
+
+    name = ""
+    default_threshold = 0.5
+    min_threshold = 0.0
+
+    def __init__(self):
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_time_s: Optional[float] = None
+        self.calls = 0
+        self.total_time_s = 0.0
+
+    @abstractmethod
+    def _load(self):
+        """Build the backend's model (runs once, under the load lock)"""
+
+    @abstractmethod
+    def _detect(self, img_np: np.ndarray, threshold: float, upscale: bool) -> List[Dict[str, Any]]:
+        """Faces in ``img_np`` at or above ``threshold``, in its pixel coordinates"""
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self._load()
+                    self.load_time_s = time.perf_counter() - start
+                    print(f"Face detector: loaded {self.name} in {self.load_time_s * 1000:.0f} ms")
+        return self._model
+
+    def preload(self):
+        try:
+            self.model
+        except Exception as e:
+            print(f"Face detector: failed to load {self.name}: {e}")
+
+    def options(self, threshold: Optional[float] = None, max_faces: Optional[int] = None,
+                max_side: Optional[int] = None):
+        """Request options with the configured defaults filled in"""
+        if threshold is None:
+            threshold = settings.FACE_DETECTION_THRESHOLD
+        if threshold is None:
+            threshold = self.default_threshold
+        if threshold < self.min_threshold:
+            raise HTTPException(
+                status_code=422,
+                detail=f"threshold must be at least {self.min_threshold} for the {self.name} detector.",
+            )
+        return (
+            threshold,
+            settings.FACE_DETECTION_MAX_FACES if max_faces is None else max_faces,
+            settings.FACE_DETECTION_MAX_SIDE if max_side is None else max_side,
+        )
+
+    def version(self, threshold: Optional[float] = None, max_faces: Optional[int] = None,
+                max_side: Optional[int] = None) -> str:
+        """Identifies detector and options in result cache keys"""
+        threshold, max_faces, max_side = self.options(threshold, max_faces, max_side)
+        return f"{self.name}-t{threshold:g}-n{max_faces}-s{max_side}"
+
+    def detect(self, img_np: np.ndarray, threshold: Optional[float] = None,
+               max_faces: Optional[int] = None, max_side: Optional[int] = None) -> Dict[str, Any]:
+        threshold, max_faces, max_side = self.options(threshold, max_faces, max_side)
+        start = time.perf_counter()
+        small, scale = downscale(img_np, max_side)
+        faces = []
+        # Upscaling is only turned off when the image was downscaled, so small inputs keep it
+        for face in self._detect(small, threshold, upscale=scale == 1.0):
+            if face["score"] < threshold:
+                continue
+            face["bounding_box"] = [int(round(v / scale)) for v in face["bounding_box"]]
+            face["landmarks"] = {k: [x / scale, y / scale] for k, (x, y) in face["landmarks"].items()}
+            faces.append(face)
+        faces.sort(key=lambda face: face["score"], reverse=True)
+        if max_faces:
+            faces = faces[:max_faces]
+        self.calls += 1
+        self.total_time_s += time.perf_counter() - start
+
+        height, width = img_np.shape[:2]
+        return {
+            "num_faces": int(len(faces)),
+            "faces": faces,
+            "image_size": {"width": int(width), "height": int(height)}
+        }
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "loaded": self._model is not None,
+            "load_time_ms": round(self.load_time_s * 1000, 1) if self.load_time_s is not None else None,
+            "calls": self.calls,
+            "avg_ms": round(self.total_time_s * 1000 / self.calls, 1) if self.calls else None,
+        }
+
+
+class RetinaFaceDetector(FaceDetector):
+    """RetinaFace (TensorFlow) with the network built once per process; most accurate"""
+
+    name = "retinaface"
+    default_threshold = 0.9
+
+    def _load(self):
+        # TensorFlow is imported here, not at API import time
+        from retinaface import RetinaFace
+        return RetinaFace.build_model()
+
+    def _detect(self, img_np, threshold, upscale):
+        from retinaface import RetinaFace
+
+        # RetinaFace expects BGR arrays, like cv2.imread. It upscales small inputs
+        # to a 1024 px short side by default, which would undo the downscale.
+        results = RetinaFace.detect_faces(
+            np.ascontiguousarray(img_np[:, :, ::-1]),
+            threshold=threshold,
+            model=self.model,
+            allow_upscaling=upscale,
+        )
+        return [
+            {
+                "face_id": face_id,
+                "bounding_box": [float(v) for v in face["facial_area"]],
+                "landmarks": {k: [float(v[0]), float(v[1])] for k, v in face.get("landmarks", {}).items()},
+                "score": float(face.get("score", 1.0)),
+            }
+            for face_id, face in results.items()
+        ]
+
+
+class MediaPipeFaceDetector(FaceDetector):
+    """MediaPipe face detection (BlazeFace): a lighter model than RetinaFace with
+    lower recall on small or profile faces (see benchmarks/face_detectors.py).
+    ``MEDIAPIPE_FACE_MODEL`` 0 is the short-range (selfie, within ~2 m) model,
+    1 the full-range one.
+
+    Graphs are not thread-safe, so they live in a ``BoundedPool`` of at most
+    ``EXECUTOR_THREAD_WORKERS`` instances and each call checks one out; a
+    call that finds them all busy waits up to ``EXECUTOR_TIMEOUT`` and then
+    gets a 503.
+    """
+
+    name = "mediapipe"
+    default_threshold = 0.5
+    # Graphs are built with this confidence floor; lower thresholds are rejected
+    min_threshold = 0.2
+    KEYPOINTS = ("right_eye", "left_eye", "nose", "mouth", "right_ear", "left_ear")
+
+    def _create(self):
+        import mediapipe as mp
+        return mp.solutions.face_detection.FaceDetection(
+            model_selection=settings.MEDIAPIPE_FACE_MODEL,
+            min_detection_confidence=self.min_threshold,
+        )
+
+    def _load(self):
+        pool = BoundedPool(self._create, settings.EXECUTOR_THREAD_WORKERS, "mediapipe face detection")
+        pool.fill(1)
+        return pool
+
+    def _detect(self, img_np, threshold, upscale):
+        pool = self.model  # the first instance is built (and timed) on first use
+        detection = pool.acquire(settings.EXECUTOR_TIMEOUT)
+        try:
+            results = detection.process(np.ascontiguousarray(img_np))
+        finally:
+            pool.release(detection)
+
+        height, width = img_np.shape[:2]
+        faces = []
+        for i, found in enumerate(results.detections or []):
+            data = found.location_data
+            box = data.relative_bounding_box
+            x1, y1 = max(0.0, box.xmin * width), max(0.0, box.ymin * height)
+            x2 = min(float(width), (box.xmin + box.width) * width)
+            y2 = min(float(height), (box.ymin + box.height) * height)
+            faces.append({
+                "face_id": f"face_{i + 1}",
+                "bounding_box": [x1, y1, x2, y2],
+                "landmarks": {
+                    name: [point.x * width, point.y * height]
+                    for name, point in zip(self.KEYPOINTS, data.relative_keypoints)
+                },
+                "score": float(found.score[0]) if found.score else 1.0,
+            })
+        return faces
+
+    def close(self):
+        if self._model is not None:
+            self._model.close()
+        self._model = None
+        self.load_time_s = None
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        if self._model is not None:
+            stats["pool"] = self._model.stats()
+        return stats
+
+
+face_detectors: Dict[str, FaceDetector] = {
+    "retinaface": RetinaFaceDetector(),
+    "mediapipe": MediaPipeFaceDetector(),
+}
+
+
+def get_detector(name: Optional[str] = None) -> FaceDetector:
+    """Detector by name, ``FACE_DETECTOR`` by default (400 for an unknown name)"""
+    name = name or settings.FACE_DETECTOR
+    if name not in face_detectors:
+        raise HTTPException(status_code=400, detail=f"Unknown detector: {name}. Allowed: {list(face_detectors)}")
+    return face_detectors[name]
+
+
+def close_detectors():
+    for detector in face_detectors.values():
+        detector.close()
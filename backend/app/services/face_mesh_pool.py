@@ -0,0 +1,115 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from app.core.config import settings
+from app.services.object_pool import BoundedPool
+
+VariantKey = Tuple[int, bool]
+
+
+class _VariantPool(BoundedPool):
+    """Bounded set of FaceMesh graphs sharing one configuration"""
+
+    def __init__(self, max_num_faces: int, refine_landmarks: bool, size: int):
+        super().__init__(self._create, size, "face mesh")
+        self.max_num_faces = max_num_faces
+        self.refine_landmarks = refine_landmarks
+        self.init_time_s = 0.0
+
+    def _create(self):
+        import mediapipe as mp
+        start = time.perf_counter()
+        # static_image_mode: every image is processed independently, so an
+        # instance can be handed from one request to the next
+        mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=True,
+            max_num_faces=self.max_num_faces,
+            refine_landmarks=self.refine_landmarks,
+        )
+        self.init_time_s += time.perf_counter() - start
+        return mesh
+
+    def stats(self) -> dict:
+        return {
+            "max_num_faces": self.max_num_faces,
+            "refine_landmarks": self.refine_landmarks,
+            **super().stats(),
+            "init_time_ms": round(self.init_time_s * 1000, 1),
+        }
+
+
+class FaceMeshPool:
+    """Pre-initialized MediaPipe FaceMesh instances, checked out per request.
+
+    FaceMesh graphs are not thread-safe and expensive to build, so each
+    (max_num_faces, refine_landmarks) variant keeps up to one instance per
+    inference worker thread. A request takes an idle instance, runs
+    ``process`` and hands it back; it only waits when every instance of its
+    variant is busy, and gets a 503 after ``EXECUTOR_TIMEOUT``.
+    """
+
+    def __init__(self, size: int = 0):
+        self._size = size
+        self._variants: Dict[VariantKey, _VariantPool] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size or settings.FACE_MESH_POOL_SIZE or settings.EXECUTOR_THREAD_WORKERS
+
+    def _variant(self, max_num_faces: int, refine_landmarks: bool) -> _VariantPool:
+        key = (int(max_num_faces), bool(refine_landmarks))
+        variant = self._variants.get(key)
+        if variant is None:
+            with self._lock:
+                variant = self._variants.get(key)
+                if variant is None:
+                    variant = _VariantPool(key[0], key[1], self.size)
+                    self._variants[key] = variant
+        return variant
+
+    @contextmanager
+    def session(self, max_num_faces: int = 1, refine_landmarks: Optional[bool] = None) -> Iterator[Any]:
+        if refine_landmarks is None:
+            refine_landmarks = settings.FACE_MESH_REFINE_LANDMARKS
+        variant = self._variant(max_num_faces, refine_landmarks)
+        mesh = variant.acquire(settings.EXECUTOR_TIMEOUT)
+        try:
+            yield mesh
+        finally:
+            variant.release(mesh)
+
+    def preload(self, variants: Iterable[Dict[str, Any]]):
+        """Build the configured variants at startup; failures are logged so the API can still start.
+
+        ``{"multi_face": True}`` stands for ``max_num_faces=MULTI_FACE_MAX_FACES``.
+        """
+        for options in variants:
+            try:
+                if options.get("multi_face"):
+                    max_num_faces = settings.MULTI_FACE_MAX_FACES
+                else:
+                    max_num_faces = options.get("max_num_faces", 1)
+                variant = self._variant(
+                    max_num_faces,
+                    options.get("refine_landmarks", settings.FACE_MESH_REFINE_LANDMARKS),
+                )
+                variant.fill()
+                print(f"FaceMesh pool: {variant.size} x (max_num_faces={variant.max_num_faces}, "
+                      f"refine_landmarks={variant.refine_landmarks}) in {variant.init_time_s * 1000:.0f} ms")
+            except Exception as e:
+                print(f"FaceMesh pool: failed to preload {options}: {e}")
+
+    def stats(self) -> list:
+        return [variant.stats() for variant in self._variants.values()]
+
+    def close(self):
+        with self._lock:
+            for variant in self._variants.values():
+                variant.close()
+            self._variants.clear()
+
+
+face_mesh_pool = FaceMeshPool()
@@ -0,0 +1,350 @@
+import base64
+from io import BytesIO
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from ai_models.unet.region_stats import colorize, region_statistics
+from app.core.config import settings
+from app.services.batching import get_batcher
+from app.services.executor import inference_executor
+from app.services.face_detector import get_detector
+from app.services.face_mesh_pool import face_mesh_pool
+from app.services.image_io import encode_image
+from app.services.mask_encoding import Artifact, encode_mask, png_artifact
+
+ANALYZE_STAGES = ("detect", "crop", "landmarks", "segment")
+ANALYZE_OUTPUTS = ("mask", "overlay", "colors", "crop")
+SEGMENTATION_MODELS = ("unet", "celeba_unet")
+
+
+# Model-backed dependencies are imported on first use (or by prewarm), so
+# importing the API loads neither TensorFlow nor torch
+
+def _unet_module():
+    from ai_models.unet import inference_unet
+    return inference_unet
+
+
+def _celeba_module():
+    from ai_models.unet import inference_celeba_unet
+    return inference_celeba_unet
+
+
+def prewarm():
+    """Build the face detector and import the segmentation stack ahead of the first request"""
+    get_detector().preload()
+    for load in (_unet_module, _celeba_module):
+        try:
+            load()
+        except Exception as e:
+            print(f"Prewarm: {load.__name__} failed: {e}")
+
+
+def detect_faces(img_np: np.ndarray, threshold: Optional[float] = None,
+                 max_faces: Optional[int] = None, detector: Optional[str] = None) -> Dict[str, Any]:
+    return get_detector(detector).detect(img_np, threshold, max_faces)
+
+
+# Helper to draw overlays for each region
+def draw_regions_on_image(image: np.ndarray, regions: dict) -> np.ndarray:
+    overlay = image.copy()
+    color_map = {
+        "lips": (255, 0, 0),
+        "left_eye": (0, 255, 0),
+        "right_eye": (0, 255, 0),
+        "left_eyebrow": (0, 0, 255),
+        "right_eyebrow": (0, 0, 255),
+        "left_cheek": (255, 255, 0),
+        "right_cheek": (255, 255, 0),
+        "contour": (255, 0, 255),
+    }
+    alpha = 0.4  # Transparency
+    for region_name, points in regions.items():
+        if not points:
+            continue
+        pts = np.array(points, np.int32)
+        pts = pts.reshape((-1, 1, 2))
+        cv2.fillPoly(overlay, [pts], color_map.get(region_name, (255, 255, 255)))
+    # Blend overlay with original image
+    cv2.addWeighted(overlay, alpha, image, 1 - alpha, 0, image)
+    return image
+
+
+def image_to_base64(image: np.ndarray) -> str:
+    """PNG data URL of an RGB array"""
+    pil_img = Image.fromarray(image)
+    buffered = BytesIO()
+    pil_img.save(buffered, format="PNG")
+    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    return f"data:image/png;base64,{img_str}"
+
+
+# MediaPipe Face Mesh landmark indices for each makeup region, built once
+MAKEUP_REGIONS = {
+    "lips": np.r_[61:88, 291:318],
+    "left_eye": np.r_[33:42, 133:144],
+    "right_eye": np.r_[263:272, 362:373],
+    "left_eyebrow": np.r_[46:66],
+    "right_eyebrow": np.r_[276:296],
+    "left_cheek": np.r_[205:218],
+    "right_cheek": np.r_[425:438],
+}
+JAWLINE_IDX = np.r_[0:17, 267:285]
+
+
+def _region_polygon(points: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Region outline as a convex hull, so the fill never self-intersects"""
+    return cv2.convexHull(points[indices]).reshape(-1, 2)
+
+
+def _polygon_mean_color(img_np: np.ndarray, polygon: np.ndarray) -> List[int]:
+    """Average color inside a polygon, rasterized only over its bounding box"""
+    h, w = img_np.shape[:2]
+    x1, y1 = np.maximum(polygon.min(axis=0), 0)
+    x2, y2 = np.minimum(polygon.max(axis=0) + 1, (w, h))
+    if x2 <= x1 or y2 <= y1:
+        return [0, 0, 0]
+    mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+    cv2.fillPoly(mask, [polygon - (x1, y1)], 1)
+    if not mask.any():
+        return [0, 0, 0]
+    mean = cv2.mean(img_np[y1:y2, x1:x2], mask=mask)
+    return [int(c) for c in mean[:3]]
+
+
+def landmark_points(landmarks, width: int, height: int) -> np.ndarray:
+    """FaceMesh landmarks as an (N, 2) int32 array of pixel coordinates"""
+    return (np.array([(lm.x, lm.y) for lm in landmarks.landmark]) * (width, height)).astype(np.int32)
+
+
+def makeup_from_points(img_np: np.ndarray, points: np.ndarray) -> Tuple[Dict[str, Any], Dict[str, list]]:
+    """Region colors and contour shape, plus the region polygons, from landmark pixel coordinates"""
+    result = {}
+    regions = {}
+    for name, indices in MAKEUP_REGIONS.items():
+        polygon = _region_polygon(points, indices)
+        result[f"{name}_color"] = _polygon_mean_color(img_np, polygon)
+        regions[name] = polygon.tolist()
+    # Contour (jawline) shape: return as list of points
+    contour_points = points[JAWLINE_IDX].tolist()
+    regions["contour"] = contour_points
+    result["contour_shape"] = contour_points
+    return result, regions
+
+
+def extract_makeup_faces(img_np: np.ndarray, annotate: bool = True,
+                         max_num_faces: int = 1) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Makeup attributes for every face FaceMesh finds, plus one annotated image"""
+    with face_mesh_pool.session(max_num_faces=max_num_faces) as face_mesh:
+        results = face_mesh.process(img_np)
+    faces = []
+    annotated_img = img_np.copy() if annotate else None
+    h, w = img_np.shape[:2]
+    for landmarks in results.multi_face_landmarks or []:
+        result, regions = makeup_from_points(img_np, landmark_points(landmarks, w, h))
+        faces.append(result)
+        if annotate:
+            # Draw overlays
+            draw_regions_on_image(annotated_img, regions)
+    return faces, (image_to_base64(annotated_img) if annotate and faces else None)
+
+
+def extract_makeup(img_np: np.ndarray, annotate: bool = True) -> Optional[Dict[str, Any]]:
+    faces, annotated_img_b64 = extract_makeup_faces(img_np, annotate, max_num_faces=1)
+    if not faces:
+        return None
+    result = faces[0]
+    if annotated_img_b64 is not None:
+        result["annotated_image"] = annotated_img_b64
+    return result
+
+
+def prepare_unet_input(img_np: np.ndarray):
+    pil_img = Image.fromarray(img_np)
+    return pil_img, _unet_module().preprocess_image(pil_img)
+
+
+def summarize_unet_mask(pil_img: Image.Image, mask: np.ndarray,
+                        outputs: Iterable[str] = ("mask", "colors"), mask_format: str = "png") -> Dict[str, Any]:
+    lut = _unet_module().PALETTE_LUT
+    result = {}
+    np_img = np.array(pil_img.resize(mask.shape[::-1]))
+    if "mask" in outputs:
+        result.update(encode_mask(mask, mask_format, lut))
+    if "overlay" in outputs:
+        overlay = cv2.addWeighted(np_img, 0.7, colorize(mask, lut), 0.3, 0)
+        result["annotated_image"] = png_artifact(overlay)
+    if "colors" in outputs:
+        # Compute average color for each region in one pass
+        names = ["background", "skin", "lips", "eyes", "eyebrows", "cheeks", "other"]
+        stats = region_statistics(np_img, mask, len(names), median=False)
+        result["region_colors"] = {
+            name: stats["mean"][idx].astype(int).tolist() for idx, name in enumerate(names)
+        }
+    return result
+
+
+def summarize_celeba_mask(image: np.ndarray, mask: np.ndarray,
+                          outputs: Iterable[str] = ("mask", "overlay", "colors"),
+                          mask_format: str = "png") -> Dict[str, Any]:
+    celeba_unet = _celeba_module()
+    result = {"attributes": celeba_unet.CELEBA_ATTRIBUTES}
+    if "mask" in outputs:
+        result.update(encode_mask(mask, mask_format, celeba_unet.PALETTE_LUT))
+    if "overlay" in outputs:
+        result["annotated_image"] = png_artifact(celeba_unet.create_annotated_image(image, mask))
+    if "colors" in outputs:
+        result["region_colors"] = celeba_unet.extract_region_colors(image, mask)
+    return result
+
+
+def crop_box(img_np: np.ndarray, box) -> np.ndarray:
+    """Crop ``[x1, y1, x2, y2]`` out of an image, clamped to its bounds"""
+    h, w = img_np.shape[:2]
+    x1, y1, x2, y2 = (int(round(v)) for v in box)
+    x1, x2 = max(0, min(x1, w)), max(0, min(x2, w))
+    y1, y2 = max(0, min(y1, h)), max(0, min(y2, h))
+    return np.ascontiguousarray(img_np[y1:y2, x1:x2])
+
+
+def align_face(img_np: np.ndarray, face: Dict[str, Any], margin: float = 0.25) -> np.ndarray:
+    """Square crop around a detected face, rotated so the eyes are level.
+
+    ``margin`` is added on each side as a fraction of the longer box edge so
+    hair and chin stay in frame, like the CelebA-HQ training crops.
+    """
+    x1, y1, x2, y2 = face["bounding_box"]
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    side = max(1, int(round(max(x2 - x1, y2 - y1) * (1 + 2 * margin))))
+    angle = 0.0
+    landmarks = face.get("landmarks") or {}
+    if "left_eye" in landmarks and "right_eye" in landmarks:
+        # Order by x so a swapped left/right labelling cannot flip the face
+        (ax, ay), (bx, by) = sorted([landmarks["left_eye"], landmarks["right_eye"]])
+        angle = float(np.degrees(np.arctan2(by - ay, bx - ax)))
+    matrix = cv2.getRotationMatrix2D((cx, cy), angle, 1.0)
+    matrix[0, 2] += side / 2 - cx
+    matrix[1, 2] += side / 2 - cy
+    return cv2.warpAffine(img_np, matrix, (side, side), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
+
+def _align_faces(img_np: np.ndarray, faces: List[Dict[str, Any]], margin: float) -> List[np.ndarray]:
+    return [align_face(img_np, face, margin) for face in faces]
+
+
+def _crop_faces(img_np: np.ndarray, faces: List[Dict[str, Any]],
+                encode: bool) -> Tuple[List[Dict[str, Any]], List[np.ndarray]]:
+    """Crop every face box, dropping boxes that lie outside the image or have no area"""
+    kept, crops = [], []
+    for face in faces:
+        crop = crop_box(img_np, face["bounding_box"])
+        if crop.size == 0:
+            continue
+        face["offset"] = face["bounding_box"][:2]
+        if encode:
+            face["cropped_image"] = Artifact(encode_image(crop, format="JPEG"), "image/jpeg")
+        kept.append(face)
+        crops.append(crop)
+    return kept, crops
+
+
+def _prepare_segmentation_input(model: str, image: np.ndarray):
+    if model == "unet":
+        return prepare_unet_input(image)
+    return image, _celeba_module().preprocess_image(image)
+
+
+def _summarize_segmentation(model: str, image, mask: np.ndarray, outputs: Iterable[str],
+                            mask_format: str) -> Dict[str, Any]:
+    if model == "unet":
+        return summarize_unet_mask(image, mask, outputs, mask_format)
+    return summarize_celeba_mask(image, mask, outputs, mask_format)
+
+
+def _prepare_segmentation_inputs(model: str, images: List[np.ndarray]) -> list:
+    return [_prepare_segmentation_input(model, image) for image in images]
+
+
+def _summarize_segmentations(model: str, prepared: list, masks: List[np.ndarray], outputs: Iterable[str],
+                             mask_format: str) -> List[Dict[str, Any]]:
+    return [
+        _summarize_segmentation(model, image, mask, outputs, mask_format)
+        for (image, _), mask in zip(prepared, masks)
+    ]
+
+
+def _extract_makeups(crops: List[np.ndarray], annotate: bool) -> List[Optional[Dict[str, Any]]]:
+    return [extract_makeup(crop, annotate) for crop in crops]
+
+
+async def segment_images(images: List[np.ndarray], model: str, outputs: Iterable[str],
+                         endpoint: str, mask_format: str = "png") -> List[Dict[str, Any]]:
+    """Segment several images with one batched U-Net pass and summarize each.
+
+    Preprocessing and summaries run as one executor job each for the whole
+    list, so a group photo takes one endpoint slot, not one per face.
+    """
+    prepared = await inference_executor.run(endpoint, _prepare_segmentation_inputs, model, images)
+    masks = await get_batcher(model).submit_many([tensor for _, tensor in prepared])
+    return await inference_executor.run(
+        endpoint, _summarize_segmentations, model, prepared, masks, tuple(outputs), mask_format
+    )
+
+
+async def segment_faces(img_np: np.ndarray, model: str, outputs: Iterable[str], endpoint: str,
+                        max_faces: Optional[int] = None, mask_format: str = "png") -> Dict[str, Any]:
+    """Detect every face, align them and segment all of them in one U-Net batch"""
+    detection = await inference_executor.run(endpoint, detect_faces, img_np)
+    faces = detection["faces"][:max_faces or settings.MULTI_FACE_MAX_FACES]
+    crops = await inference_executor.run(endpoint, _align_faces, img_np, faces, settings.FACE_ALIGN_MARGIN)
+    segmentations = await segment_images(crops, model, outputs, endpoint, mask_format) if crops else []
+    return {
+        "num_faces": len(faces),
+        "faces": [{**face, **segmentation} for face, segmentation in zip(faces, segmentations)],
+        "image_size": detection["image_size"],
+    }
+
+
+async def analyze_image(img_np: np.ndarray, stages: Iterable[str], outputs: Iterable[str],
+                        model: str = "celeba_unet", endpoint: str = "analyze",
+                        mask_format: str = "png", detector: Optional[str] = None) -> Dict[str, Any]:
+    """Run the requested stages over one decoded image.
+
+    Detection boxes feed per-face crops, and the crops feed landmark
+    extraction and segmentation, so the upload is decoded exactly once.
+    Without ``detect`` the whole image is treated as a single face; without
+    ``crop`` later stages run on the whole image, and with it faces whose box
+    has no area inside the image are dropped.
+    """
+    stages, outputs = set(stages), set(outputs)
+    h, w = img_np.shape[:2]
+
+    if "detect" in stages:
+        faces = (await inference_executor.run(endpoint, detect_faces, img_np, None, None, detector))["faces"]
+    else:
+        faces = [{"face_id": "face_1", "bounding_box": [0, 0, w, h], "landmarks": {}}]
+
+    if "crop" in stages:
+        faces, crops = await inference_executor.run(endpoint, _crop_faces, img_np, faces, "crop" in outputs)
+    else:
+        crops = [img_np for _ in faces]
+
+    if "landmarks" in stages:
+        makeups = await inference_executor.run(endpoint, _extract_makeups, crops, "overlay" in outputs)
+        for face, makeup in zip(faces, makeups):
+            face["makeup"] = makeup
+
+    if "segment" in stages and crops:
+        segmentations = await segment_images(crops, model, outputs - {"crop"}, endpoint, mask_format)
+        for face, segmentation in zip(faces, segmentations):
+            face["segmentation"] = segmentation
+
+    return {
+        "num_faces": len(faces),
+        "faces": faces,
+        "image_size": {"width": int(w), "height": int(h)},
+        "stages": [stage for stage in ANALYZE_STAGES if stage in stages],
+    }
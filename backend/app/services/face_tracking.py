@@ -0,0 +1,233 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.executor import inference_executor
+from app.services.face_detector import get_detector
+from app.services.face_pipeline import (
+    MAKEUP_REGIONS, align_face, landmark_points, makeup_from_points, segment_images,
+)
+
+VIDEO_STAGES = ("landmarks", "segment")
+VIDEO_OUTPUTS = ("regions", "colors", "mask", "overlay")
+
+# Tracked faces below this overlap with every detection on a keyframe are treated as drift
+CONFIRM_IOU = 0.3
+
+
+def box_iou(a, b) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def box_motion(a, b) -> float:
+    """How far box ``b`` moved or rescaled from ``a``, as a fraction of the size of ``a``"""
+    size = max(a[2] - a[0], a[3] - a[1], 1)
+    shift = max(abs((b[0] + b[2]) - (a[0] + a[2])), abs((b[1] + b[3]) - (a[1] + a[3]))) / 2
+    rescale = abs(max(b[2] - b[0], b[3] - b[1]) - size)
+    return max(shift, rescale) / size
+
+
+@dataclass
+class Track:
+    """A face followed across frames, with the segmentation it last received"""
+    track_id: int
+    box: List[int]
+    score: Optional[float] = None
+    segmentation: Optional[Dict[str, Any]] = None
+    segmented_box: Optional[List[int]] = None
+    segmented_frame: int = -1
+
+
+class FaceTrackingSession:
+    """State for one video or frame stream, fed frames in order.
+
+    FaceMesh runs in tracking mode (``static_image_mode=False``): after the
+    first detection it follows the landmarks from frame to frame instead of
+    searching the whole image. The face detector only runs on keyframes, every
+    ``VIDEO_KEYFRAME_INTERVAL`` frames or when a face is lost, appears or jumps, and
+    tracked faces it cannot confirm are dropped and tracking restarts. U-Net
+    segmentation of a face is reused until it moves or rescales by more than
+    ``VIDEO_SEGMENT_MOTION`` of its box.
+
+    The graph is stateful, so each session owns one instead of borrowing from
+    the FaceMesh pool; ``close`` releases it.
+    """
+
+    def __init__(self, stages: Iterable[str] = ("landmarks",), outputs: Iterable[str] = ("colors",),
+                 model: str = "unet", mask_format: str = "rle", max_faces: int = 1,
+                 detector: Optional[str] = None, endpoint: str = "video"):
+        self.stages = set(stages)
+        self.outputs = set(outputs)
+        self.model = model
+        self.mask_format = mask_format
+        self.max_faces = max_faces
+        self.detector = get_detector(detector or settings.VIDEO_FACE_DETECTOR)
+        self.endpoint = endpoint
+        self.tracks: List[Track] = []
+        self.frames = 0
+        self.keyframes = 0
+        self.segmentations = 0
+        self.reused_segmentations = 0
+        self._mesh = None
+        self._lock = threading.Lock()
+        self._next_track_id = 1
+        self._last_keyframe: Optional[int] = None
+        self._start = time.perf_counter()
+
+    def _create_mesh(self):
+        import mediapipe as mp
+        return mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=self.max_faces,
+            refine_landmarks=settings.FACE_MESH_REFINE_LANDMARKS,
+            min_tracking_confidence=settings.VIDEO_MIN_TRACKING_CONFIDENCE,
+        )
+
+    def _reset_mesh(self):
+        if self._mesh is not None:
+            self._mesh.close()
+            self._mesh = None
+
+    def _match(self, box: List[int]) -> Track:
+        """Continue the track this box overlaps most, or start a new one"""
+        best = max(self.tracks, key=lambda track: box_iou(track.box, box), default=None)
+        if best is not None and box_iou(best.box, box) >= CONFIRM_IOU:
+            self.tracks.remove(best)
+            best.box = box
+            return best
+        track = Track(self._next_track_id, box)
+        self._next_track_id += 1
+        return track
+
+    def _track(self, frame: np.ndarray, index: int) -> Dict[str, Any]:
+        """Landmarks for one frame, plus detection when it is a keyframe (runs on an inference thread)"""
+        with self._lock:
+            self.frames += 1
+            if self._mesh is None:
+                self._mesh = self._create_mesh()
+            h, w = frame.shape[:2]
+            found = self._mesh.process(np.ascontiguousarray(frame)).multi_face_landmarks or []
+            points = [landmark_points(landmarks, w, h) for landmarks in found]
+            boxes = [
+                [int(max(p[:, 0].min(), 0)), int(max(p[:, 1].min(), 0)),
+                 int(min(p[:, 0].max(), w)), int(min(p[:, 1].max(), h))]
+                for p in points
+            ]
+
+            keyframe = (
+                self._last_keyframe is None
+                or index - self._last_keyframe >= settings.VIDEO_KEYFRAME_INTERVAL
+                or len(boxes) != len(self.tracks)
+                or any(max((box_iou(track.box, box) for track in self.tracks), default=0.0) < CONFIRM_IOU
+                       for box in boxes)
+            )
+            scores: List[Optional[float]] = [None] * len(boxes)
+            if keyframe:
+                self._last_keyframe = index
+                self.keyframes += 1
+                detections = self.detector.detect(frame, max_faces=self.max_faces)["faces"]
+                confirmed = []
+                for i, box in enumerate(boxes):
+                    best = max(detections, key=lambda face: box_iou(box, face["bounding_box"]), default=None)
+                    if best is not None and box_iou(box, best["bounding_box"]) >= CONFIRM_IOU:
+                        scores[i] = best["score"]
+                        confirmed.append(i)
+                if len(confirmed) < len(boxes):
+                    # FaceMesh drifted onto something the detector does not see as a face
+                    self._reset_mesh()
+                points = [points[i] for i in confirmed]
+                boxes = [boxes[i] for i in confirmed]
+                scores = [scores[i] for i in confirmed]
+
+            tracks = [self._match(box) for box in boxes]
+            for track, score in zip(tracks, scores):
+                if score is not None:
+                    track.score = score
+            self.tracks = tracks
+
+            faces = []
+            for track, face_points in zip(tracks, points):
+                face = {"face_id": f"track_{track.track_id}", "bounding_box": track.box, "score": track.score}
+                if "landmarks" in self.stages:
+                    makeup, regions = makeup_from_points(frame, face_points)
+                    face["makeup"] = makeup
+                    if "regions" in self.outputs:
+                        face["regions"] = regions
+                faces.append(face)
+            return {"frame": index, "keyframe": keyframe, "faces": faces, "points": points}
+
+    def _needs_segmentation(self, track: Track, index: int) -> bool:
+        if track.segmentation is None:
+            return True
+        if settings.VIDEO_SEGMENT_MAX_AGE and index - track.segmented_frame >= settings.VIDEO_SEGMENT_MAX_AGE:
+            return True
+        return box_motion(track.segmented_box, track.box) > settings.VIDEO_SEGMENT_MOTION
+
+    async def _segment(self, frame: np.ndarray, index: int, faces: List[Dict[str, Any]],
+                       points: List[np.ndarray]):
+        stale = [
+            (face, track, face_points)
+            for face, track, face_points in zip(faces, self.tracks, points)
+            if self._needs_segmentation(track, index)
+        ]
+        if stale:
+            crops = [
+                align_face(frame, {
+                    "bounding_box": track.box,
+                    "landmarks": {
+                        "left_eye": face_points[MAKEUP_REGIONS["left_eye"]].mean(axis=0).tolist(),
+                        "right_eye": face_points[MAKEUP_REGIONS["right_eye"]].mean(axis=0).tolist(),
+                    },
+                }, settings.FACE_ALIGN_MARGIN)
+                for _, track, face_points in stale
+            ]
+            outputs = self.outputs - {"regions"}
+            segmentations = await segment_images(crops, self.model, outputs, self.endpoint, self.mask_format)
+            for (_, track, _), segmentation in zip(stale, segmentations):
+                track.segmentation = segmentation
+                track.segmented_box = list(track.box)
+                track.segmented_frame = index
+            self.segmentations += len(stale)
+        self.reused_segmentations += len(faces) - len(stale)
+        for face, track in zip(faces, self.tracks):
+            face["segmentation"] = track.segmentation
+            face["segmented_frame"] = track.segmented_frame
+
+    async def process(self, frame: np.ndarray, index: Optional[int] = None,
+                      timestamp_ms: Optional[float] = None) -> Dict[str, Any]:
+        """Region data for the next frame of the stream.
+
+        ``index`` is the frame's position in the source (defaults to a running
+        count); keyframe intervals and segmentation ages are measured in it.
+        """
+        index = self.frames if index is None else index
+        result = await inference_executor.run(self.endpoint, self._track, frame, index)
+        points = result.pop("points")
+        if "segment" in self.stages and result["faces"]:
+            await self._segment(frame, result["frame"], result["faces"], points)
+        if timestamp_ms is not None:
+            result["timestamp_ms"] = round(timestamp_ms, 1)
+        return result
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._start
+        return {
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "segmentations": self.segmentations,
+            "reused_segmentations": self.reused_segmentations,
+            "elapsed_s": round(elapsed, 2),
+            "fps": round(self.frames / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    def close(self):
+        with self._lock:
+            self._reset_mesh()
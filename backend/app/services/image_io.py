@@ -0,0 +1,165 @@
+import hashlib
+import os
+from io import BytesIO
+from typing import AsyncIterator, Optional, Tuple, Union
+
+import numpy as np
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+
+# Leading bytes of the image formats PIL can decode for the models
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+)
+
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """Image format from magic bytes, ignoring the client's content type and filename"""
+    for signature, name in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return name
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE // (1024*1024)}MB"
+    )
+
+
+async def iter_upload(file: UploadFile, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Yield an upload in fixed-size chunks, rejecting it as soon as it is known to be bad.
+
+    Oversized bodies fail on the first chunk past ``MAX_FILE_SIZE`` (or up
+    front when the size is known) and non-images fail on the first chunk,
+    so neither is ever held in memory whole.
+    """
+    if file.content_type and not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image.")
+    if file.size is not None and file.size > settings.MAX_FILE_SIZE:
+        raise _too_large()
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    total = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        if total == 0 and sniff_image_format(chunk) is None:
+            raise HTTPException(status_code=400, detail="File must be an image.")
+        total += len(chunk)
+        if total > settings.MAX_FILE_SIZE:
+            raise _too_large()
+        yield chunk
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Empty file.")
+
+
+def check_image_header(source: Union[bytes, str]) -> Tuple[str, Tuple[int, int]]:
+    """Parse only the image header and reject pixel counts above ``MAX_IMAGE_PIXELS``.
+
+    Guards the decoders against decompression bombs: a few kilobytes of PNG
+    can claim gigapixel dimensions.
+    """
+    try:
+        with Image.open(BytesIO(source) if isinstance(source, bytes) else source) as img:
+            image_format, size = img.format, img.size
+    except Image.DecompressionBombError:
+        raise HTTPException(status_code=400, detail="Image dimensions too large.")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid or corrupted image.")
+    if size[0] * size[1] > settings.MAX_IMAGE_PIXELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Image dimensions too large: {size[0]}x{size[1]}. Maximum: {settings.MAX_IMAGE_PIXELS} pixels"
+        )
+    return image_format, size
+
+
+def validate_image_bytes(data: bytes):
+    """Size, magic-byte and header checks for image bytes that did not come through ``iter_upload``"""
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty file.")
+    if len(data) > settings.MAX_FILE_SIZE:
+        raise _too_large()
+    if sniff_image_format(data[:16]) is None:
+        raise HTTPException(status_code=400, detail="File must be an image.")
+    check_image_header(data)
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an uploaded image into memory chunk by chunk, validating size, type and dimensions"""
+    data = bytearray()
+    async for chunk in iter_upload(file):
+        data += chunk
+    data = bytes(data)
+    check_image_header(data)
+    return data
+
+
+async def save_upload(file: UploadFile, path: str, hasher=None) -> int:
+    """Stream an uploaded image to ``path`` chunk by chunk; nothing is left behind on rejection.
+
+    ``hasher`` (a ``hashlib`` object) is fed every chunk, so the caller gets a
+    content hash of the file without reading it back.
+    """
+    size = 0
+    try:
+        with open(path, "wb") as buffer:
+            async for chunk in iter_upload(file):
+                await run_in_threadpool(buffer.write, chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                size += len(chunk)
+        check_image_header(path)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return size
+
+
+def decode_image(data: bytes, max_side: Optional[int] = None) -> np.ndarray:
+    """Decode image bytes straight to an RGB uint8 array of shape (H, W, 3).
+
+    With ``max_side`` set, JPEGs are decoded at a reduced DCT scale (PIL
+    ``draft``) so that neither edge drops below ``max_side``; other formats
+    are decoded at full size. Callers that report pixel coordinates must not
+    pass ``max_side``.
+    """
+    with Image.open(BytesIO(data)) as img:
+        if max_side and img.format == "JPEG":
+            img.draft("RGB", (max_side, max_side))
+        return np.asarray(img.convert("RGB"))
+
+
+def image_digest(image: np.ndarray) -> str:
+    """Content hash of a decoded image (pixels + shape), independent of file encoding"""
+    image = np.ascontiguousarray(image)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str((image.shape, image.dtype.str)).encode())
+    h.update(memoryview(image).cast("B"))
+    return h.hexdigest()
+
+
+def decode_and_digest(data: bytes, max_side: Optional[int] = None) -> Tuple[np.ndarray, str]:
+    """Decode an upload and hash its pixels in one executor job"""
+    image = decode_image(data, max_side)
+    return image, image_digest(image)
+
+
+def encode_image(image: np.ndarray, format: str = "PNG") -> bytes:
+    """Encode an RGB uint8 array to image bytes in memory"""
+    buffer = BytesIO()
+    Image.fromarray(image).save(buffer, format=format)
+    return buffer.getvalue()
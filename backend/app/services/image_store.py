@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.derivatives import DERIVATIVE_FORMATS, derivative_filename, derivative_path, find_original, is_image_id
+from app.services.executor import inference_executor
+from app.services.image_io import decode_and_digest, validate_image_bytes
+from app.services.storage import minio_service
+
+DecodedImage = Tuple[np.ndarray, str]
+
+
+class DecodedImageCache:
+    """LRU of decoded upload arrays keyed by ``<image_id>:<variant>``, bounded by bytes.
+
+    Arrays are marked read-only because the same array is handed to every
+    request that references the upload.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, DecodedImage]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[DecodedImage]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: str, image: np.ndarray, digest: str):
+        if image.nbytes > self.max_bytes:
+            return
+        image.flags.writeable = False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[0].nbytes
+            self._entries[key] = (image, digest)
+            self._bytes += image.nbytes
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+decoded_image_cache = DecodedImageCache(settings.DECODED_IMAGE_CACHE_MAX_BYTES)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _decode_validated(source: Union[bytes, str]) -> DecodedImage:
+    """Validate stored image bytes (size, format, ``MAX_IMAGE_PIXELS``), then decode them.
+
+    A file that fails the checks raises before anything is decoded, so it
+    never takes (or evicts) decoded-image cache space.
+    """
+    data = _read_file(source) if isinstance(source, str) else source
+    validate_image_bytes(data)
+    return decode_and_digest(data)
+
+
+async def _fetch_remote(image_id: str, variant: str) -> Optional[bytes]:
+    """Bytes of an upload mirrored to MinIO, when it is not on this node's disk"""
+    if not settings.MINIO_UPLOAD_ENABLED:
+        return None
+    if variant in DERIVATIVE_FORMATS:
+        names = [derivative_filename(image_id, variant)]
+    else:
+        names = [f"{image_id}{extension}" for extension in settings.ALLOWED_EXTENSIONS]
+    for name in names:
+        try:
+            return await minio_service.download_bytes(name)
+        except Exception:
+            continue
+    return None
+
+
+async def _load_variant(image_id: str, variant: str, endpoint: str) -> Optional[DecodedImage]:
+    key = f"{image_id}:{variant}"
+    entry = decoded_image_cache.get(key)
+    if entry is not None:
+        return entry
+    path = derivative_path(image_id, variant) if variant in DERIVATIVE_FORMATS else find_original(image_id)
+    if path is not None and os.path.exists(path):
+        source = path
+    else:
+        source = await _fetch_remote(image_id, variant)
+        if source is None:
+            return None
+    image, digest = await inference_executor.run(endpoint, _decode_validated, source)
+    decoded_image_cache.set(key, image, digest)
+    return image, digest
+
+
+async def load_uploaded_image(image_id: str, endpoint: str, max_side: Optional[int] = None) -> DecodedImage:
+    """Decoded RGB array and pixel digest for an upload referenced by its image ID.
+
+    With ``max_side`` set the stored analysis copy (short edge
+    ``ANALYSIS_IMAGE_SIZE``) is used when both of its edges are at least
+    ``max_side``; otherwise (and for endpoints reporting pixel coordinates)
+    the full-resolution original is decoded. Uploads are looked up in
+    ``UPLOAD_DIR`` first, then in MinIO.
+    """
+    if not is_image_id(image_id):
+        raise HTTPException(status_code=400, detail="Invalid image_id.")
+    if max_side:
+        entry = await _load_variant(image_id, "analysis", endpoint)
+        if entry is not None and min(entry[0].shape[:2]) >= max_side:
+            return entry
+    entry = await _load_variant(image_id, "original", endpoint)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Image not found: {image_id}")
+    return entry
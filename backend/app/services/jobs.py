@@ -0,0 +1,330 @@
+import asyncio
+import ipaddress
+import json
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.mask_encoding import json_default, json_object_hook, to_json_compatible
+
+# handler(content, image_id, options) -> result dict
+JobHandler = Callable[[Optional[bytes], Optional[str], Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+async def check_callback_url(url: str) -> Optional[str]:
+    """Refuse callback URLs that would make the server call into its own network.
+
+    Only http(s) is allowed. Hosts in ``JOB_CALLBACK_ALLOWED_HOSTS`` are
+    trusted (returns None); any other host must resolve to public addresses
+    only, and one of them is returned so the caller can connect to exactly
+    the address that was checked.
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        raise HTTPException(status_code=422, detail="callback_url is not a valid URL.")
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise HTTPException(status_code=422, detail="callback_url must be an http(s) URL.")
+    host = parts.hostname.lower()
+    allowed = [h.lower() for h in settings.JOB_CALLBACK_ALLOWED_HOSTS]
+    if allowed:
+        if host not in allowed:
+            raise HTTPException(status_code=422, detail=f"callback_url host {host} is not allowed.")
+        return None
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port or 443, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise HTTPException(status_code=422, detail=f"callback_url host {host} does not resolve.")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global:
+            raise HTTPException(status_code=422, detail=f"callback_url host {host} is not a public address.")
+    return infos[0][4][0].split("%")[0]
+
+
+def _pinned_request(url: str, address: Optional[str]) -> Tuple[httpx.URL, Dict[str, str], Dict[str, Any]]:
+    """``(url, headers, extensions)`` that reach ``address`` while still presenting the original host.
+
+    httpx would resolve the host name again, so a DNS record that changes after
+    ``check_callback_url`` (DNS rebinding) could otherwise point the request
+    at a private address. The URL gets the checked IP; the Host header and TLS
+    SNI / certificate check keep using the name.
+    """
+    target = httpx.URL(url)
+    if address is None:
+        return target, {}, {}
+    host = target.host
+    return (
+        target.copy_with(host=address),
+        {"Host": host if target.port is None else f"{host}:{target.port}"},
+        {"sni_hostname": host} if target.scheme == "https" else {},
+    )
+
+
+class _MemoryBackend:
+    """Single-process queue; jobs are lost on restart (tests, local development)"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._payloads: Dict[str, bytes] = {}
+        self._payload_bytes = 0
+        self._queue: Optional[asyncio.Queue] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def _expire(self):
+        cutoff = time.time() - settings.JOB_TTL
+        for job_id in [k for k, r in self._records.items() if (r["finished_at"] or time.time()) < cutoff]:
+            del self._records[job_id]
+
+    async def enqueue(self, record: Dict[str, Any], payload: Optional[bytes]):
+        self._expire()
+        if payload is not None:
+            if self._payload_bytes + len(payload) > settings.JOB_MEMORY_MAX_PAYLOAD_BYTES:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Job queue is full, retry later.",
+                    headers={"Retry-After": str(settings.EXECUTOR_RETRY_AFTER)},
+                )
+            self._payloads[record["job_id"]] = payload
+            self._payload_bytes += len(payload)
+        self._records[record["job_id"]] = record
+        self.queue.put_nowait(record["job_id"])
+
+    async def dequeue(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._records.get(job_id)
+
+    async def save(self, record: Dict[str, Any]):
+        self._records[record["job_id"]] = record
+
+    async def pop_payload(self, job_id: str) -> Optional[bytes]:
+        payload = self._payloads.pop(job_id, None)
+        if payload is not None:
+            self._payload_bytes -= len(payload)
+        return payload
+
+    async def queued(self) -> int:
+        return self.queue.qsize()
+
+    async def close(self):
+        pass
+
+
+class _RedisBackend:
+    """Queue and job records in Redis at ``REDIS_URL``, shared by every API worker"""
+
+    name = "redis"
+    QUEUE_KEY = "facetory:jobs:queue"
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"facetory:job:{job_id}"
+
+    async def enqueue(self, record: Dict[str, Any], payload: Optional[bytes]):
+        if payload is not None:
+            await self._redis.set(f"{self._key(record['job_id'])}:payload", payload, ex=settings.JOB_TTL)
+        await self.save(record)
+        await self._redis.rpush(self.QUEUE_KEY, record["job_id"])
+
+    async def dequeue(self, timeout: float) -> Optional[str]:
+        item = await self._redis.blpop([self.QUEUE_KEY], timeout=max(1, int(timeout)))
+        return item[1].decode() if item else None
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        value = await self._redis.get(self._key(job_id))
+        return json.loads(value, object_hook=json_object_hook) if value is not None else None
+
+    async def save(self, record: Dict[str, Any]):
+        value = json.dumps(record, separators=(",", ":"), default=json_default)
+        await self._redis.set(self._key(record["job_id"]), value, ex=settings.JOB_TTL)
+
+    async def pop_payload(self, job_id: str) -> Optional[bytes]:
+        key = f"{self._key(job_id)}:payload"
+        payload = await self._redis.get(key)
+        await self._redis.delete(key)
+        return payload
+
+    async def queued(self) -> int:
+        return await self._redis.llen(self.QUEUE_KEY)
+
+    async def close(self):
+        await self._redis.close()
+
+
+class JobQueue:
+    """Background execution of slow analysis requests.
+
+    Jobs move through queued -> running -> succeeded | failed.
+    ``submit`` stores the job and returns at once; ``JOB_WORKERS`` tasks per
+    API process pull jobs and run the handler registered for the job kind
+    (the same code path as the synchronous endpoint, so results are shared
+    through the result cache and the micro-batchers). Results are polled via
+    ``get`` or POSTed to the job's ``callback_url`` when it finishes.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, JobHandler] = {}
+        self._backend = None
+        self._workers: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        self.callbacks_failed = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if settings.JOB_QUEUE_REDIS_ENABLED:
+                self._backend = _RedisBackend(settings.REDIS_URL)
+            else:
+                self._backend = _MemoryBackend()
+        return self._backend
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    async def submit(self, kind: str, options: Dict[str, Any], content: Optional[bytes] = None,
+                     image_id: Optional[str] = None, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        if kind not in self._handlers:
+            raise KeyError(f"No job handler registered for '{kind}'")
+        if callback_url:
+            await check_callback_url(callback_url)
+        if await self.backend.queued() >= settings.JOB_MAX_QUEUE:
+            raise HTTPException(
+                status_code=503,
+                detail="Job queue is full, retry later.",
+                headers={"Retry-After": str(settings.EXECUTOR_RETRY_AFTER)},
+            )
+        record = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "queued",
+            "options": options,
+            "image_id": image_id,
+            "callback_url": callback_url,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        await self.backend.enqueue(record, content)
+        return record
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.get(job_id)
+
+    @staticmethod
+    def public_view(record: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON-ready job status (artifacts become base64 / data URLs)"""
+        view = {k: record[k] for k in ("job_id", "kind", "status", "created_at", "started_at", "finished_at", "error")}
+        if record["status"] == "succeeded":
+            view["result"] = to_json_compatible(record["result"])
+        return view
+
+    async def _run(self, job_id: str):
+        record = await self.backend.get(job_id)
+        if record is None:
+            return
+        payload = await self.backend.pop_payload(job_id)
+        record.update(status="running", started_at=time.time())
+        await self.backend.save(record)
+        try:
+            record["result"] = await self._handlers[record["kind"]](payload, record["image_id"], record["options"])
+            record["status"] = "succeeded"
+            self.completed += 1
+        except HTTPException as e:
+            record.update(status="failed", error=e.detail)
+            self.failed += 1
+        except Exception as e:
+            record.update(status="failed", error=str(e))
+            self.failed += 1
+        record["finished_at"] = time.time()
+        await self.backend.save(record)
+        if record["callback_url"]:
+            await self._notify(record)
+
+    async def _notify(self, record: Dict[str, Any]):
+        try:
+            address = await check_callback_url(record["callback_url"])
+        except HTTPException as e:
+            self.callbacks_failed += 1
+            print(f"Job {record['job_id']}: refusing callback: {e.detail}")
+            return
+        url, headers, extensions = _pinned_request(record["callback_url"], address)
+        body = self.public_view(record)
+        async with httpx.AsyncClient(timeout=settings.JOB_CALLBACK_TIMEOUT) as client:
+            for attempt in range(settings.JOB_CALLBACK_RETRIES):
+                try:
+                    response = await client.post(url, json=body, headers=headers, extensions=extensions)
+                    if response.status_code < 500:
+                        return
+                except httpx.HTTPError as e:
+                    print(f"Job {record['job_id']}: callback attempt {attempt + 1} failed: {e}")
+                if attempt + 1 < settings.JOB_CALLBACK_RETRIES:
+                    await asyncio.sleep(2 ** attempt)
+        self.callbacks_failed += 1
+        print(f"Job {record['job_id']}: giving up on callback to {record['callback_url']}")
+
+    async def _worker(self):
+        while True:
+            try:
+                job_id = await self.backend.dequeue(timeout=1.0)
+                if job_id is not None:
+                    await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker error: {e}")
+                await asyncio.sleep(1.0)
+
+    def start(self, num_workers: Optional[int] = None):
+        for _ in range(num_workers if num_workers is not None else settings.JOB_WORKERS):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
+
+    async def stats(self) -> dict:
+        try:
+            queued = await self.backend.queued()
+        except Exception:
+            queued = None
+        return {
+            "backend": self.backend.name,
+            "workers": len(self._workers),
+            "queued": queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "callbacks_failed": self.callbacks_failed,
+        }
+
+
+job_queue = JobQueue()
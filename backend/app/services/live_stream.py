@@ -0,0 +1,95 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+
+class LatestFrame:
+    """Single-slot mailbox between a WebSocket reader and the frame processor.
+
+    A frame that arrives while the previous one is still waiting replaces it,
+    so when inference falls behind the camera the server skips ahead to the
+    newest frame instead of building up a backlog of stale ones.
+    """
+
+    def __init__(self):
+        self._frame: Optional[Tuple[int, bytes]] = None
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, data: bytes):
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = (self.received, data)
+        self.received += 1
+        self._ready.set()
+
+    async def get(self) -> Optional[Tuple[int, bytes]]:
+        """Newest ``(frame index, bytes)``, or None once the connection is closed"""
+        await self._ready.wait()
+        self._ready.clear()
+        if self.closed:
+            return None
+        frame, self._frame = self._frame, None
+        return frame
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+
+class SessionSlots:
+    """Counts live sessions against a limit; each one holds its own FaceMesh graph.
+
+    Only touched from the event loop, so no lock is needed.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.rejected = 0
+
+    def try_acquire(self, limit: int) -> bool:
+        if self.active >= limit:
+            self.rejected += 1
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"active": self.active, "rejected": self.rejected}
+
+
+stream_sessions = SessionSlots()
+
+
+def compact_frame(result: Dict[str, Any], dropped: int, latency_ms: float) -> Dict[str, Any]:
+    """Trim a tracking-session frame result for the wire.
+
+    Region colors lose their ``_color`` suffix and the jawline is only sent
+    with the region polygons. A face's segmentation is only sent on the frame
+    it was recomputed; until the next one arrives the previous one still applies.
+    """
+    faces = []
+    for face in result["faces"]:
+        item = {"id": face["face_id"], "box": face["bounding_box"]}
+        if face.get("score") is not None:
+            item["score"] = round(face["score"], 3)
+        if face.get("makeup"):
+            item["colors"] = {
+                name[:-len("_color")]: value for name, value in face["makeup"].items() if name.endswith("_color")
+            }
+        if "regions" in face:
+            item["regions"] = face["regions"]
+        if face.get("segmentation") is not None and face.get("segmented_frame") == result["frame"]:
+            item["segmentation"] = face["segmentation"]
+        faces.append(item)
+    return {
+        "frame": result["frame"],
+        "keyframe": result["keyframe"],
+        "faces": faces,
+        "dropped": dropped,
+        "ms": round(latency_ms, 1),
+    }
@@ -0,0 +1,121 @@
+import base64
+import json
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+from ai_models.unet import mask_codecs
+from app.services.image_io import encode_image
+
+MASK_FORMATS = ("png", "indexed_png", "raw", "rle")
+RESPONSE_FORMATS = ("json", "binary")
+
+
+@dataclass
+class Artifact:
+    """Encoded binary output (mask, overlay) kept as bytes until the response is rendered"""
+    data: bytes
+    media_type: str
+
+
+def validate_formats(mask_format: str, response_format: str):
+    if mask_format not in MASK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown mask_format: {mask_format}. Allowed: {list(MASK_FORMATS)}")
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown response_format: {response_format}. Allowed: {list(RESPONSE_FORMATS)}")
+
+
+def png_artifact(image: np.ndarray) -> Artifact:
+    return Artifact(encode_image(image, format="PNG"), "image/png")
+
+
+def indexed_png(mask: np.ndarray, palette_lut: np.ndarray) -> Artifact:
+    """Palettized PNG: pixel values are class ids, the palette holds display colors"""
+    return Artifact(mask_codecs.indexed_png(mask, palette_lut), "image/png")
+
+
+def encode_mask(mask: np.ndarray, mask_format: str, palette_lut: np.ndarray) -> Dict[str, Any]:
+    """Encode a class mask for the response, never materializing it as Python lists.
+
+    ``png`` keeps the original ``colorized_mask`` RGB PNG; the compact formats
+    are returned under ``mask`` with its format and shape.
+    """
+    if mask_format == "png":
+        return {"colorized_mask": png_artifact(palette_lut[mask.astype(np.uint8, copy=False)])}
+    mask = mask.astype(np.uint8, copy=False)
+    if mask_format == "indexed_png":
+        encoded = indexed_png(mask, palette_lut)
+    elif mask_format == "raw":
+        encoded = Artifact(np.ascontiguousarray(mask).tobytes(), "application/octet-stream")
+    else:
+        encoded = mask_codecs.rle_encode(mask)
+    return {"mask": encoded, "mask_format": mask_format, "mask_shape": list(mask.shape)}
+
+
+# --------- Response rendering ---------
+
+def to_json_compatible(value: Any) -> Any:
+    """Replace artifacts with base64 (data URLs for images) for JSON responses"""
+    if isinstance(value, Artifact):
+        encoded = base64.b64encode(value.data).decode("utf-8")
+        if value.media_type.startswith("image/"):
+            return f"data:{value.media_type};base64,{encoded}"
+        return encoded
+    if isinstance(value, dict):
+        return {k: to_json_compatible(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_compatible(v) for v in value]
+    return value
+
+
+def _extract_parts(value: Any, path: str, parts: List[Tuple[str, Artifact]]) -> Any:
+    if isinstance(value, Artifact):
+        parts.append((path, value))
+        return {"part": path, "content_type": value.media_type, "bytes": len(value.data)}
+    if isinstance(value, dict):
+        return {k: _extract_parts(v, f"{path}.{k}" if path else k, parts) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_extract_parts(v, f"{path}.{i}", parts) for i, v in enumerate(value)]
+    return value
+
+
+def render_response(result: Any, response_format: str = "json", boundary: Optional[str] = None) -> Response:
+    """JSON response, or ``multipart/mixed`` with a JSON part followed by one raw part per artifact"""
+    if response_format == "json":
+        return JSONResponse(to_json_compatible(result))
+    parts: List[Tuple[str, Artifact]] = []
+    metadata = _extract_parts(result, "", parts)
+    boundary = boundary or uuid.uuid4().hex
+    chunks = [
+        f"--{boundary}\r\nContent-Type: application/json\r\nContent-Disposition: inline; name=\"metadata\"\r\n\r\n".encode(),
+        json.dumps(metadata).encode(),
+        b"\r\n",
+    ]
+    for name, artifact in parts:
+        chunks.append(
+            f"--{boundary}\r\nContent-Type: {artifact.media_type}\r\n"
+            f"Content-Disposition: attachment; name=\"{name}\"\r\n"
+            f"Content-Length: {len(artifact.data)}\r\n\r\n".encode()
+        )
+        chunks.append(artifact.data)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return Response(b"".join(chunks), media_type=f"multipart/mixed; boundary={boundary}")
+
+
+# --------- Cache (de)serialization ---------
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, Artifact):
+        return {"__artifact__": value.media_type, "data": base64.b64encode(value.data).decode("ascii")}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_object_hook(value: Dict[str, Any]) -> Any:
+    if "__artifact__" in value:
+        return Artifact(base64.b64decode(value["data"]), value["__artifact__"])
+    return value
@@ -0,0 +1,314 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    import torch
+
+# torch is imported on first model load, not at API import time
+
+
+@dataclass
+class ModelSpec:
+    """How to build one of the U-Net models served by the API"""
+    loader: Callable[[str, str], "torch.nn.Module"]
+    default_checkpoint: Callable[[], str]
+    input_size: Tuple[int, int]
+
+
+@dataclass
+class LoadedModel:
+    name: str
+    checkpoint_path: str
+    device: str
+    dtype: str
+    precision: str
+    backend: str
+    model: "torch.nn.Module"
+    checkpoint_mtime: Optional[float]
+    load_time_s: float
+    param_bytes: int
+    rss_delta_bytes: Optional[int]
+    loaded_at: float = field(default_factory=time.time)
+    last_checked: float = field(default_factory=time.monotonic)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "checkpoint": self.checkpoint_path,
+            "checkpoint_mtime": self.checkpoint_mtime,
+            "device": self.device,
+            "dtype": self.dtype,
+            "precision": self.precision,
+            "backend": self.backend,
+            "load_time_ms": round(self.load_time_s * 1000, 1),
+            "param_bytes": self.param_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def _load_unet(checkpoint_path: str, device: str) -> "torch.nn.Module":
+    from ai_models.unet.inference_unet import load_model
+    return load_model(device, checkpoint_path)
+
+
+def _load_celeba_unet(checkpoint_path: str, device: str) -> "torch.nn.Module":
+    from ai_models.unet.inference_celeba_unet import load_model
+    return load_model(checkpoint_path, device)
+
+
+def _unet_checkpoint() -> str:
+    if settings.UNET_CHECKPOINT:
+        return settings.UNET_CHECKPOINT
+    from ai_models.unet.inference_unet import MODEL_PATH
+    return MODEL_PATH
+
+
+def _celeba_unet_checkpoint() -> str:
+    if settings.CELEBA_UNET_CHECKPOINT:
+        return settings.CELEBA_UNET_CHECKPOINT
+    from ai_models.unet.inference_celeba_unet import MODEL_PATH
+    return MODEL_PATH
+
+
+MODEL_SPECS: Dict[str, ModelSpec] = {
+    "unet": ModelSpec(_load_unet, _unet_checkpoint, (256, 256)),
+    "celeba_unet": ModelSpec(_load_celeba_unet, _celeba_unet_checkpoint, (512, 512)),
+}
+
+
+def _calibration_batches(name: str, batch_size: int = 8) -> Optional[List["torch.Tensor"]]:
+    """Preprocessed sample images from ``MODEL_CALIBRATION_DIR`` for int8 calibration"""
+    if not settings.MODEL_CALIBRATION_DIR:
+        return None
+    import torch
+    from PIL import Image
+    from ai_models.unet.batch_inference import list_images, preprocess
+
+    tensors = []
+    for path in list_images(settings.MODEL_CALIBRATION_DIR)[:settings.MODEL_CALIBRATION_IMAGES]:
+        try:
+            with Image.open(path) as img:
+                tensors.append(preprocess(name, img.convert("RGB")))
+        except Exception as e:
+            print(f"Model registry: skipping calibration image {path}: {e}")
+    if not tensors:
+        return None
+    return [torch.stack(tensors[i:i + batch_size]) for i in range(0, len(tensors), batch_size)]
+
+
+def _load_eager(name: str, checkpoint_path: str, device: str, dtype: str, precision: str):
+    """``(model, precision actually used)`` from the .pth checkpoint"""
+    import torch
+
+    model = MODEL_SPECS[name].loader(checkpoint_path, device)
+    model = model.to(device=device, dtype=getattr(torch, dtype))
+    model.eval()
+    if dtype == "float32":
+        from ai_models.unet.precision import optimize_for_inference
+        options = dict(channels_last=settings.MODEL_CHANNELS_LAST, fold_bn=settings.MODEL_FOLD_BN, device=device)
+        try:
+            return optimize_for_inference(
+                model,
+                precision,
+                calibration_batches=_calibration_batches(name) if precision == "int8" else None,
+                **options,
+            )
+        except Exception as e:
+            if precision == "fp32":
+                raise
+            print(f"Model registry: {precision} preparation of {name} failed ({e}); using fp32")
+            return optimize_for_inference(model, "fp32", **options)
+    if precision != "fp32":
+        print(f"Model registry: MODEL_PRECISION={precision} needs MODEL_DTYPE=float32, ignoring it")
+    return model, "fp32"
+
+
+def _load_exported(name: str, backend: str, device: str, checkpoint_path: str):
+    """``(model, artifact_path)`` for an exported backend, or ``(None, None)`` to fall back to eager"""
+    from ai_models.unet.backends import exported_path, load_exported
+
+    path = os.path.abspath(exported_path(settings.MODEL_EXPORT_DIR, name, backend))
+    try:
+        model = load_exported(backend, path, device, settings.ORT_INTRA_OP_THREADS, settings.ORT_INTER_OP_THREADS)
+    except Exception as e:
+        print(f"Model registry: cannot use {backend} for {name} ({e}); falling back to eager PyTorch")
+        return None, None
+    checkpoint_mtime = _checkpoint_mtime(checkpoint_path)
+    if checkpoint_mtime is not None and checkpoint_mtime > (_checkpoint_mtime(path) or 0):
+        print(f"Model registry: {path} is older than {checkpoint_path}; re-run the export")
+    return model, path
+
+
+def _checkpoint_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (Linux only)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def resolve_device(device: Optional[str] = None) -> str:
+    device = device or settings.MODEL_DEVICE
+    if device == "auto":
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+class ModelRegistry:
+    """Process-wide cache of warmed, eval-mode models.
+
+    Entries are keyed by (model, checkpoint, device, dtype, precision,
+    backend). When ``MODEL_HOT_RELOAD`` is enabled the checkpoint mtime (or
+    the exported artifact's, for the torchscript / onnxruntime backends) is
+    re-checked at most every ``MODEL_RELOAD_CHECK_INTERVAL`` seconds and the
+    model is reloaded if the file changed.
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str, str, str, str, str], LoadedModel] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, name: str, checkpoint_path: Optional[str], device: Optional[str],
+             dtype: Optional[str]) -> Tuple[str, str, str, str, str, str]:
+        if name not in MODEL_SPECS:
+            raise KeyError(f"Unknown model '{name}'. Available: {list(MODEL_SPECS)}")
+        checkpoint_path = checkpoint_path or MODEL_SPECS[name].default_checkpoint()
+        return (name, os.path.abspath(checkpoint_path), resolve_device(device), dtype or settings.MODEL_DTYPE,
+                settings.MODEL_PRECISION, settings.INFERENCE_BACKEND)
+
+    def _load(self, key: Tuple[str, str, str, str, str, str]) -> LoadedModel:
+        import torch
+
+        name, checkpoint_path, device, dtype, precision, backend = key
+        spec = MODEL_SPECS[name]
+        rss_before = _current_rss()
+        start = time.perf_counter()
+
+        model = None
+        if backend != "torch":
+            model, artifact_path = _load_exported(name, backend, device, checkpoint_path)
+            if model is None:
+                backend = "torch"
+            else:
+                # Exported graphs are fp32; precision modes only apply to eager PyTorch
+                if (dtype, precision) != ("float32", "fp32"):
+                    print(f"Model registry: {backend} serves the exported fp32 graph, "
+                          f"ignoring MODEL_DTYPE={dtype} / MODEL_PRECISION={precision}")
+                checkpoint_path, dtype, precision = artifact_path, "float32", "fp32"
+        if model is None:
+            model, precision = _load_eager(name, checkpoint_path, device, dtype, precision)
+        # Warm up so the first request does not pay for lazy kernel/allocator init
+        with torch.no_grad():
+            model(torch.zeros(1, 3, *spec.input_size, device=device, dtype=getattr(torch, dtype)))
+
+        load_time = time.perf_counter() - start
+        rss_after = _current_rss()
+        if backend == "onnxruntime":
+            param_bytes = os.path.getsize(checkpoint_path)
+        else:
+            # state_dict also covers the packed weights of quantized modules
+            param_bytes = sum(t.numel() * t.element_size()
+                              for t in model.state_dict().values() if isinstance(t, torch.Tensor))
+        entry = LoadedModel(
+            name=name,
+            checkpoint_path=checkpoint_path,
+            device=device,
+            dtype=dtype,
+            precision=precision,
+            backend=backend,
+            model=model,
+            checkpoint_mtime=_checkpoint_mtime(checkpoint_path),
+            load_time_s=load_time,
+            param_bytes=param_bytes,
+            rss_delta_bytes=(rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+        )
+        print(f"Model registry: loaded {name} ({checkpoint_path}) on {device}/{dtype}/{precision} via {backend} in {load_time * 1000:.0f} ms")
+        return entry
+
+    def _is_stale(self, entry: LoadedModel) -> bool:
+        if not settings.MODEL_HOT_RELOAD:
+            return False
+        now = time.monotonic()
+        if now - entry.last_checked < settings.MODEL_RELOAD_CHECK_INTERVAL:
+            return False
+        entry.last_checked = now
+        return _checkpoint_mtime(entry.checkpoint_path) != entry.checkpoint_mtime
+
+    def get_entry(self, name: str, checkpoint_path: Optional[str] = None,
+                  device: Optional[str] = None, dtype: Optional[str] = None) -> LoadedModel:
+        key = self._key(name, checkpoint_path, device, dtype)
+        entry = self._models.get(key)
+        if entry is not None and not self._is_stale(entry):
+            return entry
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None or _checkpoint_mtime(entry.checkpoint_path) != entry.checkpoint_mtime:
+                if entry is not None:
+                    print(f"Model registry: checkpoint for {name} changed, reloading")
+                entry = self._load(key)
+                self._models[key] = entry
+            return entry
+
+    def get(self, name: str, checkpoint_path: Optional[str] = None,
+            device: Optional[str] = None, dtype: Optional[str] = None) -> "torch.nn.Module":
+        """Return a warmed, eval-mode model, loading it on first use"""
+        return self.get_entry(name, checkpoint_path, device, dtype).model
+
+    def version(self, name: str) -> str:
+        """Identifies the weights served for ``name`` (used in cache keys).
+
+        Never loads or reloads a model, so a cache lookup cannot wait on a
+        checkpoint load: it describes the loaded entry, or else the configured
+        checkpoint, with the file's current mtime (a changed file gets a new
+        key before the hot reload happens). A model that is not loaded yet
+        reports the configured precision and backend, not a fallback it may
+        end up using.
+        """
+        if name not in MODEL_SPECS:
+            raise KeyError(f"Unknown model '{name}'. Available: {list(MODEL_SPECS)}")
+        configured = (settings.MODEL_DTYPE, settings.MODEL_PRECISION, settings.INFERENCE_BACKEND)
+        entry = next(
+            (entry for key, entry in list(self._models.items()) if key[0] == name and key[3:] == configured), None
+        )
+        if entry is not None:
+            path, dtype, precision, backend = entry.checkpoint_path, entry.dtype, entry.precision, entry.backend
+        else:
+            path = MODEL_SPECS[name].default_checkpoint()
+            dtype, precision, backend = configured
+        return f"{name}-{os.path.basename(path)}-{_checkpoint_mtime(path) or 0:.0f}-{dtype}-{precision}-{backend}"
+
+    def input_size(self, name: str) -> Tuple[int, int]:
+        return MODEL_SPECS[name].input_size
+
+    def preload(self, names: List[str]):
+        """Load models at startup; failures are logged so the API can still start"""
+        for name in names:
+            try:
+                self.get_entry(name)
+            except Exception as e:
+                print(f"Model registry: failed to preload {name}: {e}")
+
+    def stats(self) -> List[dict]:
+        return [entry.stats() for entry in self._models.values()]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,102 @@
+import queue
+import threading
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+class BoundedPool:
+    """Up to ``size`` reusable objects that are not thread-safe (MediaPipe graphs).
+
+    Idle objects wait in a LIFO queue so the most recently used (warm) one is
+    handed out first. New objects are only built while fewer than ``size``
+    exist; once all are checked out a caller waits up to ``timeout`` and then
+    gets a 503 with Retry-After, like an overloaded executor endpoint.
+    Objects still checked out when the pool is closed are closed on release.
+    """
+
+    def __init__(self, create: Callable[[], Any], size: int, name: str):
+        self.create = create
+        self.size = size
+        self.name = name
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    def _build(self):
+        try:
+            return self.create()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def fill(self, count: Optional[int] = None):
+        """Create instances up to ``count`` (default ``size``) ahead of the first request"""
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self._lock:
+                if self._created >= count:
+                    return
+                self._created += 1
+            self._idle.put(self._build())
+
+    def acquire(self, timeout: float):
+        self.checkouts += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            return self._build()
+        self.waits += 1
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            self.timeouts += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server busy ({self.name}), please retry later",
+                headers={"Retry-After": str(settings.EXECUTOR_RETRY_AFTER)},
+            )
+
+    def release(self, item):
+        with self._lock:
+            if not self._closed:
+                self._idle.put(item)
+                return
+            self._created -= 1
+        item.close()
+
+    def close(self):
+        items = []
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    items.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            self._created -= len(items)
+        for item in items:
+            item.close()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "created": self._created,
+            "idle": self._idle.qsize(),
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+        }
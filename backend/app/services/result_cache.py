@@ -0,0 +1,135 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.services.mask_encoding import json_default, json_object_hook
+
+
+class ResultCache:
+    """Content-addressed cache for face analysis results.
+
+    Results are stored as JSON under ``<endpoint>:<model version>:<image digest>``
+    in an in-process LRU bounded by ``RESULT_CACHE_MAX_BYTES`` and, when
+    ``RESULT_CACHE_REDIS_ENABLED`` is set, in Redis with a TTL so workers can
+    share hits. Redis failures are counted and otherwise ignored.
+    """
+
+    def __init__(self, max_bytes: int, redis_url: Optional[str] = None, ttl: int = 3600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._redis_url = redis_url
+        self._redis = None
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def key(endpoint: str, model_version: str, digest: str) -> str:
+        return f"facetory:result:{endpoint}:{model_version}:{digest}"
+
+    def _redis_client(self):
+        if self._redis is None and self._redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(self._redis_url)
+        return self._redis
+
+    def _get_local(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self._get_local(key)
+        if value is not None:
+            self.hits += 1
+            return json.loads(value, object_hook=json_object_hook)
+        client = self._redis_client()
+        if client is not None:
+            try:
+                value = await client.get(key)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f"Result cache: Redis get failed: {e}")
+                value = None
+            if value is not None:
+                self.redis_hits += 1
+                self._set_local(key, value)
+                return json.loads(value, object_hook=json_object_hook)
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, result: Any):
+        value = json.dumps(result, separators=(",", ":"), default=json_default).encode()
+        self._set_local(key, value)
+        client = self._redis_client()
+        if client is not None:
+            try:
+                await client.set(key, value, ex=self.ttl)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f"Result cache: Redis set failed: {e}")
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if not settings.RESULT_CACHE_ENABLED:
+            return await compute()
+        result = await self.get(key)
+        if result is None:
+            result = await compute()
+            await self.set(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "enabled": settings.RESULT_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.redis_hits) / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "redis_enabled": self._redis_url is not None,
+            "redis_errors": self.redis_errors,
+        }
+
+
+result_cache = ResultCache(
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    redis_url=settings.REDIS_URL if settings.RESULT_CACHE_REDIS_ENABLED else None,
+    ttl=settings.RESULT_CACHE_TTL,
+)
@@ -1,57 +1,179 @@
-from minio import Minio
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from typing import TYPE_CHECKING, Iterable, List, Optional, Union
+from urllib.parse import urlparse
+
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from minio import Minio
+
+
+def _default_client() -> "Minio":
+    # The SDK (and its crypto dependencies) is only imported once storage is used
+    import urllib3
+    from minio import Minio
+
+    url = urlparse(settings.MINIO_URL if "://" in settings.MINIO_URL else f"http://{settings.MINIO_URL}")
+    # One keep-alive pool shared by every request and worker thread
+    http_client = urllib3.PoolManager(
+        maxsize=settings.MINIO_POOL_SIZE,
+        timeout=urllib3.Timeout(connect=settings.MINIO_CONNECT_TIMEOUT, read=settings.MINIO_READ_TIMEOUT),
+        retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    )
+    return Minio(
+        url.netloc,
+        access_key=settings.MINIO_ACCESS_KEY,
+        secret_key=settings.MINIO_SECRET_KEY,
+        secure=url.scheme == "https",
+        http_client=http_client,
+    )
+
+
 class MinioService:
-    def __init__(self):
-        self.client = Minio(
-            settings.MINIO_URL.replace("http://", ""),
-            access_key=settings.MINIO_ACCESS_KEY,
-            secret_key=settings.MINIO_SECRET_KEY,
-            secure=False  # Set to True for HTTPS
-        )
-        self.bucket_name = settings.MINIO_BUCKET
-        self._ensure_bucket_exists()
-    
+    """Object storage shared by the whole process.
+
+    The blocking MinIO SDK runs on a dedicated I/O thread pool so the event
+    loop never waits on the network. Objects above ``MINIO_PART_SIZE`` are sent
+    as multipart uploads with ``MINIO_PARALLEL_UPLOADS`` parts in flight. Pass
+    ``client`` to point the service at a local MinIO or S3 stand-in.
+    """
+
+    def __init__(self, client: Optional["Minio"] = None, bucket_name: Optional[str] = None):
+        self._client = client
+        self.bucket_name = bucket_name or settings.MINIO_BUCKET
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._bucket_ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> "Minio":
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = _default_client()
+        return self._client
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.MINIO_MAX_WORKERS, thread_name_prefix="storage"
+                    )
+        return self._executor
+
     def _ensure_bucket_exists(self):
+        if self._bucket_ready:
+            return
         try:
             if not self.client.bucket_exists(self.bucket_name):
                 self.client.make_bucket(self.bucket_name)
+            self._bucket_ready = True
         except Exception as e:
             print(f"Error ensuring bucket exists: {e}")
 
-    async def upload_file(self, local_path: str, object_name: str) -> str:
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def _fput(self, local_path: str, object_name: str, content_type: str):
+        self._ensure_bucket_exists()
+        self.client.fput_object(
+            self.bucket_name, object_name, local_path,
+            content_type=content_type,
+            part_size=settings.MINIO_PART_SIZE,
+            num_parallel_uploads=settings.MINIO_PARALLEL_UPLOADS,
+        )
+
+    def _put(self, object_name: str, data: Union[bytes, memoryview], content_type: str):
+        self._ensure_bucket_exists()
+        self.client.put_object(
+            self.bucket_name, object_name, BytesIO(data), len(data),
+            content_type=content_type,
+            part_size=settings.MINIO_PART_SIZE,
+            num_parallel_uploads=settings.MINIO_PARALLEL_UPLOADS,
+        )
+
+    def _get(self, object_name: str) -> bytes:
+        response = self.client.get_object(self.bucket_name, object_name)
         try:
-            self.client.fput_object(
-                self.bucket_name,
-                object_name,
-                local_path
-            )
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _remove_many(self, object_names: List[str]) -> List[str]:
+        from minio.deleteobjects import DeleteObject
+
+        errors = self.client.remove_objects(self.bucket_name, (DeleteObject(name) for name in object_names))
+        # remove_objects is lazy: the deletes are only sent while errors are iterated
+        return [error.name for error in errors]
+
+    async def upload_file(self, local_path: str, object_name: str,
+                          content_type: str = "application/octet-stream") -> str:
+        try:
+            await self._run(self._fput, local_path, object_name, content_type)
+            return f"{self.bucket_name}/{object_name}"
+        except Exception as e:
+            raise Exception(f"Failed to upload file: {e}")
+
+    async def upload_bytes(self, data: Union[bytes, memoryview], object_name: str,
+                           content_type: str = "application/octet-stream") -> str:
+        """Upload from an in-memory buffer without touching the local disk"""
+        try:
+            await self._run(self._put, object_name, data, content_type)
             return f"{self.bucket_name}/{object_name}"
         except Exception as e:
             raise Exception(f"Failed to upload file: {e}")
 
     async def download_file(self, object_name: str, local_path: str):
         try:
-            self.client.fget_object(
-                self.bucket_name,
-                object_name,
-                local_path
-            )
+            await self._run(self.client.fget_object, self.bucket_name, object_name, local_path)
+        except Exception as e:
+            raise Exception(f"Failed to download file: {e}")
+
+    async def download_bytes(self, object_name: str) -> bytes:
+        try:
+            return await self._run(self._get, object_name)
         except Exception as e:
             raise Exception(f"Failed to download file: {e}")
 
     async def delete_file(self, object_name: str):
         try:
-            self.client.remove_object(self.bucket_name, object_name)
+            await self._run(self.client.remove_object, self.bucket_name, object_name)
         except Exception as e:
             raise Exception(f"Failed to delete file: {e}")
 
+    async def delete_files(self, object_names: Iterable[str]) -> List[str]:
+        """Delete objects in batched requests; returns the names that could not be deleted"""
+        object_names = list(object_names)
+        if not object_names:
+            return []
+        try:
+            return await self._run(self._remove_many, object_names)
+        except Exception as e:
+            raise Exception(f"Failed to delete files: {e}")
+
     def get_file_url(self, object_name: str, expires: int = 3600) -> str:
         try:
             return self.client.presigned_get_object(
                 self.bucket_name,
                 object_name,
-                expires=expires
+                expires=timedelta(seconds=expires)
             )
         except Exception as e:
-            raise Exception(f"Failed to get file URL: {e}") 
\ No newline at end of file
+            raise Exception(f"Failed to get file URL: {e}")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+minio_service = MinioService()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+from typing import Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+Frame = Tuple[int, float, np.ndarray]
+
+
+async def save_video_upload(file: UploadFile) -> str:
+    """Stream an uploaded clip to a temporary file (OpenCV decodes from a path); the caller removes it"""
+    if file.content_type and not file.content_type.startswith(("video/", "application/octet-stream")):
+        raise HTTPException(status_code=400, detail="File must be a video.")
+    too_large = HTTPException(
+        status_code=400,
+        detail=f"File too large. Maximum size: {settings.VIDEO_MAX_FILE_SIZE // (1024*1024)}MB"
+    )
+    if file.size is not None and file.size > settings.VIDEO_MAX_FILE_SIZE:
+        raise too_large
+    suffix = os.path.splitext(file.filename or "")[1].lower() or ".mp4"
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    total = 0
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > settings.VIDEO_MAX_FILE_SIZE:
+                    raise too_large
+                await run_in_threadpool(buffer.write, chunk)
+        if total == 0:
+            raise HTTPException(status_code=400, detail="Empty file.")
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def open_video(path: str) -> cv2.VideoCapture:
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        capture.release()
+        raise HTTPException(status_code=400, detail="Invalid or unsupported video.")
+    return capture
+
+
+def iter_video_frames(capture: cv2.VideoCapture, stride: int = 1,
+                      max_frames: Optional[int] = None) -> Iterator[Frame]:
+    """Yield ``(frame index, timestamp ms, RGB frame)`` for every ``stride``-th frame.
+
+    Skipped frames are only grabbed, not decoded. Frames above
+    ``MAX_IMAGE_PIXELS`` are rejected like oversized images.
+    """
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    index = 0
+    yielded = 0
+    while max_frames is None or yielded < max_frames:
+        if not capture.grab():
+            break
+        if index % stride == 0:
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+            height, width = frame.shape[:2]
+            if width * height > settings.MAX_IMAGE_PIXELS:
+                raise HTTPException(status_code=400, detail=f"Frame dimensions too large: {width}x{height}.")
+            timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) or (index * 1000 / fps if fps else 0.0)
+            yield index, float(timestamp), cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            yielded += 1
+        index += 1
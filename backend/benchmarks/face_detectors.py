@@ -0,0 +1,114 @@
+"""Recall vs latency of the face detector backends.
+
+Runs each detector at each ``--max-side`` over a directory of images. It reports:
+
+- ms/image (median and p95, after a warm-up image);
+- recall and precision at IoU >= ``--iou`` against reference boxes.
+
+The reference is RetinaFace on the full-resolution image, or a ground-truth
+JSON ``{"<file name>": [[x1, y1, x2, y2], ...]}`` given with ``--ground-truth``.
+
+    cd backend
+    python benchmarks/face_detectors.py --input data/holdout --max-side 0 1280 640
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.face_detector import face_detectors  # noqa: E402
+
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def load_images(directory, limit):
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(EXTENSIONS))[:limit or None]
+    images = {}
+    for name in names:
+        img = cv2.imread(os.path.join(directory, name))
+        if img is not None:
+            images[name] = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return images
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(found, reference, threshold):
+    """Greedy one-to-one matching; returns the number of matched reference boxes"""
+    unmatched = list(reference)
+    hits = 0
+    for box in found:
+        best = max(unmatched, key=lambda ref: iou(box, ref), default=None)
+        if best is not None and iou(box, best) >= threshold:
+            unmatched.remove(best)
+            hits += 1
+    return hits
+
+
+def run_detector(detector, images, max_side):
+    """({file name: boxes}, [seconds per image])"""
+    detector.detect(next(iter(images.values())), max_side=max_side)  # load + warm up
+    boxes, times = {}, []
+    for name, img in images.items():
+        start = time.perf_counter()
+        result = detector.detect(img, max_side=max_side)
+        times.append(time.perf_counter() - start)
+        boxes[name] = [face["bounding_box"] for face in result["faces"]]
+    return boxes, times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare face detector recall and latency')
+    parser.add_argument('--input', required=True, help='directory of images')
+    parser.add_argument('--detectors', nargs='+', choices=sorted(face_detectors), default=sorted(face_detectors))
+    parser.add_argument('--max-side', type=int, nargs='+', default=[0, 1280, 640],
+                        help='long-edge limits to try (0 = full resolution)')
+    parser.add_argument('--ground-truth', help='JSON of reference boxes per file name')
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--limit', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    images = load_images(args.input, args.limit)
+    if not images:
+        sys.exit(f'no images in {args.input}')
+
+    if args.ground_truth:
+        with open(args.ground_truth) as f:
+            reference = {name: boxes for name, boxes in json.load(f).items() if name in images}
+        source = args.ground_truth
+    else:
+        reference, _ = run_detector(face_detectors['retinaface'], images, 0)
+        source = 'retinaface at full resolution'
+    total = sum(len(boxes) for boxes in reference.values())
+    print(f'{len(images)} images, {total} reference faces ({source})\n')
+    for name in args.detectors:
+        face_detectors[name].preload()
+
+    print(f'{"detector":<12}{"max side":>9}{"median ms":>11}{"p95 ms":>9}{"recall":>8}{"precision":>11}')
+    for name in args.detectors:
+        for max_side in args.max_side:
+            boxes, times = run_detector(face_detectors[name], images, max_side)
+            hits = sum(match(boxes[f], reference.get(f, []), args.iou) for f in images)
+            found = sum(len(b) for b in boxes.values())
+            recall = hits / total if total else float('nan')
+            precision = hits / found if found else float('nan')
+            print(f'{name:<12}{max_side or "full":>9}{np.median(times) * 1000:>11.1f}'
+                  f'{np.percentile(times, 95) * 1000:>9.1f}{recall:>8.3f}{precision:>11.3f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Import-time profile of the API (cold start of a fresh worker).
+
+Imports the module in a fresh interpreter with ``-X importtime``. It reports:
+
+- the wall time of the import;
+- the slowest modules by cumulative time;
+- which heavy model-backed packages were loaded.
+
+With ``--check`` it exits non-zero when a heavy package is imported eagerly
+or the import is slower than ``--max-seconds``, so it can run in CI.
+
+    cd backend
+    python benchmarks/import_time.py --top 15
+    python benchmarks/import_time.py --check --max-seconds 2
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only load on first use (or in the background pre-warm), never at import
+HEAVY_PACKAGES = ('torch', 'torchvision', 'tensorflow', 'retinaface', 'mediapipe',
+                  'onnxruntime', 'minio', 'matplotlib', 'sklearn', 'tqdm')
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+PROBE = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(",".join(sorted(m for m in sys.modules if "." not in m)))
+'''
+
+
+def profile(module):
+    """(wall seconds, top-level modules loaded, [(self_us, cumulative_us, depth, name)])"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module)],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f'import {module} failed:\n{result.stderr[-2000:]}')
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            rows.append((int(match[1]), int(match[2]), len(match[3]) // 2, match[4]))
+    wall, loaded = result.stdout.strip().splitlines()[-2:]
+    return float(wall), set(loaded.split(',')), rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile the import time of the API')
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--top', type=int, default=20, help='slowest modules to list')
+    parser.add_argument('--runs', type=int, default=3, help='report the fastest of N runs')
+    parser.add_argument('--check', action='store_true', help='fail on eager heavy imports or a slow import')
+    parser.add_argument('--max-seconds', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    runs = [profile(args.module) for _ in range(args.runs)]
+    wall, loaded, rows = min(runs, key=lambda run: run[0])
+    heavy = [name for name in HEAVY_PACKAGES if name in loaded]
+
+    print(f'import {args.module}: {wall * 1000:.0f} ms (best of {args.runs})')
+    print(f'\n{"cumulative ms":>14}{"self ms":>10}  module')
+    for self_us, cumulative_us, depth, name in sorted(rows, key=lambda r: -r[1])[:args.top]:
+        print(f'{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {"  " * depth}{name}')
+    print(f'\nheavy packages imported: {", ".join(heavy) or "none"}')
+
+    if args.check:
+        failed = bool(heavy) or (args.max_seconds and wall > args.max_seconds)
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,60 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import time
 
 from app.api import upload, auth, face_detection
 from app.core.config import settings
+from app.services import face_pipeline
+from app.services.model_registry import model_registry
+from app.services.batching import stop_batchers
+from app.services.executor import inference_executor
+from app.services.result_cache import result_cache
+from app.services.face_detector import close_detectors
+from app.services.face_mesh_pool import face_mesh_pool
+from app.services.storage import minio_service
+from app.services.jobs import job_queue
+
+def prewarm():
+    """Import the model stacks and load the models once per worker instead of once per request"""
+    start = time.perf_counter()
+    face_pipeline.prewarm()
+    model_registry.preload(settings.MODEL_PRELOAD)
+    face_mesh_pool.preload(settings.FACE_MESH_PRELOAD)
+    app.state.warm = True
+    print(f"Prewarm finished in {time.perf_counter() - start:.1f}s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.warm = False
+    prewarm_task = None
+    if settings.PREWARM_IN_BACKGROUND:
+        # Answer /health at once; requests arriving before the models are warm load them on demand
+        prewarm_task = asyncio.create_task(asyncio.to_thread(prewarm))
+    else:
+        prewarm()
+    job_queue.start()
+    yield
+    if prewarm_task is not None:
+        # A loading thread cannot be interrupted; let it finish before tearing down
+        await prewarm_task
+    await job_queue.stop()
+    await stop_batchers()
+    inference_executor.shutdown()
+    await result_cache.close()
+    model_registry.clear()
+    face_mesh_pool.close()
+    close_detectors()
+    minio_service.close()
 
 app = FastAPI(
     title="Facetory API",
     description="AI Face Filter System API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -36,7 +81,7 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "warm": getattr(app.state, "warm", False)}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ai_models.unet.batch_inference import mask_path
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cli_does_not_import_the_api():
+    code = "import sys, ai_models.unet.batch_inference; print(sorted({'app', 'fastapi'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+
+
+def test_mask_path_mirrors_the_input_tree(tmp_path):
+    masks = str(tmp_path / "masks")
+    assert mask_path(masks, "/data/in/sub/b.jpg", "/data/in") == os.path.join(masks, "sub", "b.png")
+    assert mask_path(masks, "/data/in/a.jpg", None) == os.path.join(masks, "data", "in", "a.png")
+
+
+@pytest.mark.parametrize("path", ["/data/in/../evil.jpg", "/elsewhere/x.jpg"])
+def test_mask_path_refuses_to_leave_the_output_dir(tmp_path, path):
+    with pytest.raises(ValueError):
+        mask_path(str(tmp_path / "masks"), path, "/data/in")
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+import torch
+
+from app.services import batching
+from app.services.batching import MicroBatcher
+from app.services.executor import InferenceExecutor
+
+
+@pytest.fixture(autouse=True)
+def executor(monkeypatch):
+    executor = InferenceExecutor()
+    monkeypatch.setattr(batching, "inference_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+class RecordingModel:
+    """Returns each image's first channel as its mask and records batch shapes"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, batch):
+        self.batches.append(tuple(batch.shape))
+        return batch[:, 0].numpy().copy()
+
+
+def image(value, size=4):
+    return torch.full((3, size, size), float(value))
+
+
+async def submit_all(batcher, tensors, stagger=0.0):
+    tasks = []
+    for tensor in tensors:
+        tasks.append(asyncio.ensure_future(batcher.submit(tensor)))
+        await asyncio.sleep(stagger)
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        await batcher.stop()
+
+
+def test_flushes_when_the_batch_is_full():
+    model = RecordingModel()
+    # A long wait that a full batch must not sit out
+    batcher = MicroBatcher("test", model, max_batch_size=3, max_wait_ms=5000)
+
+    start = time.perf_counter()
+    masks = asyncio.run(submit_all(batcher, [image(i) for i in range(3)]))
+
+    assert time.perf_counter() - start < 2
+    assert model.batches == [(3, 3, 4, 4)]
+    assert [float(mask[0, 0]) for mask in masks] == [0.0, 1.0, 2.0]
+    assert batcher.stats()["avg_batch_size"] == 3
+
+
+def test_flushes_a_partial_batch_after_max_wait():
+    model = RecordingModel()
+    batcher = MicroBatcher("test", model, max_batch_size=8, max_wait_ms=50)
+
+    start = time.perf_counter()
+    masks = asyncio.run(submit_all(batcher, [image(1), image(2)]))
+
+    assert 0.04 <= time.perf_counter() - start < 2
+    assert model.batches == [(2, 3, 4, 4)]
+    assert len(masks) == 2
+
+
+def test_late_requests_go_into_the_next_batch():
+    model = RecordingModel()
+    batcher = MicroBatcher("test", model, max_batch_size=8, max_wait_ms=20)
+
+    asyncio.run(submit_all(batcher, [image(1), image(2)], stagger=0.1))
+
+    assert model.batches == [(1, 3, 4, 4), (1, 3, 4, 4)]
+
+
+def test_different_shapes_run_in_separate_batches():
+    model = RecordingModel()
+    batcher = MicroBatcher("test", model, max_batch_size=4, max_wait_ms=5000)
+
+    masks = asyncio.run(submit_all(batcher, [image(1, 4), image(2, 8), image(3, 4), image(4, 8)]))
+
+    assert sorted(model.batches) == [(2, 3, 4, 4), (2, 3, 8, 8)]
+    assert [mask.shape for mask in masks] == [(4, 4), (8, 8), (4, 4), (8, 8)]
+    assert [float(mask[0, 0]) for mask in masks] == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_a_failed_batch_fails_only_its_own_callers():
+    def run_batch(batch):
+        if batch.shape[-1] == 8:
+            raise RuntimeError("boom")
+        return np.zeros(batch.shape[:1] + batch.shape[2:])
+
+    batcher = MicroBatcher("test", run_batch, max_batch_size=2, max_wait_ms=5000)
+
+    async def run():
+        ok = asyncio.ensure_future(batcher.submit(image(1, 4)))
+        bad = asyncio.ensure_future(batcher.submit(image(1, 8)))
+        try:
+            return await asyncio.gather(ok, bad, return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    ok, bad = asyncio.run(run())
+    assert ok.shape == (4, 4)
+    assert isinstance(bad, RuntimeError)
@@ -0,0 +1,36 @@
+import base64
+import io
+
+import numpy as np
+import torch
+from PIL import Image
+
+from ai_models.unet.inference_celeba_unet import preprocess_image
+from app.services.face_pipeline import image_to_base64
+
+RED = (220, 30, 10)
+
+
+def red_image(size=(64, 48)):
+    return np.full((size[1], size[0], 3), RED, dtype=np.uint8)
+
+
+def test_celeba_preprocessing_keeps_rgb_order():
+    tensor = preprocess_image(red_image())
+
+    assert tensor.shape == (1, 3, 512, 512)
+    mean = torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
+    std = torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1)
+    rgb = (tensor[0] * std + mean) * 255
+    assert torch.allclose(rgb.mean(dim=(1, 2)), torch.tensor(RED, dtype=torch.float32), atol=0.5)
+
+
+def test_celeba_preprocessing_matches_for_pil_and_array_input():
+    array = red_image()
+    assert torch.equal(preprocess_image(Image.fromarray(array)), preprocess_image(array))
+
+
+def test_annotated_image_keeps_rgb_order():
+    data = image_to_base64(red_image()).split(",", 1)[1]
+    with Image.open(io.BytesIO(base64.b64decode(data))) as img:
+        assert img.getpixel((0, 0)) == RED
@@ -0,0 +1,51 @@
+import os
+import threading
+
+from PIL import Image
+
+from app.core.config import settings
+from app.services.derivatives import derivative_path, generate_derivatives
+
+IMAGE_ID = "0123456789abcdef0123456789abcdef"
+
+
+def test_analysis_copy_keeps_the_short_edge_and_thumbnail_the_long_edge(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    original = tmp_path / f"{IMAGE_ID}.png"
+    Image.new("RGB", (1024, 768)).save(original)
+
+    result = generate_derivatives(IMAGE_ID, str(original))
+
+    assert (result["analysis"]["width"], result["analysis"]["height"]) == (683, 512)
+    assert (result["thumbnail"]["width"], result["thumbnail"]["height"]) == (256, 192)
+
+
+def test_concurrent_uploads_of_the_same_image(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    original = tmp_path / f"{IMAGE_ID}.jpg"
+    Image.new("RGB", (2000, 1500), (90, 140, 200)).save(original)
+    start = threading.Barrier(8)
+    errors = []
+
+    def upload():
+        start.wait()
+        try:
+            generate_derivatives(IMAGE_ID, str(original))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(os.listdir(tmp_path)) == sorted([
+        original.name,
+        os.path.basename(derivative_path(IMAGE_ID, "analysis")),
+        os.path.basename(derivative_path(IMAGE_ID, "thumbnail")),
+    ])
+    with Image.open(derivative_path(IMAGE_ID, "analysis")) as img:
+        img.load()
+        assert img.size == (683, 512)
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.executor import InferenceExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor()
+    yield executor
+    executor.shutdown()
+
+
+def test_thread_pool_covers_the_endpoint_limits(monkeypatch, executor):
+    monkeypatch.setattr(settings, "EXECUTOR_THREAD_WORKERS", 2)
+    monkeypatch.setattr(settings, "EXECUTOR_CONCURRENCY", {"detect": 2, "crop": 4})
+    assert executor.thread_pool._max_workers == 6
+
+    monkeypatch.setattr(settings, "EXECUTOR_THREAD_WORKERS", 8)
+    assert executor.thread_workers == 8
+
+
+def test_batch_pool_is_separate(executor):
+    assert executor.batch_pool is not executor.thread_pool
+    name = executor.batch_pool.submit(lambda: threading.current_thread().name).result()
+    assert name.startswith("batch")
+
+
+def test_full_queue_is_rejected_with_503(monkeypatch, executor):
+    monkeypatch.setattr(settings, "EXECUTOR_CONCURRENCY", {"detect": 1})
+    monkeypatch.setattr(settings, "EXECUTOR_MAX_QUEUE", 1)
+    release = threading.Event()
+
+    async def run():
+        running = asyncio.ensure_future(executor.run("detect", release.wait, 5))
+        waiting = asyncio.ensure_future(executor.run("detect", lambda: "done"))
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(HTTPException) as error:
+                await executor.run("detect", lambda: None)
+        finally:
+            release.set()
+        return error.value, await running, await waiting
+
+    error, first, second = asyncio.run(run())
+    assert error.status_code == 503 and error.headers["Retry-After"] == str(settings.EXECUTOR_RETRY_AFTER)
+    assert (first, second) == (True, "done")
+    assert executor.stats()["detect"]["rejected"] == 1
+
+
+def test_timeout_returns_504(executor):
+    release = threading.Event()
+
+    async def run():
+        try:
+            with pytest.raises(HTTPException) as error:
+                await executor.run("crop", release.wait, 5, timeout=0.05)
+        finally:
+            release.set()
+        return error.value
+
+    assert asyncio.run(run()).status_code == 504
@@ -0,0 +1,123 @@
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.face_detector import FaceDetector, MediaPipeFaceDetector, RetinaFaceDetector
+
+
+@pytest.fixture
+def retinaface(monkeypatch):
+    """Records the calls a RetinaFaceDetector makes instead of running TensorFlow"""
+    calls = []
+
+    class RetinaFace:
+        @staticmethod
+        def build_model():
+            return object()
+
+        @staticmethod
+        def detect_faces(img, threshold=0.9, model=None, allow_upscaling=True):
+            calls.append({"shape": img.shape, "allow_upscaling": allow_upscaling})
+            h, w = img.shape[:2]
+            return {"face_1": {"facial_area": [w // 4, h // 4, w // 2, h // 2], "score": 0.99,
+                               "landmarks": {"nose": [w / 2, h / 2]}}}
+
+    module = types.ModuleType("retinaface")
+    module.RetinaFace = RetinaFace
+    monkeypatch.setitem(sys.modules, "retinaface", module)
+    monkeypatch.setattr(settings, "FACE_DETECTION_MAX_SIDE", 1280)
+    return calls
+
+
+def test_small_image_keeps_upscaling(retinaface):
+    result = RetinaFaceDetector().detect(np.zeros((200, 300, 3), np.uint8))
+
+    assert retinaface == [{"shape": (200, 300, 3), "allow_upscaling": True}]
+    assert result["faces"][0]["bounding_box"] == [75, 50, 150, 100]
+
+
+def test_large_image_is_downscaled_without_upscaling(retinaface):
+    result = RetinaFaceDetector().detect(np.zeros((2000, 2560, 3), np.uint8))
+
+    assert retinaface == [{"shape": (1000, 1280, 3), "allow_upscaling": False}]
+    # Boxes and landmarks are mapped back to the original image
+    face = result["faces"][0]
+    assert face["bounding_box"] == [640, 500, 1280, 1000]
+    assert face["landmarks"]["nose"] == [1280.0, 1000.0]
+
+
+def test_full_resolution_keeps_upscaling(retinaface):
+    RetinaFaceDetector().detect(np.zeros((2000, 2560, 3), np.uint8), max_side=0)
+
+    assert retinaface == [{"shape": (2000, 2560, 3), "allow_upscaling": True}]
+
+
+@pytest.fixture
+def mediapipe(monkeypatch):
+    """FaceDetection graphs whose ``process`` blocks until ``release`` is set"""
+    state = types.SimpleNamespace(created=0, running=threading.Semaphore(0), release=threading.Event())
+
+    class FaceDetection:
+        def __init__(self, model_selection=0, min_detection_confidence=0.5):
+            state.created += 1
+
+        def process(self, img):
+            state.running.release()
+            state.release.wait(5)
+            return types.SimpleNamespace(detections=[])
+
+        def close(self):
+            pass
+
+    module = types.ModuleType("mediapipe")
+    module.solutions = types.SimpleNamespace(face_detection=types.SimpleNamespace(FaceDetection=FaceDetection))
+    monkeypatch.setitem(sys.modules, "mediapipe", module)
+    monkeypatch.setattr(settings, "EXECUTOR_THREAD_WORKERS", 2)
+    monkeypatch.setattr(settings, "EXECUTOR_TIMEOUT", 0.1)
+    return state
+
+
+def test_mediapipe_pool_is_bounded(mediapipe):
+    detector = MediaPipeFaceDetector()
+    image = np.zeros((64, 64, 3), np.uint8)
+    busy = [threading.Thread(target=detector.detect, args=(image,)) for _ in range(2)]
+    for thread in busy:
+        thread.start()
+    for _ in busy:
+        assert mediapipe.running.acquire(timeout=5)
+
+    with pytest.raises(HTTPException) as error:
+        detector.detect(image)
+    assert error.value.status_code == 503 and "Retry-After" in error.value.headers
+
+    mediapipe.release.set()
+    for thread in busy:
+        thread.join()
+    assert detector.detect(image)["num_faces"] == 0
+    assert mediapipe.created == 2
+
+
+def test_backends_must_implement_load_and_detect():
+    class Incomplete(FaceDetector):
+        def _load(self):
+            return object()
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_mediapipe_rejects_thresholds_below_its_floor(mediapipe):
+    detector = MediaPipeFaceDetector()
+    image = np.zeros((64, 64, 3), np.uint8)
+    mediapipe.release.set()
+
+    with pytest.raises(HTTPException) as error:
+        detector.detect(image, threshold=0.1)
+    assert error.value.status_code == 422
+    assert detector.detect(image, threshold=0.2)["num_faces"] == 0
+    assert detector.stats()["pool"]["created"] == 1
@@ -0,0 +1,74 @@
+import sys
+import types
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.face_mesh_pool import FaceMeshPool
+
+
+@pytest.fixture
+def mediapipe(monkeypatch):
+    created = []
+
+    class FaceMesh:
+        def __init__(self, static_image_mode=True, max_num_faces=1, refine_landmarks=True):
+            self.max_num_faces = max_num_faces
+            self.closed = False
+            created.append(self)
+
+        def close(self):
+            self.closed = True
+
+    module = types.ModuleType("mediapipe")
+    module.solutions = types.SimpleNamespace(face_mesh=types.SimpleNamespace(FaceMesh=FaceMesh))
+    monkeypatch.setitem(sys.modules, "mediapipe", module)
+    monkeypatch.setattr(settings, "EXECUTOR_TIMEOUT", 0.05)
+    return created
+
+
+def test_instances_are_reused(mediapipe):
+    pool = FaceMeshPool(size=2)
+    with pool.session() as first:
+        pass
+    with pool.session() as second:
+        assert second is first
+    assert len(mediapipe) == 1
+
+
+def test_exhausted_pool_returns_503(mediapipe):
+    pool = FaceMeshPool(size=1)
+    with pool.session():
+        with pytest.raises(HTTPException) as error:
+            with pool.session():
+                pass
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == str(settings.EXECUTOR_RETRY_AFTER)
+    assert pool.stats()[0]["timeouts"] == 1
+    # The checked-out instance went back to the pool
+    with pool.session():
+        pass
+    assert len(mediapipe) == 1
+
+
+def test_preload_sizes_the_multi_face_variant_from_settings(mediapipe, monkeypatch):
+    monkeypatch.setattr(settings, "MULTI_FACE_MAX_FACES", 6)
+    pool = FaceMeshPool(size=1)
+    pool.preload([{"max_num_faces": 1}, {"multi_face": True}])
+
+    assert sorted(mesh.max_num_faces for mesh in mediapipe) == [1, 6]
+    with pool.session(max_num_faces=6):
+        pass
+    assert len(mediapipe) == 2
+
+
+def test_meshes_released_after_close_are_closed(mediapipe):
+    pool = FaceMeshPool(size=2)
+    with pool.session() as busy:
+        with pool.session() as idle:
+            pass
+        pool.close()
+        assert idle.closed and not busy.closed
+    assert busy.closed
+    assert pool.stats() == []
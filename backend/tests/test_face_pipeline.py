@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import face_pipeline
+from app.services.executor import InferenceExecutor
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = InferenceExecutor()
+    monkeypatch.setattr(face_pipeline, "inference_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+def fake_detection(boxes):
+    def detect_faces(img_np, threshold=None, max_faces=None, detector=None):
+        h, w = img_np.shape[:2]
+        faces = [{"face_id": f"face_{i + 1}", "bounding_box": box, "landmarks": {}} for i, box in enumerate(boxes)]
+        return {"faces": faces, "image_size": {"width": w, "height": h}}
+    return detect_faces
+
+
+def test_crop_stage_skips_boxes_without_area(monkeypatch, executor):
+    boxes = [[10, 10, 50, 60], [30, 30, 30, 70], [200, 200, 260, 260], [-20, -20, 0, 40]]
+    monkeypatch.setattr(face_pipeline, "detect_faces", fake_detection(boxes))
+    image = np.zeros((100, 120, 3), dtype=np.uint8)
+
+    result = asyncio.run(face_pipeline.analyze_image(image, ["detect", "crop"], ["crop"]))
+
+    assert result["num_faces"] == 1
+    face = result["faces"][0]
+    assert face["face_id"] == "face_1" and face["offset"] == [10, 10]
+    assert face["cropped_image"].media_type == "image/jpeg"
+    assert face["cropped_image"].data[:2] == b"\xff\xd8"
+
+
+def test_crop_and_encode_run_off_the_event_loop(monkeypatch, executor):
+    monkeypatch.setattr(face_pipeline, "detect_faces", fake_detection([[0, 0, 20, 20]]))
+    threads = []
+    encode_image = face_pipeline.encode_image
+
+    def recording_encode(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return encode_image(*args, **kwargs)
+
+    monkeypatch.setattr(face_pipeline, "encode_image", recording_encode)
+    image = np.zeros((40, 40, 3), dtype=np.uint8)
+
+    asyncio.run(face_pipeline.analyze_image(image, ["detect", "crop"], ["crop"]))
+
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_group_photo_takes_one_endpoint_slot_per_stage(monkeypatch, executor):
+    monkeypatch.setattr(settings, "EXECUTOR_CONCURRENCY", {"analyze": 1})
+    monkeypatch.setattr(settings, "EXECUTOR_MAX_QUEUE", 0)
+    monkeypatch.setattr(face_pipeline, "_prepare_segmentation_input", lambda model, image: (image, image.shape))
+    monkeypatch.setattr(face_pipeline, "_summarize_segmentation",
+                        lambda model, image, mask, outputs, mask_format: {"mask_shape": list(mask.shape)})
+
+    class Batcher:
+        async def submit_many(self, tensors):
+            return [np.zeros(shape[:2], np.uint8) for shape in tensors]
+
+    monkeypatch.setattr(face_pipeline, "get_batcher", lambda model: Batcher())
+    crops = [np.zeros((10 + i, 10, 3), np.uint8) for i in range(12)]
+
+    results = asyncio.run(face_pipeline.segment_images(crops, "unet", ["mask"], "analyze"))
+
+    assert [r["mask_shape"] for r in results] == [[10 + i, 10] for i in range(12)]
+    assert executor.stats()["analyze"]["rejected"] == 0
@@ -0,0 +1,129 @@
+import asyncio
+import struct
+import zlib
+from io import BytesIO
+
+import numpy as np
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.services.image_io import encode_image, read_upload, save_upload
+
+
+class CountingFile(BytesIO):
+    """Upload body that records how much the server actually read"""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def upload(data: bytes, content_type="image/png", size=None):
+    return UploadFile(CountingFile(data), size=size, filename="upload.png",
+                      headers=Headers({"content-type": content_type}))
+
+
+def png(width=16, height=12) -> bytes:
+    return encode_image(np.zeros((height, width, 3), dtype=np.uint8), format="PNG")
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def png_header(width: int, height: int) -> bytes:
+    """A PNG claiming ``width`` x ``height`` with no pixel data"""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", ihdr) + png_chunk(b"IEND", b"")
+
+
+def rejected(file) -> HTTPException:
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_upload(file))
+    assert error.value.status_code == 400
+    return error.value
+
+
+def test_valid_upload_is_read_whole(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 64)
+    data = png()
+    assert asyncio.run(read_upload(upload(data))) == data
+
+
+def test_oversized_upload_is_rejected_while_streaming(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 256)
+    file = upload(png_header(10, 10) + b"\0" * 100_000)
+
+    error = rejected(file)
+
+    assert "too large" in error.detail
+    # Stopped at the first chunk past the limit instead of reading everything
+    assert file.file.bytes_read <= 1024 + 256
+
+
+def test_declared_oversized_upload_is_rejected_before_reading(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+    file = upload(png(), size=10_000)
+
+    assert "too large" in rejected(file).detail
+    assert file.file.bytes_read == 0
+
+
+@pytest.mark.parametrize("data", [
+    b"%PDF-1.7\n" + b"\0" * 100,
+    b"<svg xmlns='http://www.w3.org/2000/svg'/>",
+    b"MZ\x90\0" + b"\0" * 100,
+])
+def test_non_image_magic_bytes_are_rejected(monkeypatch, data):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 16)
+    # The client's content type is not trusted
+    file = upload(data + b"\0" * 1000, content_type="image/png")
+
+    assert rejected(file).detail == "File must be an image."
+    assert file.file.bytes_read == 16
+
+
+def test_non_image_content_type_is_rejected():
+    assert rejected(upload(png(), content_type="text/plain")).detail == "File must be an image."
+
+
+def test_empty_upload_is_rejected():
+    assert rejected(upload(b"")).detail == "Empty file."
+
+
+def test_header_over_max_image_pixels_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_IMAGE_PIXELS", 100)
+    assert "dimensions too large" in rejected(upload(png(16, 12))).detail
+
+
+def test_decompression_bomb_header_is_rejected():
+    # A few dozen bytes claiming a 100000 x 100000 image
+    error = rejected(upload(png_header(100_000, 100_000)))
+    assert "dimensions too large" in error.detail
+
+
+def test_save_upload_removes_rejected_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "MAX_IMAGE_PIXELS", 100)
+    path = tmp_path / "upload.png"
+
+    with pytest.raises(HTTPException):
+        asyncio.run(save_upload(upload(png(16, 12)), str(path)))
+
+    assert not path.exists()
+
+
+def test_save_upload_writes_valid_files(tmp_path):
+    path = tmp_path / "upload.png"
+    data = png()
+
+    assert asyncio.run(save_upload(upload(data), str(path))) == len(data)
+    assert Image.open(path).size == (16, 12)
@@ -0,0 +1,81 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from app.core.config import settings
+from app.services import image_store
+from app.services.derivatives import generate_derivatives
+from app.services.executor import InferenceExecutor
+from app.services.image_store import DecodedImageCache, load_uploaded_image
+
+IMAGE_ID = "0123456789abcdef0123456789abcdef"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Empty UPLOAD_DIR, a fresh decoded-image cache holding one unrelated entry"""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "MINIO_UPLOAD_ENABLED", False)
+    cache = DecodedImageCache(max_bytes=64 * 64 * 3)
+    cache.set("other:original", np.zeros((64, 64, 3), np.uint8), "digest")
+    monkeypatch.setattr(image_store, "decoded_image_cache", cache)
+    executor = InferenceExecutor()
+    monkeypatch.setattr(image_store, "inference_executor", executor)
+    yield tmp_path, cache
+    executor.shutdown()
+
+
+def save(directory, size, name=f"{IMAGE_ID}.png"):
+    Image.new("RGB", size, (200, 120, 90)).save(directory / name)
+
+
+def test_valid_upload_is_decoded_and_cached(store):
+    directory, cache = store
+    save(directory, (32, 16))
+
+    image, digest = asyncio.run(load_uploaded_image(IMAGE_ID, "detect"))
+
+    assert image.shape == (16, 32, 3)
+    assert cache.get(f"{IMAGE_ID}:original")[1] == digest
+
+
+def test_oversized_upload_is_rejected_before_it_reaches_the_cache(store, monkeypatch):
+    directory, cache = store
+    save(directory, (64, 64))
+    monkeypatch.setattr(settings, "MAX_IMAGE_PIXELS", 32 * 32)
+    decoded = []
+    monkeypatch.setattr(image_store, "decode_and_digest", lambda data: decoded.append(data))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(load_uploaded_image(IMAGE_ID, "detect"))
+
+    assert error.value.status_code == 400
+    assert decoded == []
+    assert cache.stats()["evictions"] == 0 and cache.get("other:original") is not None
+
+
+def test_non_image_file_is_rejected(store):
+    directory, cache = store
+    (directory / f"{IMAGE_ID}.jpg").write_bytes(b"not an image")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(load_uploaded_image(IMAGE_ID, "detect"))
+
+    assert error.value.status_code == 400
+    assert cache.stats()["entries"] == 1
+
+
+def test_analysis_copy_serves_non_square_uploads(store):
+    directory, cache = store
+    save(directory, (1600, 900))
+    generate_derivatives(IMAGE_ID, str(directory / f"{IMAGE_ID}.png"))
+
+    image, _ = asyncio.run(load_uploaded_image(IMAGE_ID, "celeba_unet_extract", max_side=512))
+    assert image.shape == (512, 910, 3)
+
+    # Endpoints that report pixel coordinates still get the original
+    image, _ = asyncio.run(load_uploaded_image(IMAGE_ID, "detect"))
+    assert image.shape == (900, 1600, 3)
@@ -0,0 +1,232 @@
+import asyncio
+import socket
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services import jobs
+from app.services.jobs import JobQueue, check_callback_url
+
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE_REDIS_ENABLED", False)
+    monkeypatch.setattr(settings, "JOB_CALLBACK_ALLOWED_HOSTS", [])
+
+
+async def echo(content, image_id, options):
+    if options.get("fail"):
+        raise HTTPException(status_code=400, detail="bad image")
+    return {"size": len(content or b""), "image_id": image_id}
+
+
+async def wait_for(queue: JobQueue, job_id: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        record = await queue.get(job_id)
+        if record["status"] in ("succeeded", "failed"):
+            return record
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_submit_and_poll():
+    async def run():
+        queue = JobQueue()
+        queue.register("echo", echo)
+        queue.start(1)
+        try:
+            ok = await queue.submit("echo", {}, content=b"abc")
+            failed = await queue.submit("echo", {"fail": True}, image_id="img")
+            assert ok["status"] == "queued"
+            return await wait_for(queue, ok["job_id"]), await wait_for(queue, failed["job_id"])
+        finally:
+            await queue.stop()
+
+    ok, failed = asyncio.run(run())
+    assert JobQueue.public_view(ok)["result"] == {"size": 3, "image_id": None}
+    assert failed["status"] == "failed" and failed["error"] == "bad image"
+    assert "result" not in JobQueue.public_view(failed)
+
+
+def test_finished_jobs_expire_after_ttl(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_TTL", 60)
+
+    async def run():
+        queue = JobQueue()
+        queue.register("echo", echo)
+        old = await queue.submit("echo", {})
+        record = await queue.get(old["job_id"])
+        record.update(status="succeeded", finished_at=time.time() - 61)
+        await queue.submit("echo", {})  # enqueue sweeps expired records
+        return await queue.get(old["job_id"])
+
+    assert asyncio.run(run()) is None
+
+
+def test_submit_rejects_unknown_kind_and_full_queue(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_QUEUE", 1)
+
+    async def run():
+        queue = JobQueue()
+        queue.register("echo", echo)
+        with pytest.raises(KeyError):
+            await queue.submit("missing", {})
+        await queue.submit("echo", {})
+        with pytest.raises(HTTPException) as error:
+            await queue.submit("echo", {})
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503 and "Retry-After" in error.headers
+
+
+@pytest.mark.parametrize("url", [
+    "file:///etc/passwd",
+    "gopher://127.0.0.1:6379/_INFO",
+    "http://127.0.0.1:8000/hook",
+    "http://localhost:6379/",
+    "http://10.0.0.5/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/hook",
+    "http:///no-host",
+])
+def test_callback_url_to_internal_targets_is_rejected(url):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(check_callback_url(url))
+    assert error.value.status_code == 422
+
+
+def test_callback_url_allow_list(monkeypatch):
+    asyncio.run(check_callback_url("https://93.184.216.34/hook"))  # public address
+
+    monkeypatch.setattr(settings, "JOB_CALLBACK_ALLOWED_HOSTS", ["hooks.internal"])
+    asyncio.run(check_callback_url("http://hooks.internal:8080/done"))
+    with pytest.raises(HTTPException):
+        asyncio.run(check_callback_url("https://93.184.216.34/hook"))
+
+
+def test_submit_rejects_bad_callback_url():
+    async def run():
+        queue = JobQueue()
+        queue.register("echo", echo)
+        await queue.submit("echo", {}, callback_url="http://127.0.0.1/hook")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 422
+
+
+class FlakyClient:
+    """Stands in for httpx.AsyncClient: fails ``failures`` times, then answers 200"""
+    posts = []
+    failures = 0
+
+    def __init__(self, timeout=None):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def post(self, url, json=None, headers=None, extensions=None):
+        FlakyClient.posts.append((url, json))
+        if len(FlakyClient.posts) <= FlakyClient.failures:
+            raise httpx.ConnectError("connection refused")
+        return httpx.Response(200)
+
+
+@pytest.mark.parametrize("failures, delivered", [(2, True), (3, False)])
+def test_callback_is_retried(monkeypatch, failures, delivered):
+    monkeypatch.setattr(settings, "JOB_CALLBACK_ALLOWED_HOSTS", ["hooks.test"])
+    monkeypatch.setattr(settings, "JOB_CALLBACK_RETRIES", 3)
+    monkeypatch.setattr(jobs.httpx, "AsyncClient", FlakyClient)
+    monkeypatch.setattr(FlakyClient, "posts", [])
+    monkeypatch.setattr(FlakyClient, "failures", failures)
+    real_sleep = asyncio.sleep
+    backoff = []
+
+    async def fast_sleep(delay, *args):
+        if delay >= 1:
+            backoff.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(jobs.asyncio, "sleep", fast_sleep)
+
+    async def run():
+        queue = JobQueue()
+        queue.register("echo", echo)
+        record = await queue.submit("echo", {}, content=b"x", callback_url="http://hooks.test/done")
+        await queue._run(record["job_id"])
+        return queue
+
+    queue = asyncio.run(run())
+    assert len(FlakyClient.posts) == 3
+    assert FlakyClient.posts[-1][1]["status"] == "succeeded"
+    assert backoff == [1, 2]
+    assert queue.callbacks_failed == (0 if delivered else 1)
+
+
+def test_callback_connects_to_the_checked_address(monkeypatch):
+    """A DNS answer that changes after the check (rebinding) is never used"""
+    answers = iter(["93.184.216.34", "127.0.0.1"])
+    resolved = []
+
+    async def getaddrinfo(self, host, port, **kwargs):
+        resolved.append(host)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (next(answers), port))]
+
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", getaddrinfo)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200)
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(jobs.httpx, "AsyncClient",
+                        lambda timeout=None: real_client(transport=httpx.MockTransport(handler), timeout=timeout))
+
+    async def run():
+        queue = JobQueue()
+        queue.register("echo", echo)
+        record = await queue.submit("echo", {}, content=b"x", callback_url="https://hooks.example.com:8443/done")
+        await queue._run(record["job_id"])
+        return queue
+
+    queue = asyncio.run(run())
+    # Checked at submit and again before delivery, where the private answer is refused
+    assert resolved == ["hooks.example.com", "hooks.example.com"]
+    assert requests == [] and queue.callbacks_failed == 1
+
+    answers = iter(["93.184.216.34", "93.184.216.35"])
+    resolved.clear()
+    queue = asyncio.run(run())
+    # The request goes to the address that passed the check, so httpx does not resolve the name again
+    (request,) = requests
+    assert str(request.url) == "https://93.184.216.35:8443/done"
+    assert request.headers["host"] == "hooks.example.com:8443"
+    assert request.extensions["sni_hostname"] == "hooks.example.com"
+    assert queue.callbacks_failed == 0
+
+
+def test_memory_backend_bounds_payload_bytes(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MEMORY_MAX_PAYLOAD_BYTES", 10)
+
+    async def run():
+        queue = JobQueue()
+        queue.register("echo", echo)
+        first = await queue.submit("echo", {}, content=b"123456")
+        with pytest.raises(HTTPException) as error:
+            await queue.submit("echo", {}, content=b"123456")
+        await queue._run(first["job_id"])  # releases the payload
+        await queue.submit("echo", {}, content=b"123456")
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503 and "Retry-After" in error.headers
@@ -0,0 +1,106 @@
+import base64
+import json
+from io import BytesIO
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from ai_models.unet.mask_codecs import rle_decode, rle_encode
+from app.services.mask_encoding import Artifact, encode_mask, render_response, validate_formats
+
+PALETTE = np.array([[0, 0, 0], [255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+
+
+@pytest.fixture
+def mask():
+    rng = np.random.default_rng(0)
+    # Blocky like a real segmentation, plus a few isolated pixels
+    mask = np.repeat(np.repeat(rng.integers(0, 4, (6, 8)), 5, axis=0), 4, axis=1).astype(np.uint8)
+    mask[rng.integers(0, 30, 10), rng.integers(0, 32, 10)] = 3
+    return mask
+
+
+@pytest.mark.parametrize("shape", [(30, 32), (1, 1), (0, 5)])
+def test_rle_round_trip(shape):
+    mask = np.random.default_rng(1).integers(0, 3, shape).astype(np.uint8)
+    encoded = rle_encode(mask)
+    assert sum(encoded["lengths"]) == mask.size
+    assert np.array_equal(rle_decode(encoded), mask)
+
+
+def test_rle_is_compact_for_blocky_masks(mask):
+    encoded = rle_encode(mask)
+    assert np.array_equal(rle_decode(encoded), mask)
+    assert len(encoded["values"]) < mask.size // 4
+    assert all(a != b for a, b in zip(encoded["values"], encoded["values"][1:]))
+
+
+def test_indexed_png_round_trip(mask):
+    encoded = encode_mask(mask, "indexed_png", PALETTE)
+    assert encoded["mask_shape"] == [30, 32]
+
+    image = Image.open(BytesIO(encoded["mask"].data))
+    assert image.mode == "P"
+    assert np.array_equal(np.asarray(image), mask)
+    assert np.array_equal(np.asarray(image.convert("RGB")), PALETTE[mask])
+
+
+def test_raw_and_png_formats(mask):
+    raw = encode_mask(mask, "raw", PALETTE)["mask"]
+    assert np.array_equal(np.frombuffer(raw.data, dtype=np.uint8).reshape(mask.shape), mask)
+
+    png = encode_mask(mask, "png", PALETTE)["colorized_mask"]
+    assert np.array_equal(np.asarray(Image.open(BytesIO(png.data)).convert("RGB")), PALETTE[mask])
+
+
+def test_unknown_formats_are_rejected():
+    for mask_format, response_format in (("jpeg", "json"), ("rle", "xml")):
+        with pytest.raises(HTTPException) as error:
+            validate_formats(mask_format, response_format)
+        assert error.value.status_code == 400
+
+
+def parse_multipart(response):
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/mixed; boundary=")
+    boundary = content_type.split("boundary=", 1)[1].encode()
+    body = response.body
+    assert body.endswith(b"--" + boundary + b"--\r\n")
+    parts = []
+    for chunk in body.split(b"--" + boundary)[1:-1]:
+        head, data = chunk[2:].split(b"\r\n\r\n", 1)
+        headers = dict(line.split(": ", 1) for line in head.decode().split("\r\n"))
+        parts.append((headers, data[:-2]))
+    return parts
+
+
+def test_render_response_multipart(mask):
+    encoded = encode_mask(mask, "indexed_png", PALETTE)
+    result = {"faces": [{"box": [1, 2, 3, 4], **encoded}], "overlay": Artifact(b"\r\n--not-a-boundary", "image/jpeg")}
+
+    parts = parse_multipart(render_response(result, "binary"))
+
+    (meta_headers, meta), (mask_headers, mask_bytes), (overlay_headers, overlay_bytes) = parts
+    assert meta_headers["Content-Type"] == "application/json"
+    metadata = json.loads(meta)
+    assert metadata["faces"][0]["box"] == [1, 2, 3, 4]
+    assert metadata["faces"][0]["mask"] == {"part": "faces.0.mask", "content_type": "image/png",
+                                            "bytes": len(encoded["mask"].data)}
+    assert metadata["overlay"]["part"] == "overlay"
+
+    assert mask_headers["Content-Disposition"] == 'attachment; name="faces.0.mask"'
+    assert int(mask_headers["Content-Length"]) == len(mask_bytes)
+    assert np.array_equal(np.asarray(Image.open(BytesIO(mask_bytes))), mask)
+    assert overlay_bytes == b"\r\n--not-a-boundary"
+
+
+def test_render_response_json(mask):
+    result = {"mask": encode_mask(mask, "raw", PALETTE)["mask"], "png": Artifact(b"png", "image/png")}
+
+    response = render_response(result, "json")
+
+    body = json.loads(response.body)
+    assert base64.b64decode(body["mask"]) == mask.tobytes()
+    assert body["png"] == "data:image/png;base64," + base64.b64encode(b"png").decode()
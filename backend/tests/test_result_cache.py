@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.services.mask_encoding import Artifact
+from app.services.result_cache import ResultCache
+
+
+def size(result) -> int:
+    return len(json.dumps(result, separators=(",", ":")).encode())
+
+
+def payload(tag: str) -> dict:
+    return {"tag": tag, "data": "x" * 90}
+
+
+@pytest.fixture
+def cache():
+    # Room for exactly three payloads
+    return ResultCache(max_bytes=3 * size(payload("a")))
+
+
+def keys(cache):
+    return list(cache._entries)
+
+
+async def set_get(cache, key, result):
+    await cache.set(key, result)
+    return await cache.get(key)
+
+
+def test_evicts_least_recently_used_by_bytes(cache):
+    async def run():
+        for tag in "abc":
+            await cache.set(tag, payload(tag))
+        assert await cache.get("a") == payload("a")  # a is now the most recent
+        await cache.set("d", payload("d"))
+        order = keys(cache)
+        return order, [await cache.get(tag) for tag in "abcd"]
+
+    order, (a, b, c, d) = asyncio.run(run())
+    assert order == ["c", "a", "d"]
+    assert b is None and a == payload("a") and c == payload("c") and d == payload("d")
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] == 3 * size(payload("a")) <= cache.max_bytes
+
+
+def test_one_large_entry_evicts_several_small_ones(cache):
+    big = {"tag": "big", "data": "x" * (2 * size(payload("a")))}
+
+    async def run():
+        for tag in "abc":
+            await cache.set(tag, payload(tag))
+        await cache.set("big", big)
+
+    asyncio.run(run())
+    assert keys(cache) == ["big"]
+    assert cache.stats()["evictions"] == 3 and cache._bytes == size(big)
+
+
+def test_entries_larger_than_the_cache_are_not_stored(cache):
+    asyncio.run(cache.set("huge", {"data": "x" * cache.max_bytes}))
+    assert keys(cache) == [] and cache._bytes == 0
+
+
+def test_replacing_a_key_does_not_double_count(cache):
+    async def run():
+        await cache.set("a", payload("a"))
+        await cache.set("a", payload("b"))
+        return await cache.get("a")
+
+    assert asyncio.run(run()) == payload("b")
+    assert cache._bytes == size(payload("b"))
+
+
+def test_artifacts_round_trip(cache):
+    result = {"mask": Artifact(b"\x89PNG...", "image/png")}
+
+    cached = asyncio.run(set_get(cache, "k", result))
+    assert isinstance(cached["mask"], Artifact)
+    assert (cached["mask"].data, cached["mask"].media_type) == (b"\x89PNG...", "image/png")
+
+
+def test_get_or_compute_computes_once(monkeypatch, cache):
+    monkeypatch.setattr(settings, "RESULT_CACHE_ENABLED", True)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"faces": 1}
+
+    async def run():
+        return [await cache.get_or_compute("k", compute) for _ in range(3)]
+
+    assert asyncio.run(run()) == [{"faces": 1}] * 3
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services.storage import MinioService
+
+
+class FakeResponse:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.closed = False
+        self.released = False
+
+    def read(self):
+        return self.data
+
+    def close(self):
+        self.closed = True
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakeMinio:
+    """In-memory stand-in for the ``Minio`` client methods the service uses"""
+
+    def __init__(self):
+        self.buckets = set()
+        self.objects = {}
+        self.threads = set()
+        self.calls = []
+        self.responses = []
+
+    def _record(self, name, **kwargs):
+        self.threads.add(threading.current_thread().name)
+        self.calls.append((name, kwargs))
+
+    def bucket_exists(self, bucket):
+        self._record("bucket_exists")
+        return bucket in self.buckets
+
+    def make_bucket(self, bucket):
+        self._record("make_bucket")
+        self.buckets.add(bucket)
+
+    def put_object(self, bucket, name, stream, length, content_type, part_size, num_parallel_uploads):
+        self._record("put_object", part_size=part_size, num_parallel_uploads=num_parallel_uploads)
+        data = stream.read()
+        assert len(data) == length
+        self.objects[(bucket, name)] = (data, content_type)
+
+    def fput_object(self, bucket, name, path, content_type, part_size, num_parallel_uploads):
+        self._record("fput_object", part_size=part_size, num_parallel_uploads=num_parallel_uploads)
+        with open(path, "rb") as f:
+            self.objects[(bucket, name)] = (f.read(), content_type)
+
+    def get_object(self, bucket, name):
+        self._record("get_object")
+        response = FakeResponse(self.objects[(bucket, name)][0])
+        self.responses.append(response)
+        return response
+
+    def fget_object(self, bucket, name, path):
+        self._record("fget_object")
+        with open(path, "wb") as f:
+            f.write(self.objects[(bucket, name)][0])
+
+    def remove_object(self, bucket, name):
+        self._record("remove_object")
+        self.objects.pop((bucket, name), None)
+
+    def remove_objects(self, bucket, delete_objects):
+        # Lazy like the SDK: nothing is deleted until the errors are iterated
+        for delete in delete_objects:
+            self._record("remove_objects")
+            if (bucket, delete.name) in self.objects:
+                del self.objects[(bucket, delete.name)]
+            else:
+                yield SimpleNamespace(name=delete.name)
+
+    def presigned_get_object(self, bucket, name, expires):
+        return f"http://storage.test/{bucket}/{name}?expires={int(expires.total_seconds())}"
+
+
+@pytest.fixture
+def client():
+    return FakeMinio()
+
+
+@pytest.fixture
+def storage(client):
+    service = MinioService(client=client, bucket_name="test-bucket")
+    yield service
+    service.close()
+
+
+def test_bytes_round_trip_off_the_event_loop(client, storage):
+    async def run():
+        path = await storage.upload_bytes(b"image bytes", "images/a.png", "image/png")
+        return path, await storage.download_bytes("images/a.png")
+
+    path, data = asyncio.run(run())
+
+    assert path == "test-bucket/images/a.png" and data == b"image bytes"
+    assert client.objects[("test-bucket", "images/a.png")] == (b"image bytes", "image/png")
+    assert client.threads and all(name.startswith("storage") for name in client.threads)
+    assert client.responses[0].closed and client.responses[0].released
+
+
+def test_bucket_is_created_once(client, storage):
+    async def run():
+        for i in range(3):
+            await storage.upload_bytes(b"x", f"{i}.bin")
+
+    asyncio.run(run())
+
+    names = [name for name, _ in client.calls]
+    assert names.count("bucket_exists") == 1 and names.count("make_bucket") == 1
+    assert "test-bucket" in client.buckets
+
+
+def test_uploads_use_the_configured_multipart_settings(monkeypatch, client, storage, tmp_path):
+    monkeypatch.setattr(settings, "MINIO_PART_SIZE", 5 * 1024 * 1024)
+    monkeypatch.setattr(settings, "MINIO_PARALLEL_UPLOADS", 3)
+    local = tmp_path / "in.bin"
+    local.write_bytes(b"file bytes")
+
+    async def run():
+        await storage.upload_file(str(local), "a.bin")
+        await storage.download_file("a.bin", str(tmp_path / "out.bin"))
+
+    asyncio.run(run())
+
+    put = dict(client.calls)["fput_object"]
+    assert put == {"part_size": 5 * 1024 * 1024, "num_parallel_uploads": 3}
+    assert (tmp_path / "out.bin").read_bytes() == b"file bytes"
+
+
+def test_delete_files_reports_failures(client, storage):
+    async def run():
+        for name in ("a", "b"):
+            await storage.upload_bytes(b"x", name)
+        return await storage.delete_files(["a", "missing", "b"])
+
+    assert asyncio.run(run()) == ["missing"]
+    assert client.objects == {}
+    assert asyncio.run(storage.delete_files([])) == []
+
+
+def test_client_errors_are_wrapped(storage):
+    with pytest.raises(Exception) as error:
+        asyncio.run(storage.download_bytes("missing"))
+    assert str(error.value).startswith("Failed to download file:")
+
+
+def test_presigned_url(storage):
+    assert storage.get_file_url("a.png", expires=60) == "http://storage.test/test-bucket/a.png?expires=60"
+
+
+def test_injected_client_is_used_instead_of_minio(client):
+    # The default SDK client is only built on first use when none is injected
+    service = MinioService(client=client)
+    assert service.client is client
+    assert service.bucket_name == settings.MINIO_BUCKET
@@ -0,0 +1,33 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.face_detection import router
+from app.core.config import settings
+from app.services.live_stream import stream_sessions
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_MAX_SESSIONS", 1)
+    app = FastAPI()
+    app.include_router(router, prefix="/api/face")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_sessions_over_the_limit_are_closed_with_1013(client):
+    with client.websocket_connect("/api/face/stream") as first:
+        with client.websocket_connect("/api/face/stream") as second:
+            assert second.receive_json() == {"error": "Too many live sessions, please retry later"}
+            with pytest.raises(WebSocketDisconnect) as closed:
+                second.receive_json()
+            assert closed.value.code == 1013
+        first.close()
+
+    # The slot is released once the first session ends
+    with client.websocket_connect("/api/face/stream?detector=unknown") as third:
+        assert "Unknown detector" in third.receive_json()["error"]
+    assert stream_sessions.active == 0
+    assert stream_sessions.rejected >= 1
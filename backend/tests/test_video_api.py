@@ -0,0 +1,48 @@
+import asyncio
+import io
+import zipfile
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from PIL import Image
+
+from app.api.face_detection import router
+
+
+def jpeg():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def archive():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("0001.jpg", jpeg())
+    return buffer.getvalue()
+
+
+def post_video(files):
+    async def run():
+        app = FastAPI()
+        app.include_router(router, prefix="/api/face")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/api/face/video", files=files)
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("files", [
+    [("frames", ("1.jpg", jpeg(), "image/jpeg")), ("archive", ("f.zip", archive(), "application/zip"))],
+    [("file", ("clip.mp4", b"\x00" * 16, "video/mp4")), ("frames", ("1.jpg", jpeg(), "image/jpeg"))],
+    [("file", ("clip.mp4", b"\x00" * 16, "video/mp4")), ("archive", ("f.zip", archive(), "application/zip"))],
+])
+def test_video_rejects_more_than_one_source(files):
+    response = post_video(files)
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Provide only one of file, frames or archive."
+
+
+def test_video_requires_a_source():
+    assert post_video({"stages": (None, "landmarks")}).status_code == 400